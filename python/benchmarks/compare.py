@@ -0,0 +1,64 @@
+"""
+Compares two result files of run.py, e.g. of the main branch and of a change.
+
+Prints the median latency and peak memory of every case in both files, and
+exits with status 1 if any case got slower by more than the threshold.
+
+Usage: python benchmarks/compare.py baseline.json results.json [--threshold 1.2]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+def load_results(path: Path) -> Tuple[dict, Dict[Tuple[str, int], dict]]:
+    report = json.loads(path.read_text(encoding="utf-8"))
+
+    return report, {(result["case"], result["size"]): result for result in report["results"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("results", type=Path)
+    parser.add_argument(
+        "--threshold", type=float, default=1.2,
+        help="ratio of median latencies counted as a regression (default: 1.2)",
+    )
+    args = parser.parse_args()
+
+    baseline_report, baseline = load_results(args.baseline)
+    report, results = load_results(args.results)
+
+    print(f"Baseline: {baseline_report.get('commit')}, results: {report.get('commit')}")
+    print(f"{'Case':32} {'Size':>8} {'p50 before':>12} {'p50 after':>12} {'Ratio':>7} {'Peak MiB':>17}")
+
+    regressions = 0
+
+    for key, result in results.items():
+        before = baseline.get(key)
+
+        if before is None:
+            continue
+
+        ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 1.0
+        regressed = ratio > args.threshold
+        regressions += regressed
+
+        print(
+            f"{key[0]:32} {key[1]:>8} {before['p50_ms']:9.2f} ms {result['p50_ms']:9.2f} ms"
+            f" {ratio:6.2f}x"
+            f" {before['peak_memory_bytes'] / 2**20:7.1f} -> {result['peak_memory_bytes'] / 2**20:7.1f}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+
+    if regressions:
+        print(f"{regressions} case(s) slower by more than {args.threshold:.2f}x.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
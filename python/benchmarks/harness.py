@@ -0,0 +1,81 @@
+"""
+Timing and memory measurement of benchmark cases.
+
+Every case is run a few times to report latency percentiles, then once more
+under tracemalloc to report its peak memory (tracing slows code down, so
+that run is not timed).
+"""
+
+import gc
+import time
+import tracemalloc
+from typing import Callable, List
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Returns the value below which the given fraction of the sorted values lie,
+    interpolating between the two nearest values.
+    """
+
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+def measure(
+    run: Callable[[], object],
+    repeats: int,
+    setup: Callable[[], None] | None = None,
+    warmup: int = 1,
+) -> dict:
+    """
+    Times `run` over `repeats` runs, calling `setup` (untimed) before each of them.
+
+    Returns latencies in milliseconds (min, mean, percentiles and max) and
+    the peak memory allocated by a run in bytes.
+    """
+
+    def prepare() -> None:
+        if setup is not None:
+            setup()
+
+        # Garbage collection of earlier runs should not be timed
+        gc.collect()
+
+    for _ in range(warmup):
+        prepare()
+        run()
+
+    times = []
+
+    for _ in range(repeats):
+        prepare()
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+
+    prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times.sort()
+
+    return {
+        "runs": repeats,
+        "min_ms": round(times[0], 3),
+        "mean_ms": round(sum(times) / len(times), 3),
+        "p50_ms": round(percentile(times, 0.5), 3),
+        "p90_ms": round(percentile(times, 0.9), 3),
+        "p99_ms": round(percentile(times, 0.99), 3),
+        "max_ms": round(times[-1], 3),
+        "peak_memory_bytes": peak_memory,
+    }
@@ -0,0 +1,436 @@
+"""
+Load test of the server mode: many concurrent browser sessions, spread over
+several users, calling the backend the way the frontend does.
+
+Every session speaks the Eel protocol over its own websocket, opens a session
+for its user, then makes calls picked from a weighted mix of the frontend's
+operations until the test ends. Latency percentiles per operation, error
+counts and throughput are written as JSON.
+
+With --spawn, a server is started with its data in a temporary folder, and
+with --files every user gets a playlist of a generated library (see synthetic.py)
+in their music folder, so that reading tracks and searching have something to
+work on. Tokens of the simulated users are issued into the data folder of the
+server, which is given with --data-dir (and its music folder, see SERVER_MUSIC_ROOT,
+with --music-dir) when testing a server that is already running.
+
+Usage: python benchmarks/load_test.py [--spawn | --data-dir PATH --music-dir PATH]
+                                      [--url http://localhost:8000]
+                                      [--sessions 50] [--users 10] [--seconds 30]
+                                      [--files 200] [--output results.json]
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import secrets
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import gevent
+from gevent import socket
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+from harness import percentile  # noqa: E402
+from sessions import issue_token  # noqa: E402
+from synthetic import make_library  # noqa: E402
+
+APP_PATH = Path(__file__).resolve().parent.parent / "src" / "py" / "app.py"
+
+# Operation -> weight, roughly how often the frontend makes each call
+OPERATIONS = {
+    "get_user_data": 2,
+    "get_playlist_tracks": 5,
+    "search": 3,
+    "add_to_recently_played": 1,
+}
+
+SEARCH_TERMS = ["track", "artist", "album", "1", "tr", "art 2", "song"]
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+class EelClient:
+    """
+    Minimal websocket client (RFC 6455) calling functions exposed by the backend,
+    like eel.js does: {"call", "name", "args"} messages answered by {"return", "status", "value"}.
+    """
+
+    def __init__(self, host: str, port: int, page: str = "index.html"):
+        self._socket = socket.create_connection((host, port))
+        self._buffer = b""
+        self._next_id = 0
+        self._handshake(host, port, f"/eel?page={page}")
+
+    def call(self, name: str, *args):
+        """
+        Calls an exposed function and returns its value.
+        Raises RuntimeError if the call failed in the backend.
+        """
+
+        self._next_id += 1
+        call_id = self._next_id
+        self._send(json.dumps({"call": call_id, "name": name, "args": list(args)}))
+
+        while True:
+            message = json.loads(self._receive())
+
+            # Calls of JS functions by the backend, e.g. pushed updates, are skipped
+            if message.get("return") != call_id:
+                continue
+
+            if message["status"] != "ok":
+                raise RuntimeError(message.get("error", {}).get("errorText", "call failed"))
+
+            return message["value"]
+
+    def close(self) -> None:
+        try:
+            self._send_frame(OPCODE_CLOSE, b"")
+        except OSError:
+            pass
+
+        self._socket.close()
+
+    def _handshake(self, host: str, port: int, path: str) -> None:
+        key = base64.b64encode(secrets.token_bytes(16)).decode("ascii")
+        request = (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host}:{port}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self._socket.sendall(request.encode("ascii"))
+
+        while b"\r\n\r\n" not in self._buffer:
+            self._buffer += self._recv()
+
+        head, self._buffer = self._buffer.split(b"\r\n\r\n", 1)
+        status = head.split(b"\r\n", 1)[0]
+
+        if b" 101 " not in status:
+            raise ConnectionError(f"Websocket handshake failed: {status.decode(errors='replace')}")
+
+    def _send(self, text: str) -> None:
+        self._send_frame(OPCODE_TEXT, text.encode("utf-8"))
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        # Frames sent by a client are masked
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", length)
+
+        mask = secrets.token_bytes(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+        self._socket.sendall(header + mask + masked)
+
+    def _receive(self) -> str:
+        """
+        Returns the next text message, answering pings and joining fragments.
+        """
+
+        fragments = []
+
+        while True:
+            first, second = self._read(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+
+            if length == 126:
+                (length,) = struct.unpack("!H", self._read(2))
+            elif length == 127:
+                (length,) = struct.unpack("!Q", self._read(8))
+
+            # Frames sent by the server are not masked
+            payload = self._read(length)
+
+            if opcode == OPCODE_PING:
+                self._send_frame(OPCODE_PONG, payload)
+                continue
+
+            if opcode == OPCODE_CLOSE:
+                raise ConnectionError("Websocket closed by the server")
+
+            if opcode == OPCODE_PONG:
+                continue
+
+            fragments.append(payload)
+
+            if first & 0x80:
+                return b"".join(fragments).decode("utf-8")
+
+    def _read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            self._buffer += self._recv()
+
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+
+        return data
+
+    def _recv(self) -> bytes:
+        data = self._socket.recv(65536)
+
+        if not data:
+            raise ConnectionError("Connection closed by the server")
+
+        return data
+
+
+class Results:
+    def __init__(self):
+        # operation -> latencies in milliseconds
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        # operation -> number of failed calls
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, operation: str, started: float, failed: bool = False) -> None:
+        if failed:
+            self.errors[operation] += 1
+        else:
+            self.latencies[operation].append((time.perf_counter() - started) * 1000)
+
+    def summary(self, seconds: float) -> dict:
+        operations = {}
+
+        for operation in sorted(set(self.latencies) | set(self.errors)):
+            times = sorted(self.latencies[operation])
+            operations[operation] = {"calls": len(times), "errors": self.errors[operation]}
+
+            if times:
+                operations[operation].update(
+                    {
+                        "mean_ms": round(sum(times) / len(times), 3),
+                        "p50_ms": round(percentile(times, 0.5), 3),
+                        "p90_ms": round(percentile(times, 0.9), 3),
+                        "p99_ms": round(percentile(times, 0.99), 3),
+                        "max_ms": round(times[-1], 3),
+                    }
+                )
+
+        calls = sum(len(times) for times in self.latencies.values())
+
+        return {
+            "calls": calls,
+            "errors": sum(self.errors.values()),
+            "calls_per_second": round(calls / seconds, 1),
+            "operations": operations,
+        }
+
+
+def prepare_users(
+    host: str, port: int, tokens: Dict[str, str], libraries: Dict[str, Path]
+) -> None:
+    """
+    Gives every user a playlist of their generated library, unless they already have one.
+    """
+
+    client = EelClient(host, port)
+
+    try:
+        for username, token in tokens.items():
+            session_id = client.call("open_session", username, token)
+
+            library = libraries.get(username)
+
+            if library is not None and not client.call("get_user_data", session_id)["playlists"]:
+                client.call("create_playlist", session_id, f"Library of {username}", str(library))
+    finally:
+        client.close()
+
+
+def run_session(
+    host: str,
+    port: int,
+    username: str,
+    token: str,
+    deadline: float,
+    results: Results,
+    seed: int,
+) -> None:
+    rng = random.Random(seed)
+    operations = list(OPERATIONS)
+    weights = [OPERATIONS[operation] for operation in operations]
+
+    started = time.perf_counter()
+
+    try:
+        client = EelClient(host, port)
+        session_id = client.call("open_session", username, token)
+        playlists = client.call("get_user_data", session_id)["playlists"]
+    except (OSError, ConnectionError, RuntimeError):
+        results.record("connect", started, failed=True)
+        return
+
+    results.record("connect", started)
+
+    try:
+        while time.perf_counter() < deadline:
+            operation = rng.choices(operations, weights)[0]
+            playlist_id = rng.choice(playlists)["id"] if playlists else ""
+
+            if operation == "get_playlist_tracks":
+                args = (playlist_id, rng.randrange(0, 200, 50))
+            elif operation == "search":
+                args = (rng.choice(SEARCH_TERMS),)
+            elif operation == "add_to_recently_played":
+                args = (playlist_id,)
+            else:
+                args = ()
+
+            started = time.perf_counter()
+
+            try:
+                client.call(operation, session_id, *args)
+            except RuntimeError:
+                results.record(operation, started, failed=True)
+                continue
+
+            results.record(operation, started)
+    except (OSError, ConnectionError):
+        results.record("disconnect", started, failed=True)
+    finally:
+        client.close()
+
+
+def spawn_server(port: int, data_dir: Path, music_dir: Path, max_users: int) -> subprocess.Popen:
+    env = dict(os.environ, PLAYLISTHUB_DATA_DIR=str(data_dir), PLAYLISTHUB_MUSIC_DIR=str(music_dir))
+
+    return subprocess.Popen(
+        [
+            sys.executable,
+            str(APP_PATH),
+            "--server",
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--max-users", str(max_users),
+        ],
+        env=env,
+    )
+
+
+def wait_for_server(host: str, port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+
+            gevent.sleep(0.2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the server mode")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="start a server to test")
+    parser.add_argument("--data-dir", type=Path, help="data folder of the server to test")
+    parser.add_argument("--music-dir", type=Path, help="music folder of the server to test")
+    parser.add_argument("--max-users", type=int, default=32, help="users kept loaded by a spawned server")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--files", type=int, default=200, help="generated audio files, 0 for none")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    if not args.spawn and (args.data_dir is None or args.music_dir is None):
+        parser.error("--data-dir and --music-dir are required to test a running server")
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    users = [f"loadtest{i}" for i in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        server = None
+        data_dir = args.data_dir
+        music_dir = args.music_dir
+
+        if args.spawn:
+            data_dir = scratch / "data"
+            music_dir = scratch / "music"
+            server = spawn_server(port, data_dir, music_dir, args.max_users)
+
+        tokens = {username: issue_token(username, data_dir) for username in users}
+
+        try:
+            wait_for_server(host, port)
+
+            libraries = {}
+
+            if args.files > 0:
+                # Users can only create playlists from their own music folder,
+                # which must be readable by the server, running on this machine
+                for username in users:
+                    libraries[username] = music_dir / username / "library"
+                    make_library(libraries[username], args.files)
+
+            prepare_users(host, port, tokens, libraries)
+
+            deadline = time.perf_counter() + args.seconds
+            results = Results()
+
+            sessions = [
+                gevent.spawn(
+                    run_session,
+                    host,
+                    port,
+                    users[i % len(users)],
+                    tokens[users[i % len(users)]],
+                    deadline,
+                    results,
+                    args.seed + i,
+                )
+                for i in range(args.sessions)
+            ]
+            gevent.joinall(sessions)
+
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {
+        "sessions": args.sessions,
+        "users": args.users,
+        "seconds": args.seconds,
+        "files": args.files,
+        **results.summary(args.seconds),
+    }
+
+    text = json.dumps(report, indent=4)
+
+    if args.output is not None:
+        args.output.write_text(text, encoding="utf-8")
+
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
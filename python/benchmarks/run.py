@@ -0,0 +1,286 @@
+"""
+Benchmark suite of the code paths that matter for large libraries: folder
+scanning, storage backends, (de)serialisation, playlist lookups and track moves.
+
+Results (latency percentiles and peak memory of every case and size) are
+written as JSON, to be compared across commits with compare.py.
+Audio files are generated (see synthetic.py), so no music library is needed.
+
+Usage: python benchmarks/run.py [--sizes 1000,10000] [--files 1000]
+                                [--repeats 5] [--filter storage] [--output results.json]
+"""
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+import config  # noqa: E402
+
+# The coalescing window only adds a fixed wait to every write, measure the writes themselves
+config.SAVE_COALESCE_SECONDS = 0
+
+from folder_sync import scan_folder, sync_folder  # noqa: E402
+from harness import measure  # noqa: E402
+from models.user import User  # noqa: E402
+from scanner import scan_tracks, walk_audio_files  # noqa: E402
+from storage.binary_storage import BinaryStorage  # noqa: E402
+from storage.json_storage import JsonStorage  # noqa: E402
+from storage.sqlite_storage import SqliteStorage  # noqa: E402
+from synthetic import make_library, make_user  # noqa: E402
+from tag_cache import TagCache  # noqa: E402
+
+# Case name -> (what its size counts: "files" or "tracks", function preparing the case).
+# The function gets the size and a scratch folder, and returns the code to time
+# and the (untimed) code to run before every timed run, or None.
+Case = Callable[[int, Path], Tuple[Callable[[], object], Callable[[], None] | None]]
+CASES: Dict[str, Tuple[str, Case]] = {}
+
+BACKENDS = {"json": JsonStorage, "binary": BinaryStorage, "sqlite": SqliteStorage}
+
+LOOKUPS = 10_000
+
+
+def case(name: str, sized_by: str = "tracks") -> Callable[[Case], Case]:
+    def register(fn: Case) -> Case:
+        CASES[name] = (sized_by, fn)
+        return fn
+
+    return register
+
+
+def _library(scratch: Path, size: int) -> Tuple[Path, List[Path]]:
+    # Libraries are shared by the scanning cases of the same size
+    folder = scratch / f"library-{size}"
+
+    if folder.is_dir():
+        return folder, sorted(folder.iterdir())
+
+    return folder, make_library(folder, size)
+
+
+# Scanning
+
+
+@case("scan.create_playlist", sized_by="files")
+def scan_new_folder(size: int, scratch: Path):
+    folder, _ = _library(scratch, size)
+
+    def run():
+        # Like create_playlist, files stream from the walk into tag reading
+        return scan_tracks(walk_audio_files(folder))
+
+    return run, None
+
+
+@case("scan.create_playlist_cached", sized_by="files")
+def scan_cached_folder(size: int, scratch: Path):
+    folder, files = _library(scratch, size)
+    tag_cache = TagCache(scratch / "tag_cache.json")
+    scan_tracks(files, tag_cache)
+
+    def run():
+        return scan_tracks(walk_audio_files(folder), tag_cache)
+
+    return run, None
+
+
+@case("scan.refresh_unchanged", sized_by="files")
+def refresh_unchanged_folder(size: int, scratch: Path):
+    folder, _ = _library(scratch, size)
+    _, manifest = scan_folder(folder)
+
+    def run():
+        return sync_folder(str(folder), manifest)
+
+    return run, None
+
+
+# Serialisation
+
+
+@case("model.user_to_dict")
+def user_to_dict(size: int, scratch: Path):
+    user = make_user(size)
+
+    return user.to_dict, None
+
+
+@case("model.user_from_dict")
+def user_from_dict(size: int, scratch: Path):
+    data = make_user(size).to_dict()
+
+    return lambda: User.from_dict(data), None
+
+
+# Lookups
+
+
+def _lookup_user(size: int) -> Tuple[User, list]:
+    # Small playlists, so there are many of them to look through
+    user = make_user(size, playlist_size=10)
+    random.seed(size)
+
+    return user, random.choices(user.playlists, k=LOOKUPS)
+
+
+@case("lookup.get_playlist")
+def get_playlist(size: int, scratch: Path):
+    user, targets = _lookup_user(size)
+    ids = [playlist.id for playlist in targets]
+
+    def run():
+        for playlist_id in ids:
+            user.get_playlist(playlist_id)
+
+    return run, None
+
+
+@case("lookup.index_of_playlist")
+def index_of_playlist(size: int, scratch: Path):
+    user, targets = _lookup_user(size)
+    # Positions are only looked up when removing playlists, a few hundred lookups are enough
+    targets = targets[: LOOKUPS // 100]
+
+    def run():
+        for playlist in targets:
+            user.index_of_playlist(playlist)
+
+    return run, None
+
+
+# Storage backends
+
+
+def _register_storage_cases(backend: str, storage_class) -> None:
+    def storage(scratch: Path):
+        root = scratch / f"storage-{backend}"
+        shutil.rmtree(root, ignore_errors=True)
+
+        return storage_class(root)
+
+    @case(f"storage.{backend}.save_user")
+    def save_user(size: int, scratch: Path):
+        user = make_user(size)
+        target = storage(scratch)
+
+        return lambda: target.save_user(user), None
+
+    @case(f"storage.{backend}.load_user")
+    def load_user(size: int, scratch: Path):
+        user = make_user(size)
+        target = storage(scratch)
+        target.save_user(user)
+
+        def run():
+            loaded = target.load_user(user.username)
+
+            # Loading is lazy, open every playlist like a user browsing the whole library
+            for playlist in loaded.playlists:
+                playlist.tracks.load()
+
+            return loaded
+
+        return run, None
+
+    @case(f"storage.{backend}.move_track")
+    def move_track(size: int, scratch: Path):
+        # A single playlist holding the whole library, the worst case of a move
+        user = make_user(size, playlist_size=size)
+        playlist = user.playlists[0]
+        target = storage(scratch)
+        target.save_user(user)
+
+        def run():
+            # What app.move_track does, moving the first track to the end
+            playlist.tracks.move(0, len(playlist.tracks) - 1)
+            return target.move_track(user, playlist, 0, len(playlist.tracks) - 1)
+
+        return run, None
+
+
+for _backend, _storage_class in BACKENDS.items():
+    _register_storage_cases(_backend, _storage_class)
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _sizes(text: str) -> List[int]:
+    return [int(size) for size in text.split(",") if size]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=_sizes, default=[1000, 10_000, 100_000],
+        help="comma-separated library sizes in tracks (default: 1000,10000,100000)",
+    )
+    parser.add_argument(
+        "--files", type=_sizes, default=[1000],
+        help="comma-separated numbers of audio files for scanning cases (default: 1000)",
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per case (default: 5)")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--output", type=Path, help="file to write the JSON results to (default: stdout)")
+    args = parser.parse_args()
+
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix="playlisthub-benchmarks-") as scratch:
+        for name, (sized_by, prepare) in CASES.items():
+            if args.filter not in name:
+                continue
+
+            for size in args.files if sized_by == "files" else args.sizes:
+                run, setup = prepare(size, Path(scratch))
+                stats = measure(run, args.repeats, setup)
+                results.append({"case": name, "size": size, **stats})
+
+                # Progress goes to stderr, stdout may be the JSON output
+                print(
+                    f"{name:32} {size:>8} p50 {stats['p50_ms']:10.2f} ms"
+                    f"  p90 {stats['p90_ms']:10.2f} ms"
+                    f"  peak {stats['peak_memory_bytes'] / 2**20:8.1f} MiB",
+                    file=sys.stderr,
+                )
+
+    report = json.dumps(
+        {
+            "commit": _commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "results": results,
+        },
+        indent=2,
+    )
+
+    if args.output:
+        args.output.write_text(report + "\n", encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
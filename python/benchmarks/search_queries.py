@@ -0,0 +1,86 @@
+"""
+Measures building the search index and answering queries typed letter by letter.
+
+Usage: python benchmarks/search_queries.py [track count]
+"""
+
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+from models.playlist import Playlist  # noqa: E402
+from models.user import User  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from synthetic import make_tracks  # noqa: E402
+
+PLAYLIST_SIZE = 1000
+REPEATS = 5
+
+WORDS = (
+    "love night dance heart fire rain summer blue dream light "
+    "shadow river storm golden silver moon star ocean road home"
+).split()
+
+QUERIES = ["l", "lo", "love", "love ni", "love night", "artist 12", "playlist 1", "12345", "zzz"]
+
+
+def make_user(count: int) -> User:
+    random.seed(1)
+    tracks = make_tracks(count)
+
+    # Titles from a small vocabulary, so common words match many tracks
+    for i, track in enumerate(tracks):
+        track.title = f"{' '.join(random.sample(WORDS, 3))} {i}"
+
+    return User(
+        "benchmark",
+        [
+            Playlist(
+                f"Playlist {i}",
+                timedelta(),
+                f"/home/user/Music/Playlist {i}",
+                tracks[start : start + PLAYLIST_SIZE],
+            )
+            for i, start in enumerate(range(0, count, PLAYLIST_SIZE))
+        ],
+    )
+
+
+def best_time(fn) -> float:
+    times = []
+
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    user = make_user(count)
+    index = SearchIndex()
+
+    start = time.perf_counter()
+    index.build(user)
+    print(f"Tracks: {count}, index built in {time.perf_counter() - start:.2f} s")
+
+    reindex_time = best_time(lambda: index.index_playlist(user.playlists[0]))
+    print(f"Reindexing a playlist of {PLAYLIST_SIZE} tracks: {reindex_time * 1000:.1f} ms")
+
+    print(f"{'Query':12} {'Results':>8} {'Time':>10}")
+
+    for query in QUERIES:
+        total = index.search(query)["total"]
+        query_time = best_time(lambda: index.search(query))
+
+        print(f"{query!r:12} {total:8} {query_time * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
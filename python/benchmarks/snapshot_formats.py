@@ -0,0 +1,80 @@
+"""
+Compares the JSON and binary snapshot formats of track files: size, encoding
+time and decoding time (from a file, like when a playlist is first opened).
+
+Usage: python benchmarks/snapshot_formats.py [track count]
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+from models.track_store import TrackStore  # noqa: E402
+from storage import binary_format  # noqa: E402
+from synthetic import make_tracks  # noqa: E402
+
+REPEATS = 5
+
+
+def best_time(fn) -> float:
+    times = []
+
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def encode_json(tracks: TrackStore) -> bytes:
+    # Same encoding as JsonStorage track files
+    return json.dumps(
+        tracks.to_dicts(), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def decode_json(path: Path) -> TrackStore:
+    with path.open("r", encoding="utf-8") as f:
+        return TrackStore.from_dicts(json.load(f))
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    tracks = TrackStore(make_tracks(count))
+
+    formats = {
+        "JSON": (encode_json, decode_json),
+        "binary": (
+            binary_format.encode_tracks,
+            lambda path: binary_format.read_file(path, binary_format.decode_tracks),
+        ),
+    }
+
+    print(f"Tracks: {count}")
+    print(f"{'Format':8} {'Size':>10} {'Encode':>10} {'Decode':>10}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for name, (encode, decode) in formats.items():
+            path = Path(folder) / f"tracks.{name}"
+            data = encode(tracks)
+            path.write_bytes(data)
+
+            # Make sure the format round-trips before timing it
+            assert decode(path) == tracks
+
+            encode_time = best_time(lambda: encode(tracks))
+            decode_time = best_time(lambda: decode(path))
+
+            print(
+                f"{name:8} {len(data) / 2**20:8.1f} MiB"
+                f" {encode_time * 1000:8.0f} ms {decode_time * 1000:8.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Generators of synthetic tracks, users and audio files for the benchmarks.
+
+Audio files are valid WAV and FLAC files with title and artist tags, so they
+are read by TinyTag like real music. WAV files contain silence and are written
+as sparse files, FLAC files only have their metadata blocks (no audio frames),
+so libraries of thousands of files take little time and disk space.
+"""
+
+import struct
+import sys
+from datetime import timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+from models.playlist import Playlist  # noqa: E402
+from models.track import Track  # noqa: E402
+from models.user import User  # noqa: E402
+
+ARTISTS = 500
+FOLDERS = 200
+
+WAV_SAMPLE_RATE = 8000
+FLAC_SAMPLE_RATE = 44100
+
+
+def make_tracks(count: int) -> list:
+    return [
+        Track(
+            f"Track title {i}",
+            f"Artist {i % ARTISTS}",
+            timedelta(seconds=120 + i % 300),
+            f"/home/user/Music/Folder {i % FOLDERS}/{i:06d} - Track title {i}.mp3",
+        )
+        for i in range(count)
+    ]
+
+
+def make_user(track_count: int, playlist_size: int = 1000) -> User:
+    """
+    Returns a user whose playlists hold `track_count` tracks in total.
+    """
+
+    tracks = make_tracks(track_count)
+    playlists = []
+
+    for i, start in enumerate(range(0, track_count, playlist_size)):
+        playlist_tracks = tracks[start : start + playlist_size]
+        playlists.append(
+            Playlist(
+                f"Playlist {i}",
+                sum((track.duration for track in playlist_tracks), timedelta()),
+                f"/home/user/Music/Playlist {i}",
+                playlist_tracks,
+            )
+        )
+
+    return User("benchmark", playlists, [playlist.title for playlist in playlists[:5]])
+
+
+def _riff_chunk(chunk_id: bytes, data: bytes) -> bytes:
+    # Chunks are padded to an even size
+    return chunk_id + struct.pack("<I", len(data)) + data + b"\0" * (len(data) % 2)
+
+
+def write_wav(path: Path, title: str, artist: str, seconds: float) -> None:
+    """
+    Writes a silent 8-bit mono WAV file with a LIST/INFO tag chunk.
+    """
+
+    data_size = int(seconds * WAV_SAMPLE_RATE)
+    padding = data_size % 2
+
+    info = (
+        b"INFO"
+        + _riff_chunk(b"INAM", title.encode("utf-8") + b"\0")
+        + _riff_chunk(b"IART", artist.encode("utf-8") + b"\0")
+    )
+    # PCM, mono, sample rate, byte rate, block align, bits per sample
+    fmt = struct.pack("<HHIIHH", 1, 1, WAV_SAMPLE_RATE, WAV_SAMPLE_RATE, 1, 8)
+
+    chunks = (
+        _riff_chunk(b"fmt ", fmt)
+        + _riff_chunk(b"LIST", info)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+    header = b"RIFF" + struct.pack("<I", 4 + len(chunks) + data_size + padding) + b"WAVE" + chunks
+
+    with open(path, "wb") as f:
+        f.write(header)
+        # Samples of 8-bit silence are zero bytes, so extending the file writes them
+        f.truncate(len(header) + data_size + padding)
+
+
+def _vorbis_string(text: str) -> bytes:
+    data = text.encode("utf-8")
+
+    return struct.pack("<I", len(data)) + data
+
+
+def write_flac(path: Path, title: str, artist: str, seconds: float) -> None:
+    """
+    Writes the metadata of a 16-bit stereo FLAC file: STREAMINFO and a Vorbis comment.
+    """
+
+    samples = int(seconds * FLAC_SAMPLE_RATE)
+
+    # Min/max block size, min/max frame size (unknown), then sample rate (20 bits),
+    # channels - 1 (3 bits), bits per sample - 1 (5 bits), total samples (36 bits), MD5
+    stream_info = struct.pack(">HH", 4096, 4096) + bytes(6)
+    stream_info += ((FLAC_SAMPLE_RATE << 44) | (1 << 41) | (15 << 36) | samples).to_bytes(8, "big")
+    stream_info += bytes(16)
+
+    comment = (
+        _vorbis_string("benchmarks")
+        + struct.pack("<I", 2)
+        + _vorbis_string(f"TITLE={title}")
+        + _vorbis_string(f"ARTIST={artist}")
+    )
+
+    with open(path, "wb") as f:
+        f.write(b"fLaC")
+        # Block type 0 (STREAMINFO), then type 4 (VORBIS_COMMENT) flagged as the last block
+        f.write(bytes([0]) + len(stream_info).to_bytes(3, "big") + stream_info)
+        f.write(bytes([0x80 | 4]) + len(comment).to_bytes(3, "big") + comment)
+
+
+def make_library(folder: Path, count: int) -> List[Path]:
+    """
+    Writes `count` audio files to the folder, alternating between WAV and FLAC.
+    """
+
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    files = []
+
+    for i in range(count):
+        title = f"Track title {i}"
+        artist = f"Artist {i % ARTISTS}"
+        seconds = 120 + i % 300
+
+        if i % 2:
+            path = folder / f"{i:06d} - {title}.flac"
+            write_flac(path, title, artist, seconds)
+        else:
+            path = folder / f"{i:06d} - {title}.wav"
+            write_wav(path, title, artist, seconds)
+
+        files.append(path)
+
+    return files
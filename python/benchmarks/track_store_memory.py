@@ -0,0 +1,44 @@
+"""
+Compares the memory used by a list of Track objects with a TrackStore holding the same tracks.
+
+Usage: python benchmarks/track_store_memory.py [track count]
+"""
+
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
+
+from models.track import Track  # noqa: E402
+from models.track_store import TrackStore  # noqa: E402
+from synthetic import make_tracks  # noqa: E402
+
+
+def measure(build) -> tuple:
+    tracemalloc.start()
+    result = build()
+    # Memory still in use once the intermediate objects are gone
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, size
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # Both are built from JSON like in load_user, so all of their strings are counted
+    data = json.dumps([track.to_dict() for track in make_tracks(count)])
+
+    _, list_size = measure(lambda: [Track.from_dict(d) for d in json.loads(data)])
+    _, store_size = measure(lambda: TrackStore.from_dicts(json.loads(data)))
+
+    print(f"Tracks:      {count}")
+    print(f"List[Track]: {list_size / 2**20:8.1f} MiB ({list_size / count:.0f} B/track)")
+    print(f"TrackStore:  {store_size / 2**20:8.1f} MiB ({store_size / count:.0f} B/track)")
+    print(f"Saved:       {100 * (1 - store_size / list_size):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
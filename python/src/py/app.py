@@ -2,64 +2,154 @@
 Main application module that initializes the Eel and handles communication between Python backend and JavaScript frontend.
 """
 
+import time
+
+# Startup is timed from before the imports, which take a good part of it (see startup.py)
+STARTED = time.perf_counter()
+
 import eel
+import bottle
+from bottle_websocket import websocket
+import gevent
+from gevent.event import Event
+import argparse
+import functools
 import logging
-import copy
-from browsers import browsers
+import json
 from pathlib import Path
 import user_helper
 import state
+import notifications
+import metrics
+import duplicates
+import startup
 from modals import create_playlist_modal, rename_playlist_modal
-from config import USERNAME
-from models.user import User
+from config import (
+    PROGRAM_DATA,
+    USERNAME,
+    WATCH_FOLDERS,
+    SERVER_MODE,
+    SERVER_HOST,
+    SERVER_PORT,
+    SESSION_MAX_USERS,
+    TRACKS_PAGE_SIZE,
+    SEARCH_PAGE_SIZE,
+    METRICS_DUMP_INTERVAL_SECONDS,
+    METRICS_FILE_NAME,
+    STARTUP_REPORT_FILE_NAME,
+)
 from models.playlist import Playlist
 from media_player import MediaPlayer
-
-# The path to the first available browser on the system
-DEFAULT_BROWSER_PATH = next(browsers())["path"]
+from folder_watcher import FolderWatcher
+from user_context import UserContext
+from sessions import SessionRegistry, issue_token
+from persistence import atomic_write
+from unit_of_work import UnitOfWork
 
 # The path to the web directory containing the frontend assets
 WEB_DIR = Path(__file__).resolve().parent.parent / "web"
 
-# Load the current user's data at startup
-state.user = user_helper.load_user(USERNAME)
+# Media player instance, created at startup (see load_library), None in server mode
+media_player: MediaPlayer | None = None
 
-# Initialize the media player instance
-media_player = MediaPlayer()
+# Set once the user's data is loaded, calls from the frontend wait for it
+library_loaded = Event()
 
-eel.init(WEB_DIR)
+# Phases of startup, reported once the window is open and the library loaded
+startup_timer = startup.StartupTimer(STARTED, ("window", "library_loaded"))
 
 
-@eel.expose
-def pick_folder() -> str:
-    return create_playlist_modal.pick_folder()
+def expose(fn):
+    """
+    Exposes a function to the frontend like eel.expose, recording the latency of its calls.
+    Calls are answered once the user's data is loaded.
 
+    In server mode, the frontend passes its session ID (see open_session) before
+    the arguments of every call, and the call runs with the context of the session's user.
+    """
 
-@eel.expose
-def create_playlist(title: str, folder_path: str) -> bool:
-    return create_playlist_modal.create_playlist(title, folder_path)
+    timed = metrics.timed(f"eel.{fn.__name__}")(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # The first call comes from the page, as soon as the window has opened
+        _startup_phase("window")
+        library_loaded.wait()
+
+        if state.sessions is None:
+            return timed(*args, **kwargs)
+
+        if not args:
+            raise ValueError("Missing session ID")
+
+        session_id, *args = args
+
+        with state.use(state.sessions.context(session_id)):
+            return timed(*args, **kwargs)
+
+    return eel.expose(wrapper)
+
+
+def desktop_only(default=None):
+    """
+    Makes an exposed function return `default` in server mode, where the browser is on
+    another machine: there is no folder dialog nor audio device to play tracks on.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if state.sessions is not None:
+                logging.warning(f"'{fn.__name__}' is not available in server mode.")
+                return default
+
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
-@eel.expose
-def rename_playlist(playlist_dict: dict, new_title: str) -> bool:
-    playlist = Playlist.from_dict(playlist_dict)
+def open_session(username: str, token: str | None = None) -> str | None:
+    """
+    Opens a session for the user in server mode, given their token, and returns its ID.
+    Returns None in the desktop application, which has no sessions.
+    """
 
-    return rename_playlist_modal.rename_playlist(playlist, new_title)
+    if state.sessions is None:
+        return None
 
+    return state.sessions.open(username, token)
 
-@eel.expose
-def get_current_track_position() -> float:
-    return media_player.get_current_track_position()
 
+# Called before any session exists, so not wrapped by expose
+eel.expose(metrics.timed("eel.open_session")(open_session))
 
-@eel.expose
-def is_playing() -> bool:
-    return media_player.is_playing()
 
+@expose
+@desktop_only("")
+def pick_folder() -> str:
+    return create_playlist_modal.pick_folder()
+
+
+@expose
+def create_playlist(title: str, folder_path: str) -> bool:
+    return create_playlist_modal.create_playlist(title, folder_path)
+
+
+@expose
+def rename_playlist(playlist_id: str, new_title: str) -> bool:
+    return rename_playlist_modal.rename_playlist(playlist_id, new_title)
+
+
+@expose
+@desktop_only(False)
+def play_playlist(playlist_id: str) -> bool:
+    playlist = state.user.get_playlist(playlist_id)
 
-@eel.expose
-def play_playlist(playlist_dict: dict) -> bool:
-    playlist = Playlist.from_dict(playlist_dict)
+    if playlist is None:
+        logging.error("Playlist not found!")
+        return False
 
     success = media_player.load_playlist(playlist)
 
@@ -69,22 +159,26 @@ def play_playlist(playlist_dict: dict) -> bool:
     return success
 
 
-@eel.expose
+@expose
+@desktop_only(None)
 def set_volume(volume: float) -> None:
     media_player.set_volume(volume)
 
 
-@eel.expose
+@expose
+@desktop_only(None)
 def resume_current_track() -> None:
     media_player.resume()
 
 
-@eel.expose
+@expose
+@desktop_only(None)
 def pause_current_track() -> None:
     media_player.pause()
 
 
-@eel.expose
+@expose
+@desktop_only(False)
 def next_track() -> bool:
     if media_player.next_track():
         media_player.play()
@@ -92,7 +186,8 @@ def next_track() -> bool:
     return False
 
 
-@eel.expose
+@expose
+@desktop_only(False)
 def prev_track() -> bool:
     if media_player.prev_track():
         media_player.play()
@@ -100,84 +195,179 @@ def prev_track() -> bool:
     return False
 
 
-@eel.expose
+@expose
+@desktop_only(None)
 def get_current_track_info():
     return media_player.get_current_track_info()
 
 
-@eel.expose
-def get_user_data() -> User:
+@expose
+@desktop_only(False)
+def enqueue_track(playlist_id: str, track_index: int, play_next: bool = False) -> bool:
+    """
+    Queues a track of the playing playlist, right after the current one if `play_next` is set.
+    """
+
+    playlist = state.user.get_playlist(playlist_id)
+
+    if playlist is None or playlist is not media_player.playlist:
+        logging.error("Only tracks of the playing playlist can be queued!")
+        return False
+
+    return media_player.enqueue(track_index, play_next)
+
+
+@expose
+@desktop_only(None)
+def set_shuffle(shuffle: bool) -> None:
+    media_player.set_shuffle(shuffle)
+
+
+@expose
+@desktop_only(False)
+def set_repeat_mode(mode: str) -> bool:
+    return media_player.set_repeat_mode(mode)
+
+
+@expose
+def get_user_data() -> dict:
+    """
+    Returns the user with playlist summaries; tracks are fetched per page
+    with get_playlist_tracks, and later changes are pushed as deltas.
+    """
+
     logging.info("Retrieving user data.")
 
-    data = state.user.to_dict()
+    data = state.user.to_summary_dict()
 
     return data
 
 
-@eel.expose
-def add_to_recently_played(playlist_dict: dict) -> bool:
-    playlist = Playlist.from_dict(playlist_dict)
+@expose
+def get_playlist_tracks(
+    playlist_id: str, offset: int = 0, limit: int = TRACKS_PAGE_SIZE
+) -> dict | None:
+    playlist = state.user.get_playlist(playlist_id)
 
-    logging.info(f"Adding '{playlist.title}' playlist to recently played.")
+    if playlist is None:
+        logging.error("Playlist not found!")
+        return None
+
+    offset = max(0, offset)
+    limit = max(0, min(limit, TRACKS_PAGE_SIZE))
+
+    return {
+        "playlist_id": playlist.id,
+        "offset": offset,
+        "total": len(playlist.tracks),
+        "tracks": playlist.tracks.to_dicts(offset, offset + limit),
+    }
+
+
+@expose
+def search(query: str, offset: int = 0, limit: int = SEARCH_PAGE_SIZE) -> dict:
+    """
+    Returns a page of tracks and playlists matching the query, best matches first.
+    """
+
+    with state.search_index_lock:
+        if not state.search_index.built:
+            state.search_index.build(state.user)
 
-    recently_played_playlists_backup = copy.deepcopy(
-        state.user.recently_played_playlists
+    offset = max(0, offset)
+    limit = max(0, min(limit, SEARCH_PAGE_SIZE))
+
+    return state.search_index.search(query, offset, limit)
+
+
+@expose
+def find_duplicates() -> list:
+    """
+    Returns groups of tracks with the same audio file content across all playlists,
+    the most space taken by copies first. Files are hashed on gevent's thread pool.
+    """
+
+    threadpool = gevent.get_hub().threadpool
+
+    return duplicates.find_duplicates(
+        state.user,
+        state.manifests,
+        state.hash_cache,
+        run_blocking=lambda fn, *args: threadpool.apply(fn, args),
     )
 
-    state.user.add_to_recently_played(playlist)
 
-    if not user_helper.save_user(state.user):
-        logging.error("Failed to save user data! Rolling back changes.")
-        state.user.recently_played_playlists = (
-            recently_played_playlists_backup
-        )
+@expose
+def add_to_recently_played(playlist_id: str) -> bool:
+    playlist = state.user.get_playlist(playlist_id)
+
+    if playlist is None:
+        logging.error("Playlist not found!")
         return False
 
+    logging.info(f"Adding '{playlist.title}' playlist to recently played.")
+
+    user = state.user
+
+    with state.changes_lock:
+        changes = UnitOfWork(user, state.unsaved_changes)
+        changes.add_to_recently_played(playlist)
+
+    if not changes.save(lambda: user_helper.storage.save_recently_played(user)):
+        return False
+
+    notifications.recently_played_updated(state.user)
+
     logging.info(f"Playlist '{playlist.title}' has been added to recently played.")
     return True
 
 
-@eel.expose
-def remove_playlist(playlist_dict: dict) -> bool:
-    playlist = Playlist.from_dict(playlist_dict)
+@expose
+def remove_playlist(playlist_id: str) -> bool:
+    playlist = state.user.get_playlist(playlist_id)
 
-    logging.info(f"Removing '{playlist.title}' playlist.")
-
-    try:
-        playlist_index = state.user.playlists.index(playlist)
-    except ValueError:
+    if playlist is None:
         logging.error("Playlist not found!")
         return False
 
-    playlist_backup = copy.deepcopy(state.user.playlists[playlist_index])
+    logging.info(f"Removing '{playlist.title}' playlist.")
+
+    user = state.user
 
-    state.user.remove_playlist(playlist)
+    with state.changes_lock:
+        changes = UnitOfWork(user, state.unsaved_changes)
+        removed = changes.remove_playlist(playlist)
 
-    if not user_helper.save_user(state.user):
-        logging.error("Failed to save user data! Rolling back changes.")
-        state.user.playlists.insert(playlist_index, playlist_backup)
+    if not removed:
+        changes.discard()
         return False
 
+    if not changes.save(lambda: user_helper.storage.remove_playlist(user, playlist)):
+        return False
+
+    if state.folder_watcher is not None and not any(
+        p.folder_path == playlist.folder_path for p in state.user.playlists
+    ):
+        state.folder_watcher.unwatch(playlist.folder_path)
+
+    state.search_index.remove_playlist(playlist.id)
+    notifications.playlist_removed(playlist.id)
+
     logging.info(f"Playlist '{playlist.title}' has been removed.")
     return True
 
 
-@eel.expose
-def move_track(playlist_dict: dict, from_index: int, to_index: int) -> bool:
-    playlist = Playlist.from_dict(playlist_dict)
+@expose
+def move_track(playlist_id: str, from_index: int, to_index: int) -> bool:
+    targeted_playlist = state.user.get_playlist(playlist_id)
 
-    logging.info(
-        f"Moving track from {from_index} to {to_index} in playlist '{playlist.title}'."
-    )
-
-    try:
-        playlist_index = state.user.playlists.index(playlist)
-    except ValueError:
+    if targeted_playlist is None:
         logging.error("Playlist not found!")
         return False
 
-    targeted_playlist = state.user.playlists[playlist_index]
-    playlist_backup = copy.deepcopy(state.user.playlists[playlist_index])
+    logging.info(
+        f"Moving track from {from_index} to {to_index} in playlist '{targeted_playlist.title}'."
+    )
 
     # Check indices
     if (
@@ -190,20 +380,274 @@ def move_track(playlist_dict: dict, from_index: int, to_index: int) -> bool:
         return False
 
     # Move track
-    track = targeted_playlist.tracks.pop(from_index)
-    targeted_playlist.tracks.insert(to_index, track)
+    user = state.user
+
+    with state.changes_lock:
+        changes = UnitOfWork(user, state.unsaved_changes)
+        changes.move_track(targeted_playlist, from_index, to_index)
 
-    if not user_helper.save_user(state.user):
-        logging.error("Failed to save user data! Rolling back changes.")
-        targeted_playlist = playlist_backup
+    if not changes.save(
+        lambda: user_helper.storage.move_track(user, targeted_playlist, from_index, to_index)
+    ):
         return False
 
+    if media_player is not None:
+        media_player.track_moved(targeted_playlist, from_index, to_index)
+
     logging.info(f"Track has been moved in playlist '{targeted_playlist.title}'.")
     return True
 
 
-eel.start(
-    "index.html",
-    mode="custom",
-    cmdline_args=[DEFAULT_BROWSER_PATH, "--app=http://localhost:8000/index.html"],
-)
+def refresh_library(playlists: list[Playlist] | None = None) -> None:
+    """
+    Synchronises playlists with their folders without blocking the UI.
+    Disk access runs on gevent's thread pool, and every refreshed playlist is
+    pushed to the frontend as soon as it is ready.
+    """
+
+    threadpool = gevent.get_hub().threadpool
+
+    with state.refresh_lock:
+        user_helper.refresh_user(
+            state.user,
+            state.tag_cache,
+            state.manifests,
+            on_playlist_refreshed=_on_playlist_refreshed,
+            run_blocking=lambda fn, *args: threadpool.apply(fn, args),
+            playlists=playlists,
+            changes_lock=state.changes_lock,
+        )
+
+    # Measure new and modified files for volume normalization, in the background
+    for playlist in playlists if playlists is not None else state.user.playlists:
+        state.loudness.schedule(state.manifests.get(playlist.folder_path))
+
+
+def _on_playlist_refreshed(playlist: Playlist) -> None:
+    if media_player is not None:
+        media_player.playlist_changed(playlist)
+
+    state.search_index.index_playlist(playlist)
+    notifications.playlist_tracks_changed(playlist)
+
+
+def refresh_folder(folder_path: str) -> None:
+    """
+    Applies changes reported by the folder watcher to the playlists using the folder.
+    """
+
+    playlists = [p for p in state.user.playlists if p.folder_path == folder_path]
+
+    if playlists:
+        logging.info(f"Detected changes in folder: {folder_path}.")
+        refresh_library(playlists)
+
+
+def start_library_sync() -> None:
+    """
+    Refreshes all playlists once, then keeps them in sync by watching their folders.
+    """
+
+    refresh_library()
+
+    if not WATCH_FOLDERS:
+        return
+
+    loop = gevent.get_hub().loop
+
+    # The watcher reports changes from its own thread, hand them over to the event loop
+    folder_watcher = FolderWatcher(
+        lambda folder_path: loop.run_callback_threadsafe(
+            eel.spawn, refresh_folder, folder_path
+        )
+    )
+    state.current().folder_watcher = folder_watcher
+
+    for playlist in state.user.playlists:
+        folder_watcher.watch(playlist.folder_path)
+
+    folder_watcher.start()
+
+
+@expose
+@desktop_only({})
+def get_metrics() -> dict:
+    """
+    Returns the counters and latency histograms collected since startup.
+    Not available in server mode, where they are collected across all users.
+    """
+
+    return metrics.snapshot()
+
+
+def dump_metrics() -> None:
+    """
+    Writes the collected metrics to the user's folder every METRICS_DUMP_INTERVAL_SECONDS.
+    """
+
+    path = PROGRAM_DATA / USERNAME / METRICS_FILE_NAME
+
+    while True:
+        gevent.sleep(METRICS_DUMP_INTERVAL_SECONDS)
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = json.dumps(metrics.snapshot(), indent=4).encode("utf-8")
+            gevent.get_hub().threadpool.apply(atomic_write, (path, data))
+        except Exception as e:
+            logging.error(f"Error writing metrics: {e}")
+
+
+def load_library() -> None:
+    """
+    Loads the current user's saved data while the window opens, then starts keeping
+    playlists in sync with their folders (see refresh_library).
+    """
+
+    global media_player
+
+    try:
+        state.default = UserContext.load(USERNAME)
+
+        # The audio device is opened when the first track is played
+        media_player = MediaPlayer(
+            publish=notifications.playback_event, gain=state.loudness.gain
+        )
+
+    except Exception as e:
+        # Calls from the frontend would wait forever, stop the application like before the window opened
+        logging.critical(f"Failed to load user data: {e}")
+        raise SystemExit(1)
+
+    library_loaded.set()
+    _startup_phase("library_loaded")
+
+    start_library_sync()
+
+
+def _startup_phase(phase: str) -> None:
+    if not startup_timer.mark(phase):
+        return
+
+    logging.info(startup_timer.report())
+
+    path = PROGRAM_DATA / USERNAME / STARTUP_REPORT_FILE_NAME
+    gevent.get_hub().threadpool.spawn(startup_timer.save, path)
+
+
+def _on_user_loaded(context: UserContext) -> None:
+    # Folders are not watched in server mode, they are synchronised when their user is loaded
+    with state.use(context):
+        state.spawn(refresh_library)
+
+
+@bottle.route("/events", apply=[websocket])
+def _session_events(ws) -> None:
+    """
+    Event socket of a browser tab in server mode, updates of its user are pushed to it.
+    """
+
+    session_id = bottle.request.query.session
+
+    if state.sessions is None or not state.sessions.attach(session_id, ws):
+        return
+
+    try:
+        # Nothing is expected from the tab, wait for it to close the socket
+        while ws.receive() is not None:
+            pass
+    finally:
+        state.sessions.detach(session_id, ws)
+
+
+def start_server(host: str, port: int, max_users: int) -> None:
+    """
+    Serves the frontend to browsers of several users, without opening a window.
+    Users are loaded by their first call and unloaded when idle (see sessions.py).
+    """
+
+    state.sessions = SessionRegistry(
+        # No loudness analysis, tracks are not played in server mode
+        lambda username: UserContext.load(username, loudness_mode="off"),
+        max_users=max_users,
+        on_loaded=_on_user_loaded,
+    )
+
+    library_loaded.set()
+
+    logging.info(f"Serving on http://{host}:{port}/index.html?user=<name>&token=<token>")
+
+    try:
+        # The server keeps running when the last browser tab is closed
+        eel.start(
+            "index.html",
+            mode=None,
+            host=host,
+            port=port,
+            close_callback=lambda page, sockets: None,
+        )
+    finally:
+        state.sessions.close()
+        user_helper.storage.flush()
+
+
+def main() -> None:
+    startup_timer.mark("imports")
+
+    parser = argparse.ArgumentParser(description="PlaylistHub")
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        default=SERVER_MODE,
+        help="serve several users from a browser instead of opening a window",
+    )
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--max-users", type=int, default=SESSION_MAX_USERS)
+    parser.add_argument(
+        "--add-user",
+        metavar="NAME",
+        help="issue a new token for NAME to open server sessions with, print it and exit",
+    )
+    args = parser.parse_args()
+
+    if args.add_user:
+        print(issue_token(args.add_user))
+        return
+
+    if args.server:
+        eel.init(WEB_DIR, allowed_extensions=[".js"])
+
+        if METRICS_DUMP_INTERVAL_SECONDS > 0:
+            eel.spawn(dump_metrics)
+
+        start_server(args.host, args.port, args.max_users)
+        return
+
+    browser_path = startup.browser_path()
+    startup_timer.mark("browser_lookup")
+
+    # Only JS files expose functions to Python, parsing the other files only slows startup
+    eel.init(WEB_DIR, allowed_extensions=[".js"])
+    startup_timer.mark("eel_init")
+
+    # Runs once eel.start has started the server and the browser
+    eel.spawn(load_library)
+
+    if METRICS_DUMP_INTERVAL_SECONDS > 0:
+        eel.spawn(dump_metrics)
+
+    try:
+        eel.start(
+            "index.html",
+            mode="custom",
+            cmdline_args=[browser_path, "--app=http://localhost:8000/index.html"],
+        )
+    finally:
+        create_playlist_modal.folder_picker.close()
+        user_helper.storage.flush()
+
+
+# Loudness analysis starts worker processes importing this module, only start the application once
+if __name__ == "__main__":
+    main()
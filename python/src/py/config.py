@@ -4,15 +4,126 @@ Global configuration module for the application.
 Contains constants and system-specific settings used across different modules.
 """
 
+import getpass
 import os
 from pathlib import Path
 
 # Supported audio file extensions
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".flac", ".aac", ".m4a", ".ogg"}
 
-# Application data directory: OS-agnostic path using PROGRAMDATA environment variable
-PROGRAM_DATA = Path("C:/ProgramData/PlaylistHub")
+# Application data directory, can be moved with the PLAYLISTHUB_DATA_DIR environment variable
+# (e.g. for a server, or a test instance)
+PROGRAM_DATA = Path(os.environ.get("PLAYLISTHUB_DATA_DIR", "C:/ProgramData/PlaylistHub"))
+
+
+def _login_name() -> str:
+    try:
+        return os.getlogin()
+    except OSError:
+        # No controlling terminal, e.g. when running as a service
+        return getpass.getuser()
+
 
 # Name of the currently logged-in user (used for identifying user-specific data)
-USERNAME = os.getlogin()
+USERNAME = _login_name()
+
+# Backend storing user data: "json" (user.json), "binary" (user.bin, converted from user.json)
+# or "sqlite" (user.db, migrated from user.json)
+STORAGE_BACKEND = "json"
+
+# Minimum time between two writes of the same user data file. Saves requested while a file
+# is being written are always merged into its next write; a longer window merges more of
+# them (e.g. a burst of track moves), but every change made during it waits for the window to end
+SAVE_COALESCE_SECONDS = 0.05
+
+# Name of the file, stored next to user.json, holding cached audio tag metadata
+TAG_CACHE_FILE_NAME = "tag_cache.json"
+
+# Name of the file, stored next to user.json, holding manifests of playlist folders
+MANIFESTS_FILE_NAME = "manifests.json"
+
+# Name of the file, stored next to user.json, holding content hashes of audio files
+HASH_CACHE_FILE_NAME = "hash_cache.json"
+
+# Maximum number of files kept in the tag cache (least recently used entries are evicted first)
+TAG_CACHE_MAX_ENTRIES = 200_000
+
+# How deep subfolders of playlist folders are scanned (e.g. artist/album = 2), None for no limit
+SCAN_MAX_DEPTH = None
+
+# Names of files and folders skipped by scans (glob patterns): hidden files such as
+# macOS "._" metadata files, and system folders of Windows and NAS devices
+SCAN_EXCLUDE_PATTERNS = (".*", "$RECYCLE.BIN", "System Volume Information", "@eaDir")
+
+# Number of worker threads reading audio tags in parallel during library scans
+SCAN_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Whether playlist folders are watched for changes while the application is running
+WATCH_FOLDERS = True
+
+# Quiet period after the last change in a folder before its playlist is updated
+WATCH_DEBOUNCE_SECONDS = 1.0
+
+# How often folders are checked when the operating system cannot report changes
+WATCH_POLL_INTERVAL_SECONDS = 5.0
+
+# Number of tracks sent to the frontend per page of a playlist
+TRACKS_PAGE_SIZE = 200
+
+# Maximum number of search results sent to the frontend per page
+SEARCH_PAGE_SIZE = 50
+
+# Playback position updates pushed to the frontend per second while a track is playing
+PLAYBACK_TICK_RATE = 1.0
+
+# Whether the previous track is preloaded too (the next one always is), for instant skipping back
+PRELOAD_PREVIOUS_TRACK = False
+
+# How often collected metrics (see metrics.py) are written to the user's folder, 0 disables it
+METRICS_DUMP_INTERVAL_SECONDS = 0
+
+# Name of the file, stored next to user.json, the metrics are written to
+METRICS_FILE_NAME = "metrics.json"
+
+# Name of the file, stored in PROGRAM_DATA, caching the path of the browser the window is opened in
+BROWSER_CACHE_FILE_NAME = "browser.json"
+
+# Name of the file, stored next to user.json, the durations of the last startup's phases are written to
+STARTUP_REPORT_FILE_NAME = "startup.json"
+
+# Volume normalization of tracks: "track" (every track to the same loudness),
+# "album" (tracks of a folder together, keeping their differences) or "off"
+LOUDNESS_NORMALIZATION = "album"
+
+# Loudness (dB relative to full scale) tracks are normalized to; louder tracks are
+# turned down, quieter ones are left as they are (playback volume cannot go above 100%)
+LOUDNESS_TARGET_DB = -18.0
+
+# Number of worker processes measuring the loudness of tracks in the background
+LOUDNESS_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+
+# Name of the file, stored next to user.json, holding measured loudness of audio files
+LOUDNESS_CACHE_FILE_NAME = "loudness_cache.json"
+
+# Whether the backend serves several users over the network without opening a window
+# (see sessions.py), also enabled with the --server command line option
+SERVER_MODE = False
+
+# Address and port the server listens on in server mode, only this machine by default
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+
+# Folder holding a folder of music for each user in server mode (SERVER_MUSIC_ROOT/<username>),
+# users can only create playlists from folders inside their own, can be moved with the
+# PLAYLISTHUB_MUSIC_DIR environment variable
+SERVER_MUSIC_ROOT = Path(os.environ.get("PLAYLISTHUB_MUSIC_DIR", "C:/PlaylistHub/Music"))
+
+# Name of the file, stored next to user.json, holding the hash of the token the user
+# opens server sessions with (issued with the --add-user command line option)
+SERVER_TOKEN_FILE_NAME = "server_token"
+
+# Maximum number of users whose data is kept loaded in server mode (least recently used are unloaded)
+SESSION_MAX_USERS = 32
 
+# Sessions and loaded users idle for this long are dropped in server mode
+SESSION_IDLE_SECONDS = 600
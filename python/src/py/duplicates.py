@@ -0,0 +1,277 @@
+"""
+Module implementing detection of audio files with the same content across playlists.
+
+Files are compared in three steps, each one only for the files the previous one
+could not tell apart:
+1. size, known from the folder manifests without touching the files,
+2. a hash of the size and the first and last HEAD_TAIL_BYTES of the file,
+3. a hash of the whole file, read through mmap in HASH_CHUNK_BYTES chunks.
+
+Hashing runs on a thread pool (hashlib releases the GIL while hashing), and
+hashes are cached by file path and validated against the file's size and
+modification time, so unchanged files are never read again.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import metrics
+from config import SCAN_WORKERS
+from folder_sync import ManifestStore
+from models.user import User
+from persistence import JsonCache
+
+# Bytes hashed at the start and at the end of a file by the pre-filter
+HEAD_TAIL_BYTES = 64 * 1024
+
+# Bytes of the mapped file passed to the hash at once
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def quick_hash(file_path: str, size: int) -> str:
+    """
+    Hashes the size and the first and last HEAD_TAIL_BYTES of the file.
+    Files up to twice that size are hashed whole, so this is also their full hash.
+    """
+
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+
+    with open(file_path, "rb") as f:
+        digest.update(f.read(HEAD_TAIL_BYTES))
+
+        if size > HEAD_TAIL_BYTES:
+            f.seek(max(HEAD_TAIL_BYTES, size - HEAD_TAIL_BYTES))
+            digest.update(f.read(HEAD_TAIL_BYTES))
+
+    return digest.hexdigest()
+
+
+def full_hash(file_path: str) -> str:
+    """
+    Hashes the whole content of a (non-empty) file.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        # Slices of a memoryview are not copied, unlike slices of the mmap itself
+        with memoryview(mapped) as view:
+            for offset in range(0, len(view), HASH_CHUNK_BYTES):
+                digest.update(view[offset : offset + HASH_CHUNK_BYTES])
+
+            metrics.increment("dedup.hashed_bytes", len(view))
+
+    return digest.hexdigest()
+
+
+class HashCache(JsonCache):
+    description = "hash cache"
+
+    def __init__(self, cache_path: Path):
+        super().__init__(cache_path)
+        # file_path -> [size, mtime_ns, quick_hash, full_hash or None]
+        # Files are hashed on several worker threads at once, under _lock
+        self._entries: Dict[str, list] = {}
+
+    def quick_hash(self, file_path: str, size: int, mtime_ns: int) -> str:
+        entry = self._entry(file_path, size, mtime_ns)
+
+        if entry is not None:
+            return entry[2]
+
+        value = quick_hash(file_path, size)
+
+        with self._lock:
+            self._entries[file_path] = [size, mtime_ns, value, None]
+            self._dirty = True
+
+        return value
+
+    def full_hash(self, file_path: str, size: int, mtime_ns: int) -> str:
+        entry = self._entry(file_path, size, mtime_ns)
+
+        if entry is not None and entry[3] is not None:
+            return entry[3]
+
+        quick = self.quick_hash(file_path, size, mtime_ns)
+
+        if size <= 2 * HEAD_TAIL_BYTES:
+            # The quick hash already covers the whole file
+            return quick
+
+        value = full_hash(file_path)
+
+        with self._lock:
+            self._entries[file_path] = [size, mtime_ns, quick, value]
+            self._dirty = True
+
+        return value
+
+    def _entry(self, file_path: str, size: int, mtime_ns: int) -> list | None:
+        with self._lock:
+            entry = self._entries.get(file_path)
+
+        if entry is None or entry[0] != size or entry[1] != mtime_ns:
+            return None
+
+        metrics.increment("dedup.hash_cache_hits")
+
+        return entry
+
+    def prune(self, file_paths: set) -> None:
+        """
+        Drops entries of files that no longer belong to any playlist.
+        """
+
+        with self._lock:
+            for file_path in list(self._entries):
+                if file_path not in file_paths:
+                    del self._entries[file_path]
+                    self._dirty = True
+
+
+def content_groups(
+    files: Dict[str, list | None],
+    cache: HashCache,
+    workers: int = SCAN_WORKERS,
+) -> List[Tuple[int, List[str]]]:
+    """
+    Groups files (path -> [size, mtime_ns], None if unknown) with the same content.
+    Returns the size and paths of groups of at least two files;
+    empty and unreadable files are skipped.
+    """
+
+    with metrics.span("dedup.find"):
+        by_size: Dict[int, List[Tuple[str, int]]] = defaultdict(list)
+
+        for file_path, known in files.items():
+            if known is None:
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+
+                known = [stat.st_size, stat.st_mtime_ns]
+
+            if known[0] > 0:
+                by_size[known[0]].append((file_path, known[1]))
+
+        candidates = [
+            (file_path, size, mtime_ns)
+            for size, group in by_size.items()
+            if len(group) > 1
+            for file_path, mtime_ns in group
+        ]
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            groups = _group_by(executor, cache.quick_hash, candidates)
+            candidates = [candidate for group in groups for candidate in group]
+            groups = _group_by(executor, cache.full_hash, candidates)
+
+        metrics.increment("dedup.files", len(files))
+
+        return [(group[0][1], [file_path for file_path, _, _ in group]) for group in groups]
+
+
+def _group_by(
+    executor: ThreadPoolExecutor,
+    hash_file: Callable[[str, int, int], str],
+    candidates: List[Tuple[str, int, int]],
+) -> List[List[Tuple[str, int, int]]]:
+    """
+    Hashes the candidates (path, size, mtime_ns) and returns the groups
+    of at least two of them with the same hash.
+    """
+
+    def hash_candidate(candidate: Tuple[str, int, int]) -> str | None:
+        try:
+            return hash_file(*candidate)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipped file '{candidate[0]}': {e}")
+            return None
+
+    by_hash: Dict[str, list] = defaultdict(list)
+
+    for candidate, value in zip(candidates, executor.map(hash_candidate, candidates)):
+        if value is not None:
+            by_hash[value].append(candidate)
+
+    return [group for group in by_hash.values() if len(group) > 1]
+
+
+def find_duplicates(
+    user: User,
+    manifests: ManifestStore | None,
+    cache: HashCache,
+    run_blocking: Callable[..., Any] | None = None,
+) -> List[dict]:
+    """
+    Returns groups of tracks, across all of the user's playlists, whose files have
+    the same content (or are the same file), the most space taken by copies first.
+
+    Hashing goes through `run_blocking(fn, *args)`, like in user_helper.refresh_user.
+    """
+
+    if run_blocking is None:
+        # Imported here, user_helper itself imports this module
+        from user_helper import _run_inline
+
+        run_blocking = _run_inline
+
+    # Snapshot the tracks first, playlists may change while files are being hashed
+    occurrences: Dict[str, List[dict]] = defaultdict(list)
+    files: Dict[str, list | None] = {}
+
+    for playlist in user.playlists:
+        manifest = manifests.get(playlist.folder_path) if manifests else {}
+
+        for index, track in enumerate(playlist.tracks):
+            file_path = track.file_path
+
+            occurrences[file_path].append(
+                {
+                    "playlist_id": playlist.id,
+                    "playlist_title": playlist.title,
+                    "track_id": track.id,
+                    "index": index,
+                    "title": track.title,
+                    "artist": track.artist,
+                    "file_path": file_path,
+                }
+            )
+            files[file_path] = manifest.get(file_path)
+
+    groups = run_blocking(content_groups, files, cache)
+
+    cache.prune(set(files))
+    run_blocking(cache.save)
+
+    # The same file in several playlists (e.g. of nested folders) is a duplicate as well
+    grouped = {file_path for _, group in groups for file_path in group}
+    groups += [
+        (files[file_path][0] if files[file_path] else 0, [file_path])
+        for file_path, tracks in occurrences.items()
+        if len(tracks) > 1 and file_path not in grouped
+    ]
+
+    results = []
+
+    for size, group in groups:
+        tracks = [track for file_path in group for track in occurrences[file_path]]
+
+        results.append(
+            {
+                "size": size,
+                "wasted_bytes": size * (len(tracks) - 1),
+                "tracks": tracks,
+            }
+        )
+
+    results.sort(key=lambda group: group["wasted_bytes"], reverse=True)
+
+    return results
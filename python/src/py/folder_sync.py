@@ -0,0 +1,228 @@
+"""
+Module implementing incremental synchronisation of playlists with their folders.
+
+For every playlist folder a manifest of (path -> size, mtime) is kept. A single
+os.scandir walk over the folder tree is compared against it to find added,
+removed and modified files, and only those are applied to the playlist.
+
+Scanning and tag reading (sync_folder) only touch the disk and may run on a
+worker thread; apply_changes mutates the playlist and must run where the rest
+of the application state is modified.
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+from models.playlist import Playlist
+from models.track import Track
+from persistence import JsonCache
+from scanner import iter_tracks, scan_tracks, walk_audio_files
+from tag_cache import TagCache
+
+# file_path -> [size, mtime_ns]
+Manifest = Dict[str, list]
+
+
+@dataclass
+class FolderChanges:
+    added: List[Path] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[Path] = field(default_factory=list)
+    # Manifest describing the folder after the changes are applied
+    manifest: Manifest = field(default_factory=dict)
+    # Metadata of added and modified files, filled by read_changes or sync_folder
+    added_tracks: List[Track] = field(default_factory=list)
+    modified_tracks: List[Track] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+class ManifestStore(JsonCache):
+    """
+    Persistent collection of folder manifests, keyed by folder path.
+    """
+
+    description = "folder manifest"
+
+    def __init__(self, cache_path: Path):
+        super().__init__(cache_path)
+        self._entries: Dict[str, Manifest] = {}
+
+    def get(self, folder_path: str) -> Manifest:
+        return self._entries.get(folder_path, {})
+
+    def set(self, folder_path: str, manifest: Manifest) -> None:
+        if self._entries.get(folder_path) == manifest:
+            return
+
+        self._entries[folder_path] = manifest
+        self._dirty = True
+
+    def prune(self, folder_paths: set) -> None:
+        """
+        Drops manifests of folders that no longer belong to any playlist.
+        """
+
+        for folder_path in list(self._entries):
+            if folder_path not in folder_paths:
+                del self._entries[folder_path]
+                self._dirty = True
+
+
+def scan_folder(folder: Path | str) -> Tuple[List[Path], Manifest]:
+    """
+    Lists audio files of the folder and its subfolders (see scanner.walk_audio_files).
+    Returns the files in walk order together with their manifest.
+    """
+
+    audio_files: List[Path] = []
+    manifest: Manifest = {}
+
+    for entry in walk_audio_files(folder):
+        audio_files.append(Path(entry.path))
+        manifest[entry.path] = manifest_entry(entry)
+
+    return audio_files, manifest
+
+
+def manifest_entry(entry: os.DirEntry) -> list:
+    # DirEntry caches the stat result, no extra system call on Windows
+    stat = entry.stat()
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def known_files(playlist: Playlist, manifest: Manifest) -> Dict[str, list | None]:
+    """
+    Snapshots the playlist's files together with their last known size and mtime.
+
+    Tracks without a manifest entry (e.g. from before manifests existed)
+    are mapped to None and treated as unchanged as long as their file is present.
+
+    Tracks that are not loaded yet are not read: the manifest describes the
+    playlist as it was saved, so its files are used instead. This also counts
+    unreadable files of the folder as known until the tracks are loaded.
+    """
+
+    if not playlist.tracks.loaded and manifest:
+        return dict(manifest)
+
+    return {track.file_path: manifest.get(track.file_path) for track in playlist.tracks}
+
+
+def diff_folder(folder_path: str, known: Dict[str, list | None]) -> FolderChanges:
+    """
+    Compares the folder's content with the snapshot returned by known_files.
+    """
+
+    changes = FolderChanges()
+
+    for _ in _walk_changes(folder_path, known, changes):
+        pass
+
+    return changes
+
+
+def sync_folder(
+    folder_path: str, known: Dict[str, list | None], tag_cache: TagCache | None = None
+) -> FolderChanges:
+    """
+    Compares the folder's content with the snapshot returned by known_files and reads
+    the metadata of added and modified files, like diff_folder and read_changes.
+    Files go to tag reading as the walk finds them, instead of after the whole tree was listed.
+    """
+
+    changes = FolderChanges()
+
+    for track in iter_tracks(_walk_changes(folder_path, known, changes), tag_cache):
+        if track.file_path in known:
+            changes.modified_tracks.append(track)
+        else:
+            changes.added_tracks.append(track)
+
+    return changes
+
+
+def _walk_changes(
+    folder_path: str, known: Dict[str, list | None], changes: FolderChanges
+) -> Iterator[os.DirEntry]:
+    """
+    Walks the folder, filling the manifest and the added, modified and (at the end)
+    removed files of `changes`, and yields entries of added and modified files as they are found.
+    """
+
+    for entry in walk_audio_files(Path(folder_path)):
+        audio_file = Path(entry.path)
+        file_path = str(audio_file)
+        current = changes.manifest[entry.path] = manifest_entry(entry)
+
+        if file_path not in known:
+            changes.added.append(audio_file)
+            yield entry
+            continue
+
+        previous = known[file_path]
+
+        if previous is not None and previous != current:
+            changes.modified.append(audio_file)
+            yield entry
+
+    changes.removed = [file_path for file_path in known if file_path not in changes.manifest]
+
+
+def read_changes(changes: FolderChanges, tag_cache: TagCache | None = None) -> None:
+    """
+    Reads the metadata of added and modified files.
+    """
+
+    changes.added_tracks = scan_tracks(changes.added, tag_cache)
+    changes.modified_tracks = scan_tracks(changes.modified, tag_cache)
+
+
+def apply_changes(playlist: Playlist, changes: FolderChanges) -> None:
+    """
+    Applies the detected changes to the playlist.
+    The duration is updated by the differences only, without summing all tracks.
+    """
+
+    duration = playlist.duration
+
+    if changes.removed:
+        removed = set(changes.removed)
+
+        def keep(track) -> bool:
+            nonlocal duration
+
+            if track.file_path in removed:
+                duration -= track.duration
+                return False
+
+            return True
+
+        playlist.tracks.retain(keep)
+
+    if changes.modified_tracks:
+        positions = {track.file_path: i for i, track in enumerate(playlist.tracks)}
+
+        for new_track in changes.modified_tracks:
+            i = positions.get(new_track.file_path)
+
+            # The track may have been removed while the folder was being scanned
+            if i is None:
+                continue
+
+            old_track = playlist.tracks[i]
+
+            # Retagged files keep their identity
+            new_track.id = old_track.id
+            duration += new_track.duration - old_track.duration
+            playlist.tracks[i] = new_track
+
+    for new_track in changes.added_tracks:
+        playlist.tracks.append(new_track)
+        duration += new_track.duration
+
+    playlist.duration = max(duration, timedelta())
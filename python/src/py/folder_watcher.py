@@ -0,0 +1,327 @@
+"""
+Module implementing a watcher that reports changes in playlist folders.
+
+On Linux the kernel's inotify interface is used, with a watch on every
+subfolder (scanned like playlist folders, see scanner.walk_folders), elsewhere
+folders are polled periodically. Bursts of events (e.g. copying a whole album) are
+debounced, so every change is reported once the folder has been quiet
+for a while.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+from config import (
+    AUDIO_EXTENSIONS,
+    SCAN_MAX_DEPTH,
+    WATCH_DEBOUNCE_SECONDS,
+    WATCH_POLL_INTERVAL_SECONDS,
+)
+from folder_sync import Manifest, scan_folder
+from scanner import exclude_matcher, walk_folders
+
+# inotify event masks, see <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class FolderWatcher:
+    """
+    Watches folders on a background thread and calls `on_change(folder_path)`
+    from that thread once a folder's content has settled.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[str], None],
+        debounce: float = WATCH_DEBOUNCE_SECONDS,
+        poll_interval: float = WATCH_POLL_INTERVAL_SECONDS,
+    ):
+        self.on_change = on_change
+        self.debounce = debounce
+        self._backend = _create_backend(poll_interval)
+        # folder_path -> time at which its change should be reported
+        self._pending: Dict[str, float] = {}
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def watch(self, folder_path: str) -> None:
+        try:
+            self._backend.add(folder_path)
+        except Exception as e:
+            logging.warning(f"Cannot watch folder '{folder_path}': {e}")
+
+    def unwatch(self, folder_path: str) -> None:
+        self._backend.remove(folder_path)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+
+        logging.info(f"Starting folder watcher ({type(self._backend).__name__}).")
+
+        self._thread = threading.Thread(
+            target=self._run, name="folder-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._backend.interrupt()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self._backend.close()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            now = time.monotonic()
+
+            if self._pending:
+                timeout = max(0.0, min(self._pending.values()) - now)
+            else:
+                timeout = self._backend.idle_timeout
+
+            try:
+                changed = self._backend.wait(timeout)
+            except Exception as e:
+                logging.error(f"Folder watcher failed: {e}")
+                changed = []
+
+            now = time.monotonic()
+
+            # Every new event postpones the report, debouncing bursts
+            for folder_path in changed:
+                self._pending[folder_path] = now + self.debounce
+
+            for folder_path, deadline in list(self._pending.items()):
+                if deadline > now:
+                    continue
+
+                del self._pending[folder_path]
+
+                try:
+                    self.on_change(folder_path)
+                except Exception as e:
+                    logging.error(f"Failed to handle change of '{folder_path}': {e}")
+
+
+class _InotifyBackend:
+    # Wake up regularly to notice that the watcher has been stopped
+    idle_timeout = 0.5
+
+    def __init__(self, libc: ctypes.CDLL):
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._lock = threading.Lock()
+        self._is_excluded = exclude_matcher()
+        # Watch descriptor -> watched folder, path and depth of the (sub)folder it watches
+        self._folders_by_wd: Dict[int, Tuple[str, str, int]] = {}
+        self._wds_by_folder: Dict[str, Set[int]] = {}
+
+    def add(self, folder_path: str) -> None:
+        with self._lock:
+            if folder_path in self._wds_by_folder:
+                return
+
+            self._wds_by_folder[folder_path] = set()
+
+        try:
+            self._add_tree(folder_path, folder_path, 0)
+        except OSError:
+            self.remove(folder_path)
+            raise
+
+    def _add_tree(self, folder_path: str, path: str, depth: int) -> None:
+        """
+        Watches a (sub)folder of a watched folder and its own subfolders.
+        """
+
+        max_depth = None if SCAN_MAX_DEPTH is None else SCAN_MAX_DEPTH - depth
+
+        for subfolder, subfolder_depth, _ in walk_folders(path, max_depth):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(subfolder), WATCH_MASK
+            )
+
+            if wd < 0:
+                if subfolder_depth == 0:
+                    raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+                logging.warning(f"Cannot watch folder '{subfolder}'.")
+                continue
+
+            with self._lock:
+                # The folder may have been unwatched meanwhile
+                if folder_path not in self._wds_by_folder:
+                    self._libc.inotify_rm_watch(self._fd, wd)
+                    return
+
+                self._folders_by_wd[wd] = (folder_path, subfolder, depth + subfolder_depth)
+                self._wds_by_folder[folder_path].add(wd)
+
+    def remove(self, folder_path: str) -> None:
+        with self._lock:
+            wds = self._wds_by_folder.pop(folder_path, set())
+
+            for wd in wds:
+                self._folders_by_wd.pop(wd, None)
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def wait(self, timeout: float) -> List[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = set()
+        offset = 0
+
+        while offset < len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+
+            with self._lock:
+                watched = self._folders_by_wd.get(wd)
+
+                # The kernel drops watches of deleted folders
+                if mask & IN_IGNORED and watched is not None:
+                    del self._folders_by_wd[wd]
+                    self._wds_by_folder.get(watched[0], set()).discard(wd)
+
+            if watched is None or mask & IN_IGNORED:
+                continue
+
+            folder_path, path, depth = watched
+
+            # Watch new subfolders (created or moved in) too
+            if (
+                mask & IN_ISDIR
+                and mask & (IN_CREATE | IN_MOVED_TO)
+                and not self._is_excluded(name)
+                and (SCAN_MAX_DEPTH is None or depth < SCAN_MAX_DEPTH)
+            ):
+                try:
+                    self._add_tree(folder_path, os.path.join(path, name), depth + 1)
+                except OSError as e:
+                    logging.warning(f"Cannot watch folder '{name}': {e}")
+
+            # Ignore files that can never become tracks
+            if not (mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_ISDIR)):
+                if os.path.splitext(name)[1].lower() not in AUDIO_EXTENSIONS:
+                    continue
+
+            changed.add(folder_path)
+
+        return list(changed)
+
+    def interrupt(self) -> None:
+        # The waiting thread notices the stop request within idle_timeout
+        pass
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _PollingBackend:
+    def __init__(self, poll_interval: float):
+        self.idle_timeout = poll_interval
+        self._lock = threading.Lock()
+        # folder_path -> manifest from the last poll, None until the first one
+        self._snapshots: Dict[str, Manifest | None] = {}
+        self._stopped = threading.Event()
+
+    def add(self, folder_path: str) -> None:
+        with self._lock:
+            self._snapshots.setdefault(folder_path, None)
+
+    def remove(self, folder_path: str) -> None:
+        with self._lock:
+            self._snapshots.pop(folder_path, None)
+
+    def wait(self, timeout: float) -> List[str]:
+        if self._stopped.wait(timeout):
+            return []
+
+        with self._lock:
+            folder_paths = list(self._snapshots)
+
+        changed = []
+
+        for folder_path in folder_paths:
+            try:
+                _, manifest = scan_folder(folder_path)
+            except OSError:
+                manifest = {}
+
+            with self._lock:
+                if folder_path not in self._snapshots:
+                    continue
+
+                previous = self._snapshots[folder_path]
+                self._snapshots[folder_path] = manifest
+
+            if previous is not None and previous != manifest:
+                changed.append(folder_path)
+
+        return changed
+
+    def interrupt(self) -> None:
+        self._stopped.set()
+
+    def close(self) -> None:
+        pass
+
+
+def _create_backend(poll_interval: float):
+    if sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            return _InotifyBackend(libc)
+        except Exception as e:
+            logging.warning(f"inotify is not available, polling folders instead: {e}")
+
+    return _PollingBackend(poll_interval)
+
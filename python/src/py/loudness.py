@@ -0,0 +1,378 @@
+"""
+Module implementing background loudness analysis used for volume normalization.
+
+Every audio file is measured once: its loudness is the mean power of its 400 ms
+blocks louder than -70 dB (the gating of LUFS, without its frequency weighting),
+in dB relative to full scale, and its peak is the largest sample value. The
+loudness of a folder (an album) is the energy mean of the loudness of its files,
+so normalizing by album keeps the differences between its tracks.
+
+The standard library only decodes WAV files; for other formats the ReplayGain
+tags written by taggers are used, and files without them are left as they are.
+
+Files are measured in worker processes at a lower priority, fed by a single
+greenlet that waits for them on gevent's thread pool, so the analysis never
+blocks playback or calls from the frontend. Results are cached by file path and
+validated against the file's size and modification time, like tag metadata.
+"""
+
+import array
+import logging
+import math
+import operator
+import os
+import sys
+import time
+import wave
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+import gevent
+from tinytag import TinyTag
+import metrics
+from config import LOUDNESS_NORMALIZATION, LOUDNESS_TARGET_DB, LOUDNESS_WORKERS
+from persistence import JsonCache
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# Length of the blocks the loudness is measured over
+BLOCK_SECONDS = 0.4
+
+# Blocks quieter than this (dB relative to full scale) are silence and do not count
+GATE_DB = -70.0
+
+# Only every n-th sample counts towards the power of a block, which is enough
+# for its mean and makes the analysis several times faster; peaks use all samples
+POWER_STRIDE = 4
+
+# ReplayGain tags give the gain to reach this loudness
+REPLAYGAIN_REFERENCE_DB = -18.0
+
+# Files sent to the worker processes at once, per worker; the cache is saved after each batch
+FILES_PER_WORKER = 8
+
+# Measured loudness (dB) and peak (0..1) of a file, both None if it could not be measured
+Loudness = Tuple[float | None, float | None]
+
+# Maps unsigned 8-bit samples to signed ones
+_UNSIGNED_TO_SIGNED = bytes((i + 128) % 256 for i in range(256))
+
+# Windows priority class of the worker processes
+_BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+
+
+def analyze_file(file_path: str) -> Loudness:
+    """
+    Measures the loudness and peak of an audio file. Runs in the worker processes.
+    """
+
+    try:
+        if os.path.splitext(file_path)[1].lower() == ".wav":
+            return _analyze_wav(file_path)
+
+        return _read_replaygain(file_path)
+
+    except Exception as e:
+        logging.warning(f"Failed to measure loudness of '{file_path}': {e}")
+
+        return None, None
+
+
+def _analyze_wav(file_path: str) -> Loudness:
+    with wave.open(file_path, "rb") as wav:
+        width = wav.getsampwidth()
+        block_frames = max(1, int(wav.getframerate() * BLOCK_SECONDS))
+        # 24-bit samples are widened to 32 bits, see _samples
+        full_scale = float(1 << (8 * (4 if width == 3 else width) - 1))
+        gate = full_scale**2 * 10 ** (GATE_DB / 10)
+
+        energy = 0.0
+        blocks = 0
+        peak = 0
+
+        while True:
+            data = wav.readframes(block_frames)
+
+            if not data:
+                break
+
+            samples = _samples(data, width)
+
+            if not samples:
+                break
+
+            peak = max(peak, max(samples), -min(samples))
+
+            counted = samples[::POWER_STRIDE]
+            power = sum(map(operator.mul, counted, counted)) / len(counted)
+
+            if power >= gate:
+                energy += power
+                blocks += 1
+
+    peak = min(1.0, peak / full_scale)
+
+    if not blocks:
+        # Silence, nothing to normalize
+        return None, peak
+
+    return 10 * math.log10(energy / blocks / full_scale**2), peak
+
+
+def _samples(data: bytes, width: int) -> array.array:
+    """
+    Converts little-endian PCM data to signed integer samples.
+    """
+
+    if width == 1:
+        return array.array("b", data.translate(_UNSIGNED_TO_SIGNED))
+
+    if width == 3:
+        # Widened to 32 bits by putting every sample in the upper three bytes
+        count = len(data) // 3
+        padded = bytearray(count * 4)
+        padded[1::4] = data[0 : count * 3 : 3]
+        padded[2::4] = data[1 : count * 3 : 3]
+        padded[3::4] = data[2 : count * 3 : 3]
+        data = padded
+        width = 4
+
+    samples = array.array({2: "h", 4: "i"}[width])
+    samples.frombytes(data[: len(data) - len(data) % width])
+
+    if sys.byteorder == "big":
+        samples.byteswap()
+
+    return samples
+
+
+def _read_replaygain(file_path: str) -> Loudness:
+    tag = TinyTag.get(file_path, duration=False)
+
+    gain = _replaygain_value(tag.other.get("replaygain_track_gain"))
+    peak = _replaygain_value(tag.other.get("replaygain_track_peak"))
+
+    if gain is None:
+        return None, peak
+
+    return REPLAYGAIN_REFERENCE_DB - gain, peak
+
+
+def _replaygain_value(values: List[str] | None) -> float | None:
+    # Values are written like "-6.50 dB" or "0.988525"
+    if not values:
+        return None
+
+    try:
+        return float(values[0].split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _lower_priority() -> None:
+    # Playback and the user interface come first
+    try:
+        if hasattr(os, "nice"):
+            os.nice(10)
+        else:
+            import ctypes
+
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(
+                kernel32.GetCurrentProcess(), _BELOW_NORMAL_PRIORITY_CLASS
+            )
+    except Exception:
+        pass
+
+
+class LoudnessCache(JsonCache):
+    description = "loudness cache"
+
+    def __init__(self, cache_path: Path):
+        super().__init__(cache_path)
+        # file_path -> [size, mtime_ns, loudness_db, peak]
+        self._entries: Dict[str, list] = {}
+        # folder path -> file paths of the folder in the cache
+        self._folders: Dict[str, Set[str]] = defaultdict(set)
+        # folder path -> loudness of the folder, computed when first needed
+        self._albums: Dict[str, Loudness] = {}
+
+    def is_current(self, file_path: str, size: int, mtime_ns: int) -> bool:
+        """
+        Returns whether the file was measured since it was last modified.
+        """
+
+        entry = self._entries.get(file_path)
+
+        return entry is not None and entry[0] == size and entry[1] == mtime_ns
+
+    def put(self, file_path: str, size: int, mtime_ns: int, loudness: Loudness) -> None:
+        folder = os.path.dirname(file_path)
+
+        self._entries[file_path] = [size, mtime_ns, *loudness]
+        self._folders[folder].add(file_path)
+        self._albums.pop(folder, None)
+        self._dirty = True
+
+    def track(self, file_path: str) -> Loudness:
+        """
+        Returns the last measured loudness and peak of the file. Unlike is_current,
+        the file is not checked, so this is cheap enough to call on every track change.
+        """
+
+        entry = self._entries.get(file_path)
+
+        if entry is None:
+            return None, None
+
+        return entry[2], entry[3]
+
+    def album(self, folder: str) -> Loudness:
+        """
+        Returns the loudness and peak of all measured files of the folder together.
+        """
+
+        if folder not in self._albums:
+            tracks = [self.track(file_path) for file_path in self._folders.get(folder, ())]
+            levels = [loudness for loudness, _ in tracks if loudness is not None]
+            peaks = [peak for _, peak in tracks if peak is not None]
+
+            self._albums[folder] = (
+                10 * math.log10(sum(10 ** (level / 10) for level in levels) / len(levels))
+                if levels
+                else None,
+                max(peaks, default=None),
+            )
+
+        return self._albums[folder]
+
+    def _loaded(self, entries: dict) -> None:
+        self._entries = entries
+
+        for file_path in entries:
+            self._folders[os.path.dirname(file_path)].add(file_path)
+
+
+class LoudnessAnalyzer:
+    """
+    Measures files in the background and tells the gain to play them with.
+    """
+
+    def __init__(
+        self,
+        cache: LoudnessCache,
+        workers: int = LOUDNESS_WORKERS,
+        mode: str = LOUDNESS_NORMALIZATION,
+        target_db: float = LOUDNESS_TARGET_DB,
+    ):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.target_db = target_db
+        # file_path -> (size, mtime_ns) of files waiting to be measured, oldest first
+        self._pending: OrderedDict[str, Tuple[int, int]] = OrderedDict()
+        self._worker: gevent.Greenlet | None = None
+        self._executor: "ProcessPoolExecutor | None" = None
+
+        if mode not in ("track", "album", "off"):
+            logging.warning(f"Unknown loudness normalization '{mode}', using 'off'.")
+            self.mode = "off"
+
+    def schedule(self, manifest: Dict[str, list]) -> None:
+        """
+        Queues files of a folder manifest (path -> size, mtime) that were not measured yet,
+        or changed since they were.
+        """
+
+        if self.mode == "off":
+            return
+
+        for file_path, (size, mtime_ns) in manifest.items():
+            if not self.cache.is_current(file_path, size, mtime_ns):
+                self._pending[file_path] = (size, mtime_ns)
+
+        if self._pending and (self._worker is None or self._worker.dead):
+            self._worker = gevent.spawn(self._run)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def gain(self, file_path: str) -> float:
+        """
+        Returns the factor to scale the volume of the file by, at most 1.
+        Files that were not measured yet are played as they are.
+        """
+
+        if self.mode == "off":
+            return 1.0
+
+        if self.mode == "album":
+            loudness, peak = self.cache.album(os.path.dirname(file_path))
+        else:
+            loudness, peak = self.cache.track(file_path)
+
+        if loudness is None:
+            return 1.0
+
+        gain = 10 ** ((self.target_db - loudness) / 20)
+
+        # Playback volume cannot go above 100%, and the peak must not clip
+        if peak:
+            gain = min(gain, 1 / peak)
+
+        return min(1.0, gain)
+
+    def _run(self) -> None:
+        threadpool = gevent.get_hub().threadpool
+        batch_size = self.workers * FILES_PER_WORKER
+
+        try:
+            while self._pending:
+                batch = [
+                    self._pending.popitem(last=False)
+                    for _ in range(min(batch_size, len(self._pending)))
+                ]
+                paths = [file_path for file_path, _ in batch]
+                start = time.perf_counter()
+
+                try:
+                    results = threadpool.apply(self._analyze, (paths,))
+                except Exception as e:
+                    # Files of the batch are queued again by the next refresh
+                    logging.error(f"Loudness analysis failed: {e}")
+                    return
+
+                for (file_path, (size, mtime_ns)), loudness in zip(batch, results):
+                    self.cache.put(file_path, size, mtime_ns, loudness)
+
+                threadpool.apply(self.cache.save)
+
+                metrics.increment("loudness.files", len(batch))
+                metrics.observe("loudness.batch", (time.perf_counter() - start) * 1000)
+
+        finally:
+            # Worker processes are not kept around while there is nothing to measure
+            self._shutdown()
+
+    def _analyze(self, paths: List[str]) -> List[Loudness]:
+        if self._executor is None:
+            # Imported here, as multiprocessing is only needed once there is something to measure
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawned rather than forked (the default on Windows anyway), forking a
+            # process running several threads may leave locks held in the children
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority,
+            )
+
+        return list(self._executor.map(analyze_file, paths))
+
+    def _shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,18 +1,81 @@
 """
 Module defining a media player capable of handling playlist playback with basic controls.
+
+The player publishes playback events (track changed, position, paused, resumed,
+track ended) from a single ticker greenlet, so the frontend does not have to poll.
+
+Neighbouring tracks are decoded ahead of time into their own Playback instances,
+so moving to them (including at the end of a track) happens without a gap.
+Each track is played at the volume scaled by its normalization gain, if any.
+
+just_playback (and its native audio library) is only loaded when first needed,
+so creating a player does not slow down startup.
+
+The order of tracks (shuffle, repeat, queued tracks) is decided by a PlayQueue,
+and the player advances through it by itself when a track ends. Moving in the
+queue and loading the track it moved to happen under one lock, so that a skip
+by the user and the end of a track cannot both move past the same track.
 """
 
 import logging
-from just_playback import Playback
+from typing import TYPE_CHECKING, Callable, Dict, Set
+import gevent
+from gevent.event import Event
+from gevent.lock import Semaphore
+import metrics
+from config import PLAYBACK_TICK_RATE, PRELOAD_PREVIOUS_TRACK
 from models.playlist import Playlist
 from models.track import Track
+from play_queue import PlayQueue
+
+if TYPE_CHECKING:
+    from just_playback import Playback
+
+# Shortest sleep of the ticker while waiting for the end of a track
+END_POLL_INTERVAL = 0.005
 
 
 class MediaPlayer:
-    def __init__(self):
-        self.playback = Playback()
+    def __init__(
+        self,
+        publish: Callable[[dict], None] | None = None,
+        tick_rate: float = PLAYBACK_TICK_RATE,
+        gain: Callable[[str], float] | None = None,
+    ):
+        self._playback: "Playback | None" = None
         self.playlist: Playlist | None = None
-        self.current_index: int = 0
+        self.queue = PlayQueue()
+        # ID of the loaded track, to find it again when the playlist changes
+        self._current_track_id: str | None = None
+        self.publish = publish
+        # Position events per second, 0 disables them (end of track is still detected)
+        self.tick_rate = tick_rate
+        # Set while a track is playing, the ticker sleeps on it otherwise
+        self._playing = Event()
+        self._ticker: gevent.Greenlet | None = None
+        self.volume: float = 1.0
+        # Tells the volume normalization factor of a file (see loudness.py)
+        self.gain = gain
+        # Normalization factor of the loaded track, applied on top of the volume
+        self._track_gain: float = 1.0
+        # Playback instances with loaded neighbouring tracks, by track ID
+        self._preloaded: Dict[str, "Playback"] = {}
+        self._preloading: Set[str] = set()
+        # Held while moving in the queue and loading the track moved to
+        self._load_lock = Semaphore()
+
+    @property
+    def playback(self) -> "Playback":
+        if self._playback is None:
+            from just_playback import Playback
+
+            self._playback = Playback()
+
+        return self._playback
+
+    @playback.setter
+    def playback(self, playback: "Playback") -> None:
+        self._playback = playback
 
     def load_playlist(self, playlist: Playlist) -> bool:
         """
@@ -21,26 +84,62 @@ class MediaPlayer:
 
         logging.info(f"Loading '{playlist.title}' playlist into media player.")
 
-        self.playlist = playlist
-        self.current_index = 0
+        with self._load_lock:
+            self.playlist = playlist
+            self.queue.reset(len(playlist.tracks))
+            self._preloaded.clear()
 
-        if not self.playlist.tracks:
-            logging.warn("Cannot load playlist. It contains no tracks.")
+            if not self.playlist.tracks:
+                logging.warn("Cannot load playlist. It contains no tracks.")
 
-            return False
+                return False
+
+            return self._load_current_track()
+
+    @property
+    def current_index(self) -> int | None:
+        """
+        Index of the current track in the loaded playlist, None if there is none
+        (e.g. it was removed from the playlist, see playlist_changed).
+        """
 
-        return self._load_current_track()
+        return self.queue.current
 
     def _load_current_track(self) -> bool:
-        if not self.playlist or self.current_index >= len(self.playlist.tracks):
+        """
+        Loads the current track of the queue, with _load_lock held by the caller.
+        """
+
+        index = self.current_index
+
+        if not self.playlist or index is None or index >= len(self.playlist.tracks):
             logging.warn("No valid track to load")
 
-        track: Track = self.playlist.tracks[self.current_index]
+            return False
+
+        track: Track = self.playlist.tracks[index]
         try:
-            logging.info(f"Loading track: {track.title} - {track.file_path}")
-            self.playback.stop()
-            self.playback = Playback()  # Reset playback
-            self.playback.load_file(track.file_path)
+            with metrics.span("player.track_load"):
+                playback = self._preloaded.pop(track.id, None)
+
+                if playback is None:
+                    metrics.increment("player.preload_misses")
+                    playback = self._run_blocking(_open_playback, track.file_path)
+                else:
+                    metrics.increment("player.preload_hits")
+
+                if self._playback is not None:
+                    self._playback.stop()
+
+                self.playback = playback
+                self._current_track_id = track.id
+                self._track_gain = self._gain_of(track)
+                self.playback.set_volume(self.volume * self._track_gain)
+
+            self._playing.clear()
+            self._publish("track_changed", track=self.get_current_track_info())
+
+            self._preload_neighbours()
 
             return True
 
@@ -49,48 +148,220 @@ class MediaPlayer:
 
             return False
 
+    def _gain_of(self, track: Track) -> float:
+        if self.gain is None:
+            return 1.0
+
+        try:
+            return self.gain(track.file_path)
+        except Exception as e:
+            logging.warning(f"Failed to get gain of track '{track.title}': {e}")
+            return 1.0
+
+    def _preload_neighbours(self) -> None:
+        """
+        Loads the next (and optionally the previous) track in the background
+        and drops preloaded tracks outside of this window.
+        """
+
+        wanted = self._neighbours()
+
+        for track_id in list(self._preloaded):
+            if track_id not in wanted:
+                del self._preloaded[track_id]
+
+        for track_id, track in wanted.items():
+            if track_id not in self._preloaded and track_id not in self._preloading:
+                self._preloading.add(track_id)
+                gevent.spawn(self._preload, track, self.playlist)
+
+    def _preload(self, track: Track, playlist: Playlist) -> None:
+        try:
+            playback = self._run_blocking(_open_playback, track.file_path)
+        except Exception as e:
+            logging.warning(f"Failed to preload track '{track.title}': {e}")
+            return
+        finally:
+            self._preloading.discard(track.id)
+
+        # Keep it only if it is still a neighbour of the current track
+        if self.playlist is playlist and track.id in self._neighbours():
+            self._preloaded[track.id] = playback
+
+    def _neighbours(self) -> Dict[str, Track]:
+        """
+        Returns the tracks that may be played after the current one, by ID.
+        """
+
+        if not self.playlist:
+            return {}
+
+        indices = [self.queue.peek_next(), self.queue.peek_next(auto=True)]
+
+        if PRELOAD_PREVIOUS_TRACK:
+            indices.append(self.queue.peek_previous())
+
+        tracks = [self.playlist.tracks[i] for i in indices if i is not None]
+
+        return {track.id: track for track in tracks}
+
+    def _run_blocking(self, fn: Callable, *args):
+        # Decoding files from (network) disks blocks, keep it off the event loop
+        return gevent.get_hub().threadpool.apply(fn, args)
+
     def resume(self) -> None:
+        if self.current_index is None:
+            return
+
         self.playback.resume()
+        self._set_playing(True)
 
     def set_volume(self, volume) -> None:
-        self.playback.set_volume(volume)
+        self.volume = volume
+        self.playback.set_volume(volume * self._track_gain)
 
     def play(self) -> None:
+        if self.current_index is None:
+            return
+
         if self.playback and not self.playback.playing:
             self.playback.play()
+            self._set_playing(True)
 
     def pause(self) -> None:
         if self.playback and self.playback.playing:
             self.playback.pause()
+            self._set_playing(False)
 
-    def next_track(self) -> bool:
-        if self.playlist and self.current_index < len(self.playlist.tracks) - 1:
-            self.current_index += 1
+    def next_track(self, auto: bool = False) -> bool:
+        """
+        Loads the next track of the queue; `auto` is set when the current track has ended.
+        """
 
-            return self._load_current_track()
+        with self._load_lock:
+            if self.playlist and self.queue.next(auto) is not None:
+                return self._load_current_track()
 
         return False
 
     def prev_track(self) -> bool:
-        if self.playlist and self.current_index > 0:
-            self.current_index -= 1
-
-            return self._load_current_track()
+        with self._load_lock:
+            if self.playlist and self.queue.previous() is not None:
+                return self._load_current_track()
 
         return False
 
+    def enqueue(self, index: int, play_next: bool = False) -> bool:
+        """
+        Queues a track of the loaded playlist, at the front when `play_next` is set.
+        """
+
+        if not self.playlist:
+            return False
+
+        try:
+            if play_next:
+                self.queue.play_next(index)
+            else:
+                self.queue.enqueue(index)
+        except IndexError as e:
+            logging.error(f"Failed to queue track: {e}")
+            return False
+
+        self._queue_changed()
+        return True
+
+    def set_shuffle(self, shuffle: bool) -> None:
+        self.queue.set_shuffle(shuffle)
+        self._queue_changed()
+
+    def set_repeat_mode(self, mode: str) -> bool:
+        try:
+            self.queue.set_repeat_mode(mode)
+        except ValueError as e:
+            logging.error(f"Failed to set repeat mode: {e}")
+            return False
+
+        self._queue_changed()
+        return True
+
+    def track_moved(self, playlist: Playlist, from_index: int, to_index: int) -> None:
+        """
+        Keeps playing the same track after it or another one was moved in the loaded playlist.
+        """
+
+        if playlist is self.playlist:
+            self.queue.move(from_index, to_index)
+            self._queue_changed()
+
+    def playlist_changed(self, playlist: Playlist) -> None:
+        """
+        Restarts the queue of the loaded playlist after its tracks were added or removed,
+        keeping the current track if it is still there. If it was removed, playback
+        stops without a current track, and the next track is the first one.
+        """
+
+        if playlist is not self.playlist:
+            return
+
+        with self._load_lock:
+            start = next(
+                (
+                    i
+                    for i, track in enumerate(playlist.tracks)
+                    if track.id == self._current_track_id
+                ),
+                -1,  # Removed, no current track
+            )
+
+            self.queue.reset(len(playlist.tracks), start)
+
+            if start < 0 and self._current_track_id is not None:
+                self._stop()
+
+        self._queue_changed()
+
+    def _stop(self) -> None:
+        """
+        Stops and forgets the loaded track.
+        """
+
+        if self._playback is not None:
+            self._playback.stop()
+
+        self._current_track_id = None
+        self._track_gain = 1.0
+        self._set_playing(False)
+        self._publish("track_changed", track=None)
+
+    def get_queue_info(self) -> dict:
+        return {
+            "shuffle": self.queue.shuffle,
+            "repeat_mode": self.queue.repeat_mode,
+            "queued": self.queue.queued,
+        }
+
+    def _queue_changed(self) -> None:
+        if self.playlist:
+            self._preload_neighbours()
+
+        self._publish("queue_changed", queue=self.get_queue_info())
+
     def get_current_track_info(self) -> dict:
-        if self.playlist and self.current_index < len(self.playlist.tracks):
-            track: Track = self.playlist.tracks[self.current_index]
+        index = self.current_index
+
+        if self.playlist and index is not None and index < len(self.playlist.tracks):
+            track: Track = self.playlist.tracks[index]
 
             return {
                 "title": track.title,
                 "artist": track.artist,
                 "file_path": track.file_path,
-                "duration": track.duration.total_seconds(),
+                "duration": track.duration_seconds,
                 "position": self.playback.curr_pos,
                 "is_playing": self.playback.playing,
-                "current_index": self.current_index,
+                "current_index": index,
+                "track_count": len(self.playlist.tracks),
             }
 
         return {}
@@ -100,3 +371,83 @@ class MediaPlayer:
 
     def is_playing(self) -> bool:
         return self.playback.playing
+
+    def _set_playing(self, playing: bool) -> None:
+        if playing == self._playing.is_set():
+            return
+
+        if playing:
+            self._playing.set()
+            self._publish("resumed", position=self.playback.curr_pos)
+            self._ensure_ticker()
+        else:
+            self._playing.clear()
+            self._publish("paused", position=self.playback.curr_pos)
+
+    def _ensure_ticker(self) -> None:
+        if self._ticker is None or self._ticker.dead:
+            self._ticker = gevent.spawn(self._tick)
+
+    def _tick(self) -> None:
+        """
+        Publishes the position of the playing track and detects its end.
+        Does nothing while playback is paused or stopped.
+        """
+
+        interval = 1 / self.tick_rate if self.tick_rate > 0 else 1.0
+        last_published = 0.0
+
+        while True:
+            self._playing.wait()
+
+            if not self.playback.active:
+                # just_playback deactivates the playback when the file has been played
+                self._playing.clear()
+                self._track_ended(self._current_track_id)
+                continue
+
+            now = gevent.get_hub().loop.now()
+
+            if self.tick_rate > 0 and now - last_published >= interval:
+                self._publish("position", position=self.playback.curr_pos)
+                last_published = now
+
+            # Wake up right at the end of the track to switch without a gap
+            remaining = self.playback.duration - self.playback.curr_pos
+            gevent.sleep(max(END_POLL_INTERVAL, min(interval, remaining)))
+
+    def _track_ended(self, track_id: str | None) -> None:
+        """
+        Continues with the (preloaded) next track right away after the track has ended.
+        """
+
+        with self._load_lock:
+            # Another track was loaded while waiting for the lock, e.g. skipped to by the user
+            if self._current_track_id != track_id:
+                return
+
+            if self.playlist and self.queue.next(auto=True) is not None:
+                if self._load_current_track():
+                    self.play()
+                    return
+
+        self._publish("track_ended", current_index=self.current_index)
+
+    def _publish(self, event_type: str, **data) -> None:
+        if self.publish is None:
+            return
+
+        try:
+            self.publish({"type": event_type, **data})
+        except Exception as e:
+            logging.warning(f"Failed to publish playback event '{event_type}': {e}")
+
+
+def _open_playback(file_path: str) -> "Playback":
+    from just_playback import Playback
+
+    with metrics.span("player.decode"):
+        playback = Playback()
+        playback.load_file(file_path)
+
+    return playback
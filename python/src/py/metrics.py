@@ -0,0 +1,163 @@
+"""
+Module collecting counters and latency histograms of backend operations.
+
+Hot paths record into a process-wide registry instead of logging every file or
+call: counters count things (files scanned, bytes written), histograms collect
+values such as durations into fixed buckets, and spans time a block of code
+into a histogram. Recording is cheap and thread-safe, as scans and disk writes
+run on worker threads.
+
+The collected data is read with `snapshot()` (exposed to the frontend as
+`get_metrics`) and can be written to a file periodically (see METRICS_DUMP_INTERVAL_SECONDS).
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+# Upper bounds of histogram buckets, spanning microseconds to minutes when values are in
+# milliseconds (1-2.5-5 steps, so an estimated percentile is off by at most 2.5x)
+BUCKET_BOUNDS: List[float] = [
+    base * 10**exponent for exponent in range(-3, 6) for base in (1, 2.5, 5)
+]
+
+
+class Histogram:
+    """
+    Distribution of observed values, kept as counts per bucket (see BUCKET_BOUNDS),
+    so its size does not grow with the number of observations.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        # The last bucket holds values above all bounds
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Estimates the value below which the given fraction of observations lie,
+        as the upper bound of its bucket (within the smallest and largest observed values).
+        """
+
+        rank = fraction * self.count
+        seen = 0
+
+        for index, count in enumerate(self.buckets):
+            seen += count
+
+            if count and seen >= rank:
+                bound = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                return max(min(bound, self.max), self.min)
+
+        return self.max
+
+    def to_dict(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "min": round(self.min, 3),
+            "max": round(self.max, 3),
+            "mean": round(self.total / self.count, 3),
+            "p50": round(self.percentile(0.5), 3),
+            "p90": round(self.percentile(0.9), 3),
+            "p99": round(self.percentile(0.99), 3),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._started = time.monotonic()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Records the duration of the block in milliseconds into the histogram `name`.
+        Blocks ending with an exception are counted in the counter `<name>.errors` instead.
+        """
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}.errors")
+            raise
+
+        self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name: str) -> Callable[[Callable], Callable]:
+        """
+        Decorator recording the duration of every call of the function, see span.
+        """
+
+        def decorate(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorate
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.monotonic() - self._started, 3),
+                "counters": dict(sorted(self._counters.items())),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self._histograms.items())
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._started = time.monotonic()
+
+
+# Registry shared by the whole application
+registry = MetricsRegistry()
+
+increment = registry.increment
+observe = registry.observe
+span = registry.span
+timed = registry.timed
+snapshot = registry.snapshot
+reset = registry.reset
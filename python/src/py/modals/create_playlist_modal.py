@@ -2,37 +2,39 @@
 Module for handling folder selection and playlist creation.
 """
 
-import subprocess
 import logging
-from typing import List
+import gevent
+from typing import List, Tuple
 from pathlib import Path
-from tinytag import TinyTag
 from datetime import timedelta
 import state
 import user_helper
-from config import AUDIO_EXTENSIONS
+import notifications
+from config import SERVER_MUSIC_ROOT
 from models.track import Track
+from tag_cache import TagCache
+from scanner import scan_tracks, walk_audio_files
+from folder_sync import Manifest, manifest_entry
 from models.playlist import Playlist
+from unit_of_work import UnitOfWork
+from picker_helper import FolderPickerHelper
 
-# Path to the folder picker script used for selecting music folders
-FOLDER_PICKER_PATH = Path(__file__).parent.parent / "utils" / "folder_picker.py"
+# Helper process showing folder selection dialogs, started on the first use
+folder_picker = FolderPickerHelper()
 
 
 def pick_folder() -> str:
     """
-    Launches an external script to open a folder selection dialog.
-    Returns the selected folder path as a string.
+    Opens a folder selection dialog in the helper process.
+    Returns the selected folder path as a string, empty if the dialog was cancelled.
     """
 
-    logging.info("Starting folder_picker subprocess.")
+    # The dialog stays open until the user closes it, wait for it off the event loop
+    folder = gevent.get_hub().threadpool.apply(folder_picker.pick)
 
-    result = subprocess.run(
-        ["python", str(FOLDER_PICKER_PATH)], capture_output=True, text=True
-    )
+    logging.info(f"Result of folder picker: '{folder}'.")
 
-    logging.info(f"Result of folder_picker: \n${result}")
-
-    return result.stdout.strip()
+    return folder
 
 
 def create_playlist(title, folder_path) -> bool:
@@ -42,75 +44,112 @@ def create_playlist(title, folder_path) -> bool:
     Ensures:
     - Playlist title is unique.
     - Folder path is not already used by another playlist.
+    - In server mode, the folder is inside the user's music folder.
     """
 
     logging.info(f"Creating playlist: {title}, {folder_path}.")
 
-    for playlist in state.user.playlists:
-        if playlist.title == title:
-            logging.error(f"A playlist with title '{title}' already exists.")
-            return False
-        if playlist.folder_path == folder_path:
-            logging.error("A playlist with this folder path already exists.")
-            return False
+    if not _is_allowed(folder_path):
+        logging.error(f"Folder '{folder_path}' is outside the music folder of the user.")
+        return False
 
-    tracks = _load_tracks(folder_path)
+    if not _is_unique(title, folder_path):
+        return False
+
+    # Scanning and saving the caches block, keep them off the event loop like refresh_library does
+    threadpool = gevent.get_hub().threadpool
+
+    tracks, manifest = threadpool.apply(_load_tracks, (folder_path, state.tag_cache))
+    threadpool.apply(state.tag_cache.save)
     total_duration = sum((track.duration for track in tracks), timedelta())
     new_playlist = Playlist(title, total_duration, folder_path, tracks)
 
-    state.user.add_playlist(new_playlist)
+    user = state.user
 
-    if not user_helper.save_user(state.user):
-        logging.error("Failed to save user data. Rolling back changes.")
+    with state.changes_lock:
+        # Checked again, another playlist may have been created while the folder was scanned
+        if not _is_unique(title, folder_path):
+            return False
 
-        if not state.user.remove_playlist(new_playlist):
-            logging.critical("Failed to revert changes!")
+        changes = UnitOfWork(user, state.unsaved_changes)
+        changes.add_playlist(new_playlist)
 
+    if not changes.save(lambda: user_helper.storage.add_playlist(user, new_playlist)):
         return False
 
+    state.manifests.set(folder_path, manifest)
+    threadpool.apply(state.manifests.save)
+    state.loudness.schedule(manifest)
+
+    if state.folder_watcher is not None:
+        state.folder_watcher.watch(folder_path)
+
+    state.search_index.index_playlist(new_playlist)
+    notifications.playlist_updated(new_playlist)
+
     logging.info(f"Playlist '{title}' has been added.")
     return True
 
 
-def _load_tracks(folder_path) -> List[Track]:
+def _is_allowed(folder_path) -> bool:
     """
-    Loads all valid audio files from the given folder and extracts their metadata.
-    Returns a list of Track objects.
+    Returns whether the user may create a playlist from the folder: any folder in the
+    desktop application, only folders inside SERVER_MUSIC_ROOT/<username> in server mode,
+    so that users of a server cannot read (e.g. hash, see find_duplicates) each other's files.
     """
 
-    folder = Path(folder_path)
+    if state.sessions is None:
+        return True
 
-    if not folder.is_dir():
+    root = (SERVER_MUSIC_ROOT / state.username).resolve()
+
+    try:
+        # Resolved first, so that neither ".." nor a symlink lead out of the root
+        Path(folder_path).resolve().relative_to(root)
+    except (TypeError, ValueError, OSError):
         return False
 
-    # Filter files by supported audio extensions
-    audio_files = [
-        f
-        for f in folder.iterdir()
-        if f.is_file() and f.suffix.lower() in AUDIO_EXTENSIONS
-    ]
+    return True
 
-    logging.info(f"Detected files: {len(audio_files)}.")
 
-    tracks: List[Track] = []
+def _is_unique(title, folder_path) -> bool:
+    """
+    Returns whether no playlist of the user has the given title or folder path.
+    """
 
-    # Extract metadata using TinyTag
-    for audio_file in audio_files:
-        file_path = str(audio_file)
+    for playlist in state.user.playlists:
+        if playlist.title == title:
+            logging.error(f"A playlist with title '{title}' already exists.")
+            return False
+        if playlist.folder_path == folder_path:
+            logging.error("A playlist with this folder path already exists.")
+            return False
 
-        logging.info(f"Reading file: {file_path}.")
+    return True
+
+
+def _load_tracks(folder_path, tag_cache: TagCache) -> Tuple[List[Track], Manifest]:
+    """
+    Loads all valid audio files from the given folder and its subfolders and extracts their metadata.
+    Returns a list of Track objects and the manifest of the folder.
+    """
+
+    folder = Path(folder_path)
+
+    if not folder.is_dir():
+        return [], {}
 
-        try:
-            tag = TinyTag.get(file_path)
+    manifest: Manifest = {}
 
-            title = tag.title or audio_file.stem
-            artist = tag.artist or "Unknown"
-            duration = timedelta(seconds=tag.duration or 0.0)
+    def audio_files():
+        # Files go to tag reading as they are found, the manifest is filled on the way
+        for entry in walk_audio_files(folder):
+            manifest[entry.path] = manifest_entry(entry)
+            yield entry
 
-            track = Track(title, artist, duration, file_path)
+    # Extract metadata using TinyTag, unless the file is already cached
+    tracks = scan_tracks(audio_files(), tag_cache)
 
-            tracks.append(track)
-        except Exception as e:
-            logging.warning(f"Error reading audio file: '{file_path}': {e}.")
+    logging.info(f"Detected files: {len(manifest)}.")
 
-    return tracks
+    return tracks, manifest
@@ -5,12 +5,13 @@ Module containing logic for renaming playlists in the application.
 import logging
 import state
 import user_helper
-from models.playlist import Playlist
+import notifications
+from unit_of_work import UnitOfWork
 
 
-def rename_playlist(playlist: Playlist, new_title: str) -> bool:
+def rename_playlist(playlist_id: str, new_title: str) -> bool:
     """
-    Renames the given playlist to the specified new title.
+    Renames the playlist with the given ID to the specified new title.
     
     Ensures:
     - The playlist exists in the current user's list.
@@ -18,23 +19,25 @@ def rename_playlist(playlist: Playlist, new_title: str) -> bool:
     - If saving fails, the title is reverted automatically (rollback).
     """
 
-    logging.info(f"Renaming playlist '{playlist.title}' to '{new_title}'.")
+    targeted_playlist = state.user.get_playlist(playlist_id)
 
-    try:
-        playlist_index = state.user.playlists.index(playlist)
-    except ValueError:
+    if targeted_playlist is None:
         logging.error("Playlist not found!")
         return False
 
-    targeted_playlist = state.user.playlists[playlist_index]
-    title_backup = targeted_playlist.title
-    targeted_playlist.title = new_title
+    logging.info(f"Renaming playlist '{targeted_playlist.title}' to '{new_title}'.")
 
-    if not user_helper.save_user(state.user):
-        logging.error("Failed to save user data! Rolling back changes.")
-        
-        targeted_playlist.title = title_backup
+    user = state.user
+
+    with state.changes_lock:
+        changes = UnitOfWork(user, state.unsaved_changes)
+        changes.rename_playlist(targeted_playlist, new_title)
+
+    if not changes.save(lambda: user_helper.storage.rename_playlist(user, targeted_playlist)):
         return False
 
+    state.search_index.rename_playlist(targeted_playlist)
+    notifications.playlist_updated(targeted_playlist)
+
     logging.info(f"Playlist has been renamed to '{new_title}'.")
     return True
@@ -0,0 +1,9 @@
+"""
+Module generating stable identifiers for data models.
+"""
+
+import uuid
+
+
+def new_id() -> str:
+    return uuid.uuid4().hex
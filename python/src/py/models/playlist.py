@@ -1,11 +1,12 @@
 """
 Module defining the Playlist data model.
+Tracks are kept in a column-oriented TrackStore (see models/track_store.py).
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import List
-from models.track import Track
+from models.ids import new_id
+from models.track_store import TrackStore
 
 
 @dataclass
@@ -13,24 +14,44 @@ class Playlist:
     title: str
     duration: timedelta
     folder_path: str
-    tracks: List[Track]
+    tracks: TrackStore
+    id: str = field(default_factory=new_id)
+
+    def __post_init__(self):
+        # Tracks may be given as any iterable of Track objects
+        if not isinstance(self.tracks, TrackStore):
+            self.tracks = TrackStore(self.tracks)
 
     @classmethod
     def from_dict(cls, data: dict):
-        tracks_data = data.get("tracks", [])
-        tracks = [Track.from_dict(t) for t in tracks_data]
+        tracks = TrackStore.from_dicts(data.get("tracks", []))
 
         return cls(
             title=data["title"],
             duration=timedelta(seconds=data.get("duration", 0)),
             folder_path=data["folder_path"],
             tracks=tracks,
+            id=data.get("id") or new_id(),
         )
 
     def to_dict(self):
         return {
+            "id": self.id,
+            "title": self.title,
+            "duration": self.duration.total_seconds(),
+            "folder_path": self.folder_path,
+            "tracks": self.tracks.to_dicts(),
+        }
+
+    def to_summary_dict(self):
+        """
+        Serializes the playlist without its tracks.
+        """
+
+        return {
+            "id": self.id,
             "title": self.title,
             "duration": self.duration.total_seconds(),
             "folder_path": self.folder_path,
-            "tracks": [track.to_dict() for track in self.tracks],
+            "track_count": len(self.tracks),
         }
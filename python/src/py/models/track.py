@@ -2,8 +2,9 @@
 Module defining the Track data model.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timedelta
+from models.ids import new_id
 
 
 @dataclass
@@ -12,6 +13,7 @@ class Track:
     artist: str
     duration: timedelta
     file_path: str
+    id: str = field(default_factory=new_id)
 
     @classmethod
     def from_dict(cls, data: dict):
@@ -20,10 +22,12 @@ class Track:
             artist=data["artist"],
             duration=timedelta(seconds=data.get("duration", 0)),
             file_path=data["file_path"],
+            id=data.get("id") or new_id(),
         )
 
     def to_dict(self):
         return {
+            "id": self.id,
             "title": self.title,
             "artist": self.artist,
             "duration": self.duration.total_seconds(),
@@ -0,0 +1,481 @@
+"""
+Module defining a compact, column-oriented storage for the tracks of a playlist.
+
+Instead of one Track object (with a timedelta and four strings) per track, every
+field is kept in its own column: IDs as raw bytes, durations in a float array,
+and artists and folders as indices into a table of shared strings. Reading a
+track returns a lightweight TrackRow view of its columns.
+"""
+
+from array import array
+from collections.abc import MutableSequence
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Iterator, List
+from models.ids import new_id
+from models.track import Track
+
+# Bytes of a track ID (a UUID written as 32 hex digits) in the ID column
+ID_SIZE = 16
+
+
+class StringTable:
+    """
+    Stores each distinct string once and refers to it by index.
+    """
+
+    __slots__ = ("_strings", "_indices")
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def index(self, string: str) -> int:
+        index = self._indices.get(string)
+
+        if index is None:
+            index = len(self._strings)
+            self._strings.append(string)
+            self._indices[string] = index
+
+        return index
+
+    def __getitem__(self, index: int) -> str:
+        return self._strings[index]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._strings)
+
+
+@dataclass
+class TrackColumns:
+    """
+    Tracks of a TrackStore as plain columns, one entry per track.
+    """
+
+    # ID_SIZE bytes per track, zeros for the tracks in other_ids
+    ids: bytes
+    # IDs that are not 32 hex digits, by track position
+    other_ids: Dict[int, str]
+    titles: List[str]
+    artists: array
+    durations: array
+    folders: array
+    file_names: List[str]
+    # Artists and folders, referred to by index
+    strings: List[str]
+
+
+class TrackRow:
+    """
+    View of a single track in a TrackStore, with the same attributes as Track.
+    It stays valid while the track is moved, but not after it has been removed.
+    """
+
+    __slots__ = ("_store", "_slot")
+
+    def __init__(self, store: "TrackStore", slot: int):
+        self._store = store
+        self._slot = slot
+
+    @property
+    def id(self) -> str:
+        return self._store._get_id(self._slot)
+
+    @id.setter
+    def id(self, value: str) -> None:
+        self._store._set_id(self._slot, value)
+
+    @property
+    def title(self) -> str:
+        return self._store._titles[self._slot]
+
+    @property
+    def artist(self) -> str:
+        store = self._store
+        return store._strings[store._artists[self._slot]]
+
+    @property
+    def duration(self) -> timedelta:
+        return timedelta(seconds=self._store._durations[self._slot])
+
+    @property
+    def duration_seconds(self) -> float:
+        return self._store._durations[self._slot]
+
+    @property
+    def file_path(self) -> str:
+        store = self._store
+        return store._strings[store._folders[self._slot]] + store._file_names[self._slot]
+
+    def to_dict(self) -> dict:
+        return self._store._row_dict(self._slot)
+
+    def to_track(self) -> Track:
+        """
+        Copies the track out of its store.
+        """
+
+        return Track(self.title, self.artist, self.duration, self.file_path, self.id)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (TrackRow, Track)):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"TrackRow(title={self.title!r}, artist={self.artist!r}, file_path={self.file_path!r})"
+
+
+class TrackStore(MutableSequence):
+    """
+    Ordered, mutable sequence of tracks stored in columns.
+
+    Every track has a slot in the columns, and `_order` lists the slots in
+    playlist order, so moving a track only moves its slot number. Slots of
+    removed tracks are reused by tracks added later.
+    """
+
+    def __init__(self, tracks: Iterable[Track | TrackRow] = ()):
+        self._order = array("I")
+        self._free: List[int] = []
+        self._ids = bytearray()
+        # IDs that are not 32 hex digits (e.g. edited by hand), by slot
+        self._other_ids: Dict[int, str] = {}
+        self._titles: List[str] = []
+        self._artists = array("I")
+        self._durations = array("d")
+        self._folders = array("I")
+        self._file_names: List[str] = []
+        # Artists and folders, which repeat a lot within a playlist
+        self._strings = StringTable()
+
+        for track in tracks:
+            self.append(track)
+
+    @classmethod
+    def from_dicts(cls, tracks_data: Iterable[dict]) -> "TrackStore":
+        """
+        Builds the store from serialized tracks without creating Track objects.
+        """
+
+        store = cls()
+        store._extend_dicts(tracks_data)
+
+        return store
+
+    @property
+    def loaded(self) -> bool:
+        return True
+
+    def load(self) -> None:
+        """
+        Makes sure all tracks are in memory (see LazyTrackStore).
+        """
+
+    @classmethod
+    def from_columns(cls, columns: "TrackColumns") -> "TrackStore":
+        """
+        Builds the store from columns (see to_columns), e.g. read from a binary file.
+        """
+
+        store = cls()
+        count = len(columns.titles)
+
+        # Artists and folders refer to the given strings, switch them to the store's table
+        remap = {
+            index: store._strings.index(columns.strings[index])
+            for index in set(columns.artists) | set(columns.folders)
+        }
+
+        store._order = array("I", range(count))
+        store._ids = bytearray(columns.ids)
+        store._other_ids = dict(columns.other_ids)
+        store._titles = list(columns.titles)
+        store._artists = array("I", [remap[index] for index in columns.artists])
+        store._durations = array("d", columns.durations)
+        store._folders = array("I", [remap[index] for index in columns.folders])
+        store._file_names = list(columns.file_names)
+
+        return store
+
+    def to_columns(self) -> "TrackColumns":
+        """
+        Returns the tracks in playlist order as columns, with artists and
+        folders as indices into `strings`.
+        """
+
+        ids = bytearray()
+        other_ids = {}
+
+        for position, slot in enumerate(self._order):
+            ids += self._ids[slot * ID_SIZE : (slot + 1) * ID_SIZE]
+
+            if slot in self._other_ids:
+                other_ids[position] = self._other_ids[slot]
+
+        return TrackColumns(
+            ids=bytes(ids),
+            other_ids=other_ids,
+            titles=[self._titles[slot] for slot in self._order],
+            artists=array("I", [self._artists[slot] for slot in self._order]),
+            durations=array("d", [self._durations[slot] for slot in self._order]),
+            folders=array("I", [self._folders[slot] for slot in self._order]),
+            file_names=[self._file_names[slot] for slot in self._order],
+            strings=list(self._strings),
+        )
+
+    def to_dicts(self, start: int = 0, stop: int | None = None) -> List[dict]:
+        """
+        Serializes the tracks between the given positions like Track.to_dict.
+        """
+
+        return [self._row_dict(slot) for slot in self._order[start:stop]]
+
+    def retain(self, keep: Callable[[TrackRow], bool]) -> None:
+        """
+        Removes all tracks for which `keep` returns False, in a single pass.
+        """
+
+        kept = array("I")
+
+        for slot in self._order:
+            if keep(TrackRow(self, slot)):
+                kept.append(slot)
+            else:
+                self._free_slot(slot)
+
+        self._order = kept
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TrackRow(self, slot) for slot in self._order[index]]
+
+        return TrackRow(self, self._order[index])
+
+    def __iter__(self) -> Iterator[TrackRow]:
+        for slot in self._order:
+            yield TrackRow(self, slot)
+
+    def __setitem__(self, index, track: Track | TrackRow) -> None:
+        if isinstance(index, slice):
+            raise TypeError("TrackStore does not support slice assignment")
+
+        # Read the new values before the slot is overwritten, it may be the same track
+        values = _track_values(track)
+        self._write_row(self._order[index], *values)
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            for slot in self._order[index]:
+                self._free_slot(slot)
+        else:
+            self._free_slot(self._order[index])
+
+        del self._order[index]
+
+    def insert(self, index: int, track: Track | TrackRow) -> None:
+        self._order.insert(index, self._add_row(*_track_values(track)))
+
+    def move(self, from_index: int, to_index: int) -> None:
+        """
+        Moves a track to another position, keeping its slot (and views of it) intact.
+        """
+
+        slot = self._order.pop(from_index)
+        self._order.insert(to_index, slot)
+
+    def pop(self, index: int = -1) -> Track:
+        """
+        Removes a track and returns it as a standalone Track.
+        """
+
+        track = self[index].to_track()
+        del self[index]
+
+        return track
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TrackStore):
+            return self.to_dicts() == other.to_dicts()
+
+        if isinstance(other, list):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"TrackStore({len(self)} tracks)"
+
+    def _extend_dicts(self, tracks_data: Iterable[dict]) -> None:
+        for data in tracks_data:
+            self._order.append(
+                self._add_row(
+                    data.get("id") or new_id(),
+                    data["title"],
+                    data["artist"],
+                    data.get("duration", 0),
+                    data["file_path"],
+                )
+            )
+
+    def _add_row(self, track_id: str, title: str, artist: str, duration: float, file_path: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._titles)
+            self._ids.extend(bytes(ID_SIZE))
+            self._titles.append("")
+            self._artists.append(0)
+            self._durations.append(0.0)
+            self._folders.append(0)
+            self._file_names.append("")
+
+        self._write_row(slot, track_id, title, artist, duration, file_path)
+
+        return slot
+
+    def _write_row(self, slot: int, track_id: str, title: str, artist: str, duration: float, file_path: str) -> None:
+        # Split the path after its last separator, the folder is shared by most tracks
+        split = max(file_path.rfind("/"), file_path.rfind("\\")) + 1
+
+        self._set_id(slot, track_id)
+        self._titles[slot] = title
+        self._artists[slot] = self._strings.index(artist)
+        self._durations[slot] = duration
+        self._folders[slot] = self._strings.index(file_path[:split])
+        self._file_names[slot] = file_path[split:]
+
+    def _free_slot(self, slot: int) -> None:
+        self._other_ids.pop(slot, None)
+        self._titles[slot] = ""
+        self._file_names[slot] = ""
+        self._free.append(slot)
+
+    def _get_id(self, slot: int) -> str:
+        other_id = self._other_ids.get(slot)
+
+        if other_id is not None:
+            return other_id
+
+        start = slot * ID_SIZE
+        return self._ids[start : start + ID_SIZE].hex()
+
+    def _set_id(self, slot: int, track_id: str) -> None:
+        start = slot * ID_SIZE
+
+        try:
+            raw = bytes.fromhex(track_id)
+        except ValueError:
+            raw = b""
+
+        # hex() gives back lowercase digits only, so other IDs are kept as they are
+        if len(track_id) == 2 * ID_SIZE and len(raw) == ID_SIZE and track_id == raw.hex():
+            self._ids[start : start + ID_SIZE] = raw
+            self._other_ids.pop(slot, None)
+        else:
+            self._other_ids[slot] = track_id
+
+    def _row_dict(self, slot: int) -> dict:
+        strings = self._strings
+
+        return {
+            "id": self._get_id(slot),
+            "title": self._titles[slot],
+            "artist": strings[self._artists[slot]],
+            "duration": self._durations[slot],
+            "file_path": strings[self._folders[slot]] + self._file_names[slot],
+        }
+
+
+class LazyTrackStore(TrackStore):
+    """
+    TrackStore whose tracks are read by `loader` the first time they are needed.
+    Until then only the number of tracks is known.
+    """
+
+    def __init__(self, count: int, loader: Callable[[], TrackStore]):
+        super().__init__()
+        self._count = count
+        self._loader: Callable[[], TrackStore] | None = loader
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def load(self) -> None:
+        if self._loader is None:
+            return
+
+        loaded = self._loader()
+
+        # Take over the columns of the loaded store
+        for name, value in vars(loaded).items():
+            setattr(self, name, value)
+
+        self._loader = None
+
+    def __len__(self) -> int:
+        return self._count if self._loader is not None else len(self._order)
+
+    # Everything else needs the tracks
+
+    def to_columns(self) -> "TrackColumns":
+        self.load()
+        return super().to_columns()
+
+    def to_dicts(self, start: int = 0, stop: int | None = None) -> List[dict]:
+        self.load()
+        return super().to_dicts(start, stop)
+
+    def retain(self, keep: Callable[[TrackRow], bool]) -> None:
+        self.load()
+        super().retain(keep)
+
+    def __getitem__(self, index):
+        self.load()
+        return super().__getitem__(index)
+
+    def __iter__(self) -> Iterator[TrackRow]:
+        self.load()
+        return super().__iter__()
+
+    def __setitem__(self, index, track: Track | TrackRow) -> None:
+        self.load()
+        super().__setitem__(index, track)
+
+    def __delitem__(self, index) -> None:
+        self.load()
+        super().__delitem__(index)
+
+    def insert(self, index: int, track: Track | TrackRow) -> None:
+        self.load()
+        super().insert(index, track)
+
+    def move(self, from_index: int, to_index: int) -> None:
+        self.load()
+        super().move(from_index, to_index)
+
+    def __eq__(self, other) -> bool:
+        self.load()
+        return super().__eq__(other)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"LazyTrackStore({len(self)} tracks, {state})"
+
+
+def _track_values(track: Track | TrackRow) -> tuple:
+    if isinstance(track, TrackRow):
+        duration = track.duration_seconds
+    else:
+        duration = track.duration.total_seconds()
+
+    return track.id, track.title, track.artist, duration, track.file_path
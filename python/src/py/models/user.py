@@ -4,7 +4,7 @@ Module defining the User data model.
 
 import logging
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List
 from models.playlist import Playlist
 
 @dataclass
@@ -12,19 +12,48 @@ class User:
     username: str
     playlists: List[Playlist] = field(default_factory=list)
     recently_played_playlists: List[str] = field(default_factory=list)
+    # Index of playlists by ID, kept in sync by the methods below
+    _playlists_by_id: Dict[str, Playlist] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        self._playlists_by_id = {playlist.id: playlist for playlist in self.playlists}
+
+    def get_playlist(self, playlist_id: str) -> Playlist | None:
+        return self._playlists_by_id.get(playlist_id)
 
     def add_playlist(self, playlist: Playlist) -> None:
         logging.info(f"Adding '{playlist.title}' playlist.")
         self.playlists.append(playlist)
+        self._playlists_by_id[playlist.id] = playlist
+
+    def insert_playlist(self, index: int, playlist: Playlist) -> None:
+        self.playlists.insert(index, playlist)
+        self._playlists_by_id[playlist.id] = playlist
+
+    def index_of_playlist(self, playlist: Playlist) -> int:
+        """
+        Returns the position of the playlist, compared by identity rather than by value.
+        """
+
+        for index, p in enumerate(self.playlists):
+            if p is playlist:
+                return index
+
+        raise ValueError(f"Playlist '{playlist.title}' not found")
 
     def remove_playlist(self, playlist: Playlist) -> bool:
-        try:
-            self.playlists.remove(playlist)
-            return True
-        except ValueError:
+        stored = self._playlists_by_id.get(playlist.id)
+
+        if stored is None:
             logging.error(f"Failed to remove '{playlist.title}' playlist")
             return False
 
+        del self.playlists[self.index_of_playlist(stored)]
+        del self._playlists_by_id[playlist.id]
+        return True
+
 
     def add_to_recently_played(self, playlist: Playlist) -> None:
         title = playlist.title
@@ -54,3 +83,14 @@ class User:
             "playlists": [playlist.to_dict() for playlist in self.playlists],
             "recently_played_playlists": self.recently_played_playlists,
         }
+
+    def to_summary_dict(self):
+        """
+        Serializes the user with playlist summaries instead of full track lists.
+        """
+
+        return {
+            "username": self.username,
+            "playlists": [playlist.to_summary_dict() for playlist in self.playlists],
+            "recently_played_playlists": self.recently_played_playlists,
+        }
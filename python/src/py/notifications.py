@@ -0,0 +1,58 @@
+"""
+Module pushing incremental updates of user data to the frontend.
+
+Instead of the frontend fetching the whole user after every change, only
+the changed playlist summary (or the removed ID) is sent.
+"""
+
+import logging
+import eel
+import state
+from models.playlist import Playlist
+from models.user import User
+
+
+def _push(name: str, *args) -> None:
+    # In server mode, only the browser tabs of the user the update concerns get it
+    if state.sessions is not None:
+        state.sessions.push(state.current().username, name, args)
+        return
+
+    try:
+        # JS functions exposed by the frontend become attributes after eel.init
+        getattr(eel, name)(*args)
+    except Exception as e:
+        logging.warning(f"Failed to push '{name}' to the frontend: {e}")
+
+
+def playlist_updated(playlist: Playlist) -> None:
+    """
+    Sends the summary of a created, renamed or refreshed playlist.
+    """
+
+    _push("playlist_updated", playlist.to_summary_dict())
+
+
+def playlist_tracks_changed(playlist: Playlist) -> None:
+    """
+    Sends the summary of a playlist whose tracks changed outside of the frontend,
+    so an opened track list can be reloaded.
+    """
+
+    _push("playlist_tracks_changed", playlist.to_summary_dict())
+
+
+def playlist_removed(playlist_id: str) -> None:
+    _push("playlist_removed", playlist_id)
+
+
+def recently_played_updated(user: User) -> None:
+    _push("recently_played_updated", user.recently_played_playlists)
+
+
+def playback_event(event: dict) -> None:
+    """
+    Sends an event published by the media player (see MediaPlayer._publish).
+    """
+
+    _push("playback_event", event)
@@ -0,0 +1,239 @@
+"""
+Module implementing crash-safe, coalesced writes of application data files.
+
+Also the base of the caches kept as a single JSON file per user (see JsonCache).
+
+A file is written as soon as it is saved; saves requested while it is being
+written, or within a short window after, are merged into the next write.
+Every write goes to a temporary file that is fsynced and renamed over the
+target, so the file on disk is always either the old or the new version.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict
+import gevent
+from gevent.event import AsyncResult, Event
+import metrics
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    Replaces the file at the given path with the data in a crash-safe way.
+    """
+
+    path = Path(path)
+
+    # A unique name, so concurrent writes of the same file never share their temporary file
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+        raise
+
+    # Make the rename itself durable (not supported on Windows)
+    if os.name == "posix":
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class JsonCache:
+    """
+    A cache stored as a single JSON object: read whole by load, and written
+    back by save only when it has been modified since.
+
+    Subclasses keep their entries in `_entries`, set `_dirty` when they change
+    them, and hold `_lock` when they are used from several threads at once.
+    Derived state is built from the loaded entries by overriding _loaded.
+    """
+
+    # Name of the cache in log messages
+    description = "cache"
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self._entries: dict = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cache_path: Path):
+        """
+        Loads the cache from disk. A missing or unreadable file results in an empty cache.
+        """
+
+        cache = cls(cache_path)
+
+        if not cache.cache_path.is_file():
+            return cache
+
+        try:
+            with cache.cache_path.open("r", encoding="utf-8") as f:
+                cache._loaded(json.load(f))
+
+            logging.info(f"Loaded {len(cache._entries)} {cache.description} entries.")
+
+            return cache
+
+        except Exception as e:
+            logging.warning(f"Failed to load {cache.description}, starting empty: {e}")
+
+            return cls(cache_path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def save(self) -> bool:
+        """
+        Writes the cache to disk if it has been modified since the last save.
+        """
+
+        if not self._dirty:
+            return True
+
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # Changes made while the file is written mark the cache modified again
+            with self._lock:
+                data = json.dumps(self._entries, ensure_ascii=False).encode("utf-8")
+                self._dirty = False
+
+            atomic_write(self.cache_path, data)
+
+            return True
+
+        except Exception as e:
+            self._dirty = True
+            logging.error(f"Error saving {self.description}: {e}")
+
+            return False
+
+    def _loaded(self, entries: dict) -> None:
+        self._entries = entries
+
+
+@dataclass
+class _PendingSave:
+    serialize: Callable[[], bytes]
+    result: AsyncResult = field(default_factory=AsyncResult)
+
+
+class WriteBehindSaver:
+    """
+    Writes a file at most once per `window` seconds, coalescing the saves in between.
+
+    A single write of a file is in flight at a time: the first save is written
+    right away, and saves requested while it is written (or within `window`
+    seconds after it started) are merged into the next write.
+
+    `save` still waits until the data has been written and returns whether
+    the write succeeded, so callers can roll back their changes on failure.
+    Waiting only suspends the calling greenlet, other requests keep running
+    and may join the same write.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        # path -> save waiting for the next write of the file
+        self._pending: Dict[Path, _PendingSave] = {}
+        # path -> greenlet writing the file (see _run)
+        self._writers: Dict[Path, gevent.Greenlet] = {}
+        # Set while flushing, wakes up writers waiting out the window
+        self._flushing = Event()
+
+    def save(self, path: Path, serialize: Callable[[], bytes]) -> bool:
+        """
+        Schedules `serialize()` to be written to `path` and waits for the result.
+        Only the most recent serializer of a coalesced group is called.
+        """
+
+        pending = self._pending.get(path)
+
+        if pending is None:
+            pending = self._pending[path] = _PendingSave(serialize)
+        else:
+            pending.serialize = serialize
+
+        if path not in self._writers:
+            self._writers[path] = gevent.spawn(self._run, path)
+
+        return pending.result.get()
+
+    def flush(self) -> None:
+        """
+        Writes all pending saves without waiting out the window, e.g. before the application exits.
+        """
+
+        self._flushing.set()
+
+        try:
+            gevent.joinall(list(self._writers.values()))
+        finally:
+            self._flushing.clear()
+
+    def _run(self, path: Path) -> None:
+        """
+        Writes the pending save of the file until there is none left.
+        """
+
+        try:
+            while True:
+                pending = self._pending.pop(path, None)
+
+                if pending is None:
+                    return
+
+                started = time.monotonic()
+                pending.result.set(self._write(path, pending.serialize))
+
+                # Saves requested until then are merged into the next write
+                remaining = self.window - (time.monotonic() - started)
+
+                if remaining > 0:
+                    self._flushing.wait(remaining)
+        finally:
+            del self._writers[path]
+
+    def _write(self, path: Path, serialize: Callable[[], bytes]) -> bool:
+        try:
+            # Serialise on the event loop, where the data is not modified concurrently
+            data = serialize()
+
+            # Disk writes and fsync block, keep them off the event loop
+            with metrics.span("storage.write"):
+                gevent.get_hub().threadpool.apply(atomic_write, (path, data))
+
+            metrics.increment("storage.bytes_written", len(data))
+
+            return True
+
+        except Exception as e:
+            logging.error(f"Error writing '{path}': {e}")
+
+            return False
@@ -0,0 +1,135 @@
+"""
+Module managing the folder picker helper process (utils/folder_picker.py).
+
+The helper is started with the interpreter running the application on the
+first request and kept running, so later dialogs open without starting Python
+and tkinter again. Requests and responses are JSON lines over its stdin and
+stdout; if the helper has died it is started again once per request.
+"""
+
+import json
+import logging
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+# Path to the folder picker script run by the helper process
+FOLDER_PICKER_PATH = Path(__file__).parent / "utils" / "folder_picker.py"
+
+# How long the helper gets to exit after being asked to, before it is killed
+CLOSE_TIMEOUT_SECONDS = 2.0
+
+
+class FolderPickerHelper:
+    def __init__(self, script_path: Path = FOLDER_PICKER_PATH):
+        self.script_path = Path(script_path)
+        # Folder the next dialog opens in, kept here too so it survives a restart of the helper
+        self.last_directory: str | None = None
+        self._process: subprocess.Popen | None = None
+        self._next_id = 0
+        self._closed = False
+        # A single dialog at a time, requests may come from several threads
+        self._lock = threading.Lock()
+
+    def pick(self) -> str:
+        """
+        Opens a folder selection dialog and waits for it to close.
+        Returns the selected folder path, or an empty string if it was cancelled.
+        """
+
+        with self._lock:
+            for attempt in range(2):
+                if self._closed:
+                    return ""
+
+                try:
+                    response = self._request(
+                        {"command": "pick", "initial_dir": self.last_directory}
+                    )
+                except (OSError, EOFError, ValueError) as e:
+                    logging.warning(f"Folder picker helper failed (attempt {attempt + 1}): {e}")
+                    self._kill()
+                    continue
+
+                if "error" in response:
+                    logging.error(f"Folder picker helper error: {response['error']}")
+                    return ""
+
+                path = response.get("path", "")
+
+                if path:
+                    self.last_directory = path
+
+                return path
+
+        return ""
+
+    def close(self) -> None:
+        """
+        Asks the helper to exit, killing it if it does not in time.
+        Not serialised with pick, so a dialog left open does not keep the application running.
+        """
+
+        self._closed = True
+        process = self._process
+
+        if process is None or process.poll() is not None:
+            return
+
+        try:
+            process.stdin.write(json.dumps({"command": "quit"}) + "\n")
+            process.stdin.flush()
+            process.wait(timeout=CLOSE_TIMEOUT_SECONDS)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+    def _request(self, request: dict) -> dict:
+        self._next_id += 1
+        request_id = self._next_id
+
+        self._send({"id": request_id, **request})
+
+        while True:
+            line = self._process.stdout.readline()
+
+            if not line:
+                raise EOFError("helper process exited")
+
+            response = json.loads(line)
+
+            # Responses to earlier requests (e.g. left by a failed attempt) are skipped
+            if response.get("id") == request_id:
+                return response
+
+    def _send(self, request: dict) -> None:
+        if self._process is None or self._process.poll() is not None:
+            self._start()
+
+        self._process.stdin.write(json.dumps(request) + "\n")
+        self._process.stdin.flush()
+
+    def _start(self) -> None:
+        logging.info("Starting folder picker helper.")
+
+        self._process = subprocess.Popen(
+            [sys.executable, str(self.script_path)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            # No console window next to the dialog on Windows
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+
+    def _kill(self) -> None:
+        if self._process is None:
+            return
+
+        try:
+            self._process.kill()
+            self._process.wait()
+        except OSError:
+            pass
+
+        self._process = None
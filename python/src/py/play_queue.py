@@ -0,0 +1,220 @@
+"""
+Module defining the playback order of a playlist: shuffle, repeat modes and a
+queue of tracks the user wants to hear next.
+
+Tracks are referred to by their index in the playlist, so shuffling permutes
+indices instead of copying tracks, and the queue holds indices in a deque.
+"""
+
+import random
+from collections import deque
+from typing import Deque, List, Sequence
+
+REPEAT_OFF = "off"
+REPEAT_ALL = "all"
+REPEAT_ONE = "one"
+REPEAT_MODES = (REPEAT_OFF, REPEAT_ALL, REPEAT_ONE)
+
+
+class PlayQueue:
+    def __init__(self, track_count: int = 0, start: int = 0):
+        self.repeat_mode: str = REPEAT_OFF
+        self.shuffle: bool = False
+        self.reset(track_count, start)
+
+    def reset(self, track_count: int, start: int = 0) -> None:
+        """
+        Starts over with a playlist of `track_count` tracks at track `start`.
+        Shuffle and repeat mode are kept, queued tracks are dropped.
+        """
+
+        self.track_count = track_count
+        # Playing order as track indices; range(n) stands for the playlist order without a list
+        self._order: Sequence[int] = range(track_count)
+        self._position: int = 0
+        # Tracks queued by the user, played before the rest of the order
+        self._queued: Deque[int] = deque()
+        self.current: int | None = None
+
+        if 0 <= start < track_count:
+            self.current = start
+            self._position = start
+
+        if self.shuffle:
+            self._shuffle_order()
+
+    def enqueue(self, index: int) -> None:
+        """
+        Adds a track to the end of the queue.
+        """
+
+        self._check_index(index)
+        self._queued.append(index)
+
+    def play_next(self, index: int) -> None:
+        """
+        Puts a track at the front of the queue, so it is played right after the current one.
+        """
+
+        self._check_index(index)
+        self._queued.appendleft(index)
+
+    def dequeue(self) -> int | None:
+        """
+        Removes and returns the first queued track, if any.
+        """
+
+        return self._queued.popleft() if self._queued else None
+
+    @property
+    def queued(self) -> List[int]:
+        return list(self._queued)
+
+    def set_repeat_mode(self, mode: str) -> None:
+        if mode not in REPEAT_MODES:
+            raise ValueError(f"Unknown repeat mode '{mode}'")
+
+        self.repeat_mode = mode
+
+    def set_shuffle(self, shuffle: bool) -> None:
+        if shuffle == self.shuffle:
+            return
+
+        self.shuffle = shuffle
+
+        if shuffle:
+            self._shuffle_order()
+        else:
+            # Continue in playlist order from the current track
+            self._order = range(self.track_count)
+            self._position = self.current if self.current is not None else 0
+
+    def peek_next(self, auto: bool = False) -> int | None:
+        """
+        Returns the track that next() would move to, without moving.
+        `auto` is set when the current track has ended by itself,
+        which is the only case in which REPEAT_ONE repeats it.
+        """
+
+        if auto and self.repeat_mode == REPEAT_ONE and self.current is not None:
+            return self.current
+
+        if self._queued:
+            return self._queued[0]
+
+        position = self._next_position()
+
+        return self._order[position] if position is not None else None
+
+    def next(self, auto: bool = False) -> int | None:
+        """
+        Moves to the next track and returns its index, or None at the end of the playlist.
+        """
+
+        if auto and self.repeat_mode == REPEAT_ONE and self.current is not None:
+            return self.current
+
+        if self._queued:
+            # Queued tracks do not move the position in the playing order
+            self.current = self._queued.popleft()
+            return self.current
+
+        position = self._next_position()
+
+        if position is None:
+            return None
+
+        if position == 0 and self.shuffle and self.track_count > 1:
+            # A new round of REPEAT_ALL gets a new order
+            self._shuffle_order(keep_current=False)
+
+        self._position = position
+        self.current = self._order[position]
+
+        return self.current
+
+    def peek_previous(self) -> int | None:
+        position = self._previous_position()
+
+        return self._order[position] if position is not None else None
+
+    def previous(self) -> int | None:
+        """
+        Moves to the previous track in the playing order and returns its index.
+        """
+
+        position = self._previous_position()
+
+        if position is None:
+            return None
+
+        self._position = position
+        self.current = self._order[position]
+
+        return self.current
+
+    def move(self, from_index: int, to_index: int) -> None:
+        """
+        Follows a track being moved within the playlist, so the order,
+        the queue and the current track still point at the same tracks.
+        """
+
+        def remap(index: int) -> int:
+            if index == from_index:
+                return to_index
+            if from_index < index <= to_index:
+                return index - 1
+            if to_index <= index < from_index:
+                return index + 1
+            return index
+
+        if self.current is not None:
+            self.current = remap(self.current)
+
+        self._queued = deque(remap(index) for index in self._queued)
+
+        if self.shuffle:
+            self._order = [remap(index) for index in self._order]
+        elif self.current is not None:
+            self._position = self.current
+
+    def _next_position(self) -> int | None:
+        if self.track_count == 0:
+            return None
+
+        if self.current is None:
+            return 0
+
+        position = self._position + 1
+
+        if position < self.track_count:
+            return position
+
+        return 0 if self.repeat_mode == REPEAT_ALL else None
+
+    def _previous_position(self) -> int | None:
+        if self.track_count == 0 or self.current is None:
+            return None
+
+        position = self._position - 1
+
+        if position >= 0:
+            return position
+
+        return self.track_count - 1 if self.repeat_mode == REPEAT_ALL else None
+
+    def _shuffle_order(self, keep_current: bool = True) -> None:
+        order = list(range(self.track_count))
+        random.shuffle(order)
+
+        # The current track stays first, so the rest of the playlist is still ahead
+        if keep_current and self.current is not None:
+            current_position = order.index(self.current)
+            order[0], order[current_position] = order[current_position], order[0]
+
+        self._order = order
+        self._position = 0
+
+    def _check_index(self, index: int) -> None:
+        if not 0 <= index < self.track_count:
+            raise IndexError(f"Track index {index} out of range")
@@ -0,0 +1,204 @@
+"""
+Module implementing the scanning engine shared by playlist creation and refresh.
+
+Folders are walked recursively (e.g. artist/album/track) with os.scandir, whose
+entries carry the file type and, on Windows, the stat result of every file, so
+listing a folder takes no extra system call per file. Symlinked folders are
+followed, each folder is entered only once, so symlink loops end the walk.
+
+Audio tags are read on a bounded thread pool, so disk and network latency of
+one file overlaps with the others, while results keep the order of the input.
+Files are streamed from the walk into the pool, so reading tags starts with
+the first files found instead of after the whole folder tree was listed.
+"""
+
+import fnmatch
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+import metrics
+from config import AUDIO_EXTENSIONS, SCAN_EXCLUDE_PATTERNS, SCAN_MAX_DEPTH, SCAN_WORKERS
+from models.track import Track
+from tag_cache import TagCache, read_track
+
+# Files submitted to the thread pool ahead of the one being waited for, per worker
+PREFETCH_PER_WORKER = 4
+
+
+def exclude_matcher(patterns: Iterable[str] = SCAN_EXCLUDE_PATTERNS) -> Callable[[str], bool]:
+    """
+    Returns a function telling whether a file or folder name matches any of the glob patterns.
+    """
+
+    patterns = list(patterns)
+
+    if not patterns:
+        return lambda name: False
+
+    # Names are case-insensitive on Windows, like in fnmatch.fnmatch
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    match = re.compile("|".join(fnmatch.translate(p) for p in patterns), flags).match
+
+    return lambda name: match(name) is not None
+
+
+def _folder_key(path: str) -> Tuple[int, int]:
+    # Identifies a folder regardless of the path (e.g. through a symlink) it is reached by
+    stat = os.stat(path)
+
+    return stat.st_dev, stat.st_ino
+
+
+def walk_folders(
+    folder: Path | str,
+    max_depth: int | None = SCAN_MAX_DEPTH,
+    exclude: Iterable[str] = SCAN_EXCLUDE_PATTERNS,
+) -> Iterator[Tuple[str, int, List[os.DirEntry]]]:
+    """
+    Yields the path, depth and file entries of the folder and of each of its subfolders,
+    every folder before its subfolders. `max_depth` limits how deep subfolders are
+    entered (0 lists only the folder itself, None has no limit), and files and folders
+    whose names match any of the `exclude` glob patterns are skipped.
+
+    Raises OSError if the folder itself cannot be read, unreadable subfolders are skipped.
+    """
+
+    is_excluded = exclude_matcher(exclude)
+    folder = os.fspath(folder)
+    visited = {_folder_key(folder)}
+    stack = [(folder, 0)]
+
+    while stack:
+        path, depth = stack.pop()
+        files = []
+        subfolders = []
+
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if is_excluded(entry.name):
+                        continue
+
+                    try:
+                        # Both follow symlinks, broken ones are neither
+                        if entry.is_dir():
+                            if max_depth is None or depth < max_depth:
+                                subfolders.append(entry.path)
+                        elif entry.is_file():
+                            files.append(entry)
+                    except OSError:
+                        continue
+
+        except OSError as e:
+            if depth == 0:
+                raise
+
+            logging.warning(f"Skipped folder '{path}': {e}")
+            continue
+
+        yield path, depth, files
+
+        # Reversed, so subfolders are walked in the order they were listed
+        for subfolder in reversed(subfolders):
+            try:
+                key = _folder_key(subfolder)
+            except OSError:
+                continue
+
+            if key in visited:
+                continue
+
+            visited.add(key)
+            stack.append((subfolder, depth + 1))
+
+
+def walk_audio_files(
+    folder: Path | str,
+    max_depth: int | None = SCAN_MAX_DEPTH,
+    exclude: Iterable[str] = SCAN_EXCLUDE_PATTERNS,
+) -> Iterator[os.DirEntry]:
+    """
+    Yields entries of the audio files in the folder and its subfolders, see walk_folders.
+    """
+
+    for _, _, files in walk_folders(folder, max_depth, exclude):
+        for entry in files:
+            if os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                yield entry
+
+
+def iter_tracks(
+    audio_files: Iterable[Path | os.DirEntry],
+    tag_cache: TagCache | None = None,
+    workers: int = SCAN_WORKERS,
+) -> Iterator[Track]:
+    """
+    Reads the metadata of the given audio files in parallel, as they are produced.
+    Yields tracks in the same order as the files; unreadable files are skipped.
+
+    For DirEntry objects (see walk_audio_files) their cached stat result is used.
+    """
+
+    def read(audio_file: Path | os.DirEntry) -> Track | None:
+        try:
+            if isinstance(audio_file, os.DirEntry):
+                return read_track(Path(audio_file.path), tag_cache, audio_file.stat())
+
+            return read_track(audio_file, tag_cache)
+        except Exception as e:
+            logging.warning(f"Skipped file '{audio_file.name}': {e}")
+            return None
+
+    workers = max(1, workers)
+    start = time.perf_counter()
+    file_count = 0
+    track_count = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        for audio_file in audio_files:
+            pending.append(executor.submit(read, audio_file))
+            file_count += 1
+
+            # Bounded, so a huge folder tree does not queue all of its files at once
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                track = pending.popleft().result()
+
+                if track is not None:
+                    track_count += 1
+                    yield track
+
+        while pending:
+            track = pending.popleft().result()
+
+            if track is not None:
+                track_count += 1
+                yield track
+
+    if not file_count:
+        return
+
+    elapsed = time.perf_counter() - start
+
+    metrics.increment("scan.files", file_count)
+    metrics.increment("scan.skipped_files", file_count - track_count)
+    metrics.observe("scan.batch", elapsed * 1000)
+    metrics.observe("scan.files_per_second", file_count / max(elapsed, 1e-9))
+
+
+def scan_tracks(
+    audio_files: Iterable[Path | os.DirEntry],
+    tag_cache: TagCache | None = None,
+    workers: int = SCAN_WORKERS,
+) -> List[Track]:
+    """
+    Reads the metadata of the given audio files in parallel, see iter_tracks.
+    """
+
+    return list(iter_tracks(audio_files, tag_cache, workers))
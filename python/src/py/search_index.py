@@ -0,0 +1,411 @@
+"""
+Module implementing full-text search over track titles, artists and playlist titles.
+
+An inverted index maps every word to the tracks and playlists containing it,
+and a sorted vocabulary turns each word of a query into a prefix match, so
+results show up while the user is still typing. The index is updated per
+playlist as playlists are created, renamed, refreshed or removed.
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import unicodedata
+from itertools import chain, islice
+from typing import Dict, List, Set, Tuple
+import gevent
+from models.playlist import Playlist
+from models.user import User
+
+TRACK = "track"
+PLAYLIST = "playlist"
+
+# Score of a query word found in a field (title, artist), as a whole word or as the beginning of one
+WORD_SCORES = (4.0, 2.0)
+PREFIX_SCORES = (2.0, 1.0)
+# Playlists are few, and usually what the user is looking for when they match
+PLAYLIST_BOOST = 1.5
+
+# How much more checking a candidate's words costs than merging a posting
+FILTER_COST = 10
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lowercase words without accents, e.g. "Café Del Mar" -> ["cafe", "del", "mar"].
+    """
+
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+
+    return _WORD.findall(text)
+
+
+class _Document:
+    __slots__ = ("kind", "playlist", "track_id", "title", "artist", "title_words", "artist_words", "words")
+
+    def __init__(self, kind: str, playlist: Playlist, track_id: str | None, title: str, artist: str):
+        self.kind = kind
+        self.playlist = playlist
+        self.track_id = track_id
+        self.title = title
+        self.artist = artist
+        self.title_words = tuple(tokenize(title))
+        self.artist_words = tuple(tokenize(artist))
+        self.words = frozenset(self.title_words + self.artist_words)
+
+    @property
+    def fields(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        return self.title_words, self.artist_words
+
+    def to_dict(self, score: float) -> dict:
+        result = {
+            "type": self.kind,
+            "playlist_id": self.playlist.id,
+            "playlist_title": self.playlist.title,
+            "title": self.title,
+            "score": score,
+        }
+
+        if self.kind == TRACK:
+            result["track_id"] = self.track_id
+            result["artist"] = self.artist
+
+        return result
+
+
+class SearchIndex:
+    def __init__(self):
+        self.built = False
+        # Set while build runs, playlists changed meanwhile are indexed right away
+        self._building = False
+        self._next_id = 0
+        self._documents: Dict[int, _Document] = {}
+        self._playlist_ids: Set[int] = set()
+        # Word -> IDs of the documents containing it in their title and in their artist.
+        # Words of removed documents are kept with no IDs, until there are many of them
+        self._postings: Dict[str, Tuple[Set[int], Set[int]]] = {}
+        self._empty_words = 0
+        # All words of the postings, sorted for prefix lookups
+        self._vocabulary: List[str] = []
+        # Words added since the vocabulary was last sorted
+        self._new_words: List[str] = []
+        # Documents of every playlist (its own and its tracks'), by playlist ID
+        self._playlist_documents: Dict[str, List[int]] = {}
+
+    def build(self, user: User) -> None:
+        """
+        Indexes all playlists of the user. Tracks of playlists that were not
+        loaded yet are loaded, so this is done on the first search only.
+        """
+
+        logging.info(f"Building search index of {len(user.playlists)} playlists.")
+
+        self._building = True
+
+        try:
+            for playlist in list(user.playlists):
+                # Removed while earlier playlists were indexed
+                if user.get_playlist(playlist.id) is not playlist:
+                    continue
+
+                self.index_playlist(playlist, force=True)
+                # Let other requests run between playlists
+                gevent.sleep(0)
+        finally:
+            self._building = False
+
+        self.built = True
+
+        logging.info(f"Search index contains {len(self._documents)} entries.")
+
+    def index_playlist(self, playlist: Playlist, force: bool = False) -> None:
+        """
+        (Re)indexes a playlist and all of its tracks.
+        Does nothing until the index is being built, unless `force` is set.
+        """
+
+        if not (self.built or self._building or force):
+            return
+
+        self.remove_playlist(playlist.id)
+
+        documents = [self._add(_Document(PLAYLIST, playlist, None, playlist.title, ""))]
+
+        for track in playlist.tracks:
+            documents.append(
+                self._add(_Document(TRACK, playlist, track.id, track.title, track.artist))
+            )
+
+        self._playlist_documents[playlist.id] = documents
+
+    def rename_playlist(self, playlist: Playlist) -> None:
+        """
+        Reindexes only the title of a renamed playlist.
+        """
+
+        documents = self._playlist_documents.get(playlist.id)
+
+        if not documents:
+            return
+
+        self._remove(documents[0])
+        documents[0] = self._add(_Document(PLAYLIST, playlist, None, playlist.title, ""))
+
+    def remove_playlist(self, playlist_id: str) -> None:
+        for document_id in self._playlist_documents.pop(playlist_id, []):
+            self._remove(document_id)
+
+    def search(self, query: str, offset: int = 0, limit: int = 50) -> dict:
+        """
+        Returns the best matching tracks and playlists containing words starting
+        with every word of the query, ranked by score, skipping `offset` results.
+        """
+
+        self._update_vocabulary()
+
+        # Words of the index starting with each word of the query
+        matches = {term: self._words_with_prefix(term) for term in set(tokenize(query))}
+
+        if len(matches) == 1:
+            best, total = self._rank_by_tiers(*matches.items(), offset + limit)
+        else:
+            candidates = self._match(list(matches.values()))
+            total = len(candidates)
+            scores = self._score(candidates, matches)
+            best = [
+                (document_id, scores[document_id])
+                for document_id in heapq.nlargest(
+                    offset + limit, scores, key=scores.__getitem__
+                )
+            ]
+
+        return {
+            "query": query,
+            "offset": offset,
+            "total": total,
+            "results": [
+                self._documents[document_id].to_dict(score)
+                for document_id, score in best[offset:]
+            ],
+        }
+
+    def _match(self, matches: List[List[str]]) -> Set[int]:
+        """
+        Returns the documents containing a word of every given list.
+        """
+
+        if not matches:
+            return set()
+
+        def cost(words: List[str]) -> int:
+            return sum(len(title) + len(artist) for title, artist in self._ids(words))
+
+        # Cheapest words first
+        matches = sorted(matches, key=cost)
+        candidates = set().union(*chain.from_iterable(self._ids(matches[0])))
+
+        for words in matches[1:]:
+            if not candidates:
+                break
+
+            if len(candidates) * FILTER_COST < cost(words):
+                # Checking the few candidates is cheaper than merging large postings
+                words = set(words)
+                candidates = {
+                    document_id
+                    for document_id in candidates
+                    if not words.isdisjoint(self._documents[document_id].words)
+                }
+            else:
+                candidates &= set().union(*chain.from_iterable(self._ids(words)))
+
+        return candidates
+
+    def _score(self, candidates: Set[int], matches: Dict[str, List[str]]) -> Dict[int, float]:
+        """
+        Scores the candidates by where the query words were found, see WORD_SCORES
+        and PREFIX_SCORES. A field scores once per query word, with its best match.
+        """
+
+        scores = dict.fromkeys(candidates, 0.0)
+
+        for term, words in matches.items():
+            if len(words) > len(candidates):
+                # Short query words match lots of words, check the candidates instead
+                for document_id in candidates:
+                    scores[document_id] += _term_score(self._documents[document_id], term)
+
+                continue
+
+            for field in (0, 1):
+                scored: Set[int] = set()
+
+                # The whole word first, it scores more than words starting with it
+                for word in sorted(words, key=lambda word: word != term):
+                    ids = self._postings[word][field] & candidates
+                    ids -= scored
+
+                    field_score = WORD_SCORES[field] if word == term else PREFIX_SCORES[field]
+
+                    for document_id in ids:
+                        scores[document_id] += field_score
+
+                    scored |= ids
+
+        for document_id in self._playlist_ids & candidates:
+            scores[document_id] *= PLAYLIST_BOOST
+
+        return scores
+
+    def _rank_by_tiers(
+        self, match: Tuple[str, List[str]], count: int
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        Returns the `count` best documents for a single query word with their scores,
+        and the number of all matching documents.
+
+        With one query word, a track only scores one of a few values, depending on
+        whether each field has the whole word, a word starting with it, or neither.
+        The tracks of each such tier are found with set operations, so the many
+        results of a short query word are not scored one by one.
+        """
+
+        term, words = match
+
+        # Per field: the documents with the whole word, with only words starting with it,
+        # and without either (computed when needed, it is usually not)
+        field_tiers = []
+
+        for field in (0, 1):
+            exact = self._postings[term][field] if term in self._postings else set()
+            prefix = set().union(*(self._postings[word][field] for word in words))
+            prefix -= exact
+            field_tiers.append(
+                [(WORD_SCORES[field], exact), (PREFIX_SCORES[field], prefix), (0.0, None)]
+            )
+
+        candidates = set().union(*(ids for tiers in field_tiers for _, ids in tiers[:2]))
+
+        def ids_of(field: int, tier: int) -> Set[int]:
+            score, ids = field_tiers[field][tier]
+
+            if ids is None:
+                ids = candidates - field_tiers[field][0][1] - field_tiers[field][1][1]
+                field_tiers[field][tier] = (score, ids)
+
+            return ids
+
+        tiers = sorted(
+            (
+                (field_tiers[0][title][0] + field_tiers[1][artist][0], title, artist)
+                for title in range(3)
+                for artist in range(3)
+            ),
+            reverse=True,
+        )
+
+        # Playlists are boosted, so they are scored separately
+        best = [
+            (document_id, _term_score(self._documents[document_id], term) * PLAYLIST_BOOST)
+            for document_id in candidates & self._playlist_ids
+        ]
+        track_count = 0
+
+        for score, title, artist in tiers:
+            if track_count >= count or score == 0:
+                break
+
+            ids = ids_of(0, title) & ids_of(1, artist)
+            tier_tracks = (i for i in ids if i not in self._playlist_ids)
+            tier_best = [
+                (document_id, score)
+                for document_id in islice(tier_tracks, count - track_count)
+            ]
+
+            best.extend(tier_best)
+            track_count += len(tier_best)
+
+        best.sort(key=lambda result: result[1], reverse=True)
+
+        return best[:count], len(candidates)
+
+    def _ids(self, words: List[str]) -> List[Tuple[Set[int], Set[int]]]:
+        return [self._postings[word] for word in words]
+
+    def _words_with_prefix(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff", start)
+
+        return self._vocabulary[start:end]
+
+    def _add(self, document: _Document) -> int:
+        document_id = self._next_id
+        self._next_id += 1
+        self._documents[document_id] = document
+
+        if document.kind == PLAYLIST:
+            self._playlist_ids.add(document_id)
+
+        for field, words in enumerate(document.fields):
+            for word in words:
+                entry = self._postings.get(word)
+
+                if entry is None:
+                    entry = self._postings[word] = (set(), set())
+                    self._new_words.append(word)
+                elif not entry[0] and not entry[1]:
+                    self._empty_words -= 1
+
+                entry[field].add(document_id)
+
+        return document_id
+
+    def _remove(self, document_id: int) -> None:
+        document = self._documents.pop(document_id)
+        self._playlist_ids.discard(document_id)
+
+        for field, words in enumerate(document.fields):
+            for word in words:
+                entry = self._postings[word]
+
+                if document_id in entry[field]:
+                    entry[field].discard(document_id)
+
+                    if not entry[0] and not entry[1]:
+                        self._empty_words += 1
+
+    def _update_vocabulary(self) -> None:
+        """
+        Adds new words to the sorted vocabulary, and drops words
+        without documents once they make up half of it.
+        """
+
+        if self._empty_words > max(1000, len(self._postings) // 2):
+            self._postings = {
+                word: entry for word, entry in self._postings.items() if entry[0] or entry[1]
+            }
+            self._empty_words = 0
+            self._vocabulary = sorted(self._postings)
+        elif len(self._new_words) > 1000:
+            self._vocabulary = sorted(self._postings)
+        else:
+            for word in self._new_words:
+                bisect.insort(self._vocabulary, word)
+
+        self._new_words.clear()
+
+
+def _term_score(document: _Document, term: str) -> float:
+    score = 0.0
+
+    for field, words in enumerate(document.fields):
+        if term in words:
+            score += WORD_SCORES[field]
+        elif any(word.startswith(term) for word in words):
+            score += PREFIX_SCORES[field]
+
+    return score
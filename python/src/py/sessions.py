@@ -0,0 +1,294 @@
+"""
+Module implementing the registry of users and their sessions in server mode.
+
+Every browser tab opens a session for a user and sends its ID with each call.
+Opening a session requires the user's token (see issue_token), so only users
+that were issued one are served, and only to whoever holds their token.
+The user's context (see UserContext) is loaded on the first call of any of
+their sessions and shared by all of them. Contexts are kept in LRU order: when
+more than `max_users` are loaded, the least recently used ones are unloaded,
+and so are users without sessions once they have been idle for `idle_seconds`.
+A context is never unloaded while a call is using it, and an unloaded user is
+loaded again by their next call, from their files under PROGRAM_DATA.
+
+Updates are pushed to the browser tabs of the user they concern, through the
+event sockets the tabs attach to their sessions.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import re
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import gevent
+from gevent.event import AsyncResult
+import metrics
+from config import (
+    PROGRAM_DATA,
+    SERVER_TOKEN_FILE_NAME,
+    SESSION_IDLE_SECONDS,
+    SESSION_MAX_USERS,
+)
+from persistence import atomic_write
+from user_context import UserContext
+
+# Names of users, which are also the names of their folders under PROGRAM_DATA
+USERNAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def issue_token(username: str, root: Path = PROGRAM_DATA) -> str:
+    """
+    Creates a new token for the user to open sessions with, replacing their previous one.
+    Only its hash is stored, the token itself is returned to be handed to the user.
+    """
+
+    _check_username(username)
+
+    token = secrets.token_urlsafe(32)
+    path = Path(root) / username / SERVER_TOKEN_FILE_NAME
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write(path, _hash_token(token).encode("ascii"))
+
+    return token
+
+
+def check_token(username: str, token: str, root: Path = PROGRAM_DATA) -> bool:
+    """
+    Returns whether the token is the one issued to the user.
+    """
+
+    if not isinstance(token, str) or not token:
+        return False
+
+    try:
+        expected = (Path(root) / username / SERVER_TOKEN_FILE_NAME).read_text(encoding="ascii")
+    except (OSError, ValueError):
+        return False
+
+    return hmac.compare_digest(expected.strip(), _hash_token(token))
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _check_username(username: str) -> None:
+    if not isinstance(username, str) or not USERNAME_PATTERN.fullmatch(username):
+        raise ValueError(f"Invalid username: {username!r}")
+
+
+@dataclass
+class Session:
+    username: str
+    last_used: float = field(default_factory=time.monotonic)
+    # Event sockets of the browser tab, see attach
+    sockets: List[Any] = field(default_factory=list)
+
+
+class SessionRegistry:
+    def __init__(
+        self,
+        load: Callable[[str], UserContext],
+        authenticate: Callable[[str, str], bool] = check_token,
+        max_users: int = SESSION_MAX_USERS,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+        on_loaded: Callable[[UserContext], None] | None = None,
+    ):
+        self._load = load
+        # Checks the token a session is opened with, before anything of the user is loaded
+        self._authenticate = authenticate
+        self.max_users = max(1, max_users)
+        self.idle_seconds = idle_seconds
+        # Called after a user's context has been loaded, e.g. to refresh their playlists
+        self.on_loaded = on_loaded
+        self._sessions: Dict[str, Session] = {}
+        # username -> context, from the least to the most recently used
+        self._contexts: OrderedDict[str, UserContext] = OrderedDict()
+        # username -> result of the load in progress, shared by concurrent calls
+        self._loading: Dict[str, AsyncResult] = {}
+        self._sweeper: gevent.Greenlet | None = None
+
+    def open(self, username: str, token: str) -> str:
+        """
+        Opens a session for the user and returns its ID. The user is loaded on first use.
+        Raises ValueError for names that cannot be used as a folder name,
+        and PermissionError if the token is not the user's.
+        """
+
+        _check_username(username)
+
+        if not self._authenticate(username, token):
+            metrics.increment("sessions.rejected")
+            logging.warning(f"Rejected a session for user '{username}', invalid token.")
+            raise PermissionError("Invalid username or token")
+
+        session_id = secrets.token_urlsafe(24)
+        self._sessions[session_id] = Session(username)
+
+        metrics.increment("sessions.opened")
+        logging.info(f"Opened a session for user '{username}'.")
+
+        if self._sweeper is None or self._sweeper.dead:
+            self._sweeper = gevent.spawn(self._sweep)
+
+        return session_id
+
+    def context(self, session_id: str) -> UserContext:
+        """
+        Returns the context of the session's user, loading it if needed.
+        Raises KeyError for unknown or expired sessions.
+        """
+
+        session = self._sessions.get(session_id)
+
+        if session is None:
+            raise KeyError("Unknown or expired session")
+
+        session.last_used = time.monotonic()
+        username = session.username
+
+        context = self._contexts.get(username)
+
+        if context is not None:
+            self._contexts.move_to_end(username)
+            return context
+
+        loading = self._loading.get(username)
+
+        if loading is not None:
+            return loading.get()
+
+        loading = self._loading[username] = AsyncResult()
+
+        try:
+            with metrics.span("sessions.load_user"):
+                context = self._load(username)
+        except Exception as e:
+            loading.set_exception(e)
+            raise
+        finally:
+            del self._loading[username]
+
+        self._contexts[username] = context
+        loading.set(context)
+
+        if self.on_loaded is not None:
+            self.on_loaded(context)
+
+        self._evict(len(self._contexts) - self.max_users, keep=username)
+
+        return context
+
+    def attach(self, session_id: str, socket) -> bool:
+        """
+        Registers a socket the session's updates are pushed to (see push).
+        """
+
+        session = self._sessions.get(session_id)
+
+        if session is None:
+            return False
+
+        session.sockets.append(socket)
+
+        return True
+
+    def detach(self, session_id: str, socket) -> None:
+        session = self._sessions.get(session_id)
+
+        if session is not None and socket in session.sockets:
+            session.sockets.remove(socket)
+            session.last_used = time.monotonic()
+
+    def push(self, username: str, name: str, args: tuple) -> None:
+        """
+        Sends an update to all event sockets of the user's sessions.
+        """
+
+        message = json.dumps({"name": name, "args": list(args)}, default=lambda o: None)
+
+        for session in list(self._sessions.values()):
+            if session.username != username:
+                continue
+
+            for socket in list(session.sockets):
+                try:
+                    socket.send(message)
+                except Exception as e:
+                    logging.warning(f"Failed to push '{name}' to user '{username}': {e}")
+                    session.sockets.remove(socket)
+
+    @property
+    def loaded_users(self) -> List[str]:
+        return list(self._contexts)
+
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+    def close(self) -> None:
+        """
+        Unloads all users, e.g. when the server stops.
+        """
+
+        while self._contexts:
+            _, context = self._contexts.popitem(last=False)
+            context.close()
+
+    def _evict(self, count: int, keep: str | None = None) -> None:
+        """
+        Unloads up to `count` of the least recently used users not in use by any call,
+        other than `keep`.
+        """
+
+        for username, context in list(self._contexts.items()):
+            if count <= 0:
+                break
+
+            if context.active or username == keep:
+                continue
+
+            self._unload(username)
+            count -= 1
+
+    def _unload(self, username: str) -> None:
+        # Removed first, a call coming in while the caches are saved loads the user again
+        context = self._contexts.pop(username, None)
+
+        if context is None:
+            return
+
+        context.close()
+
+        metrics.increment("sessions.evictions")
+        logging.info(f"Unloaded user '{username}'.")
+
+    def _sweep(self) -> None:
+        """
+        Drops idle sessions without event sockets and unloads idle users without sessions.
+        """
+
+        while self._sessions or self._contexts:
+            gevent.sleep(min(60.0, self.idle_seconds))
+
+            idle_since = time.monotonic() - self.idle_seconds
+
+            for session_id, session in list(self._sessions.items()):
+                if not session.sockets and session.last_used < idle_since:
+                    del self._sessions[session_id]
+
+            users_with_sessions = {session.username for session in self._sessions.values()}
+
+            for username, context in list(self._contexts.items()):
+                if username not in users_with_sessions and not context.active:
+                    self._unload(username)
+
+            # Users still over the limit, because they were in use when it was exceeded
+            self._evict(len(self._contexts) - self.max_users)
@@ -0,0 +1,120 @@
+"""
+Module implementing the parts of a fast startup: the cached path of the browser
+the window is opened in, and a report of when each phase of startup ended.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable
+import metrics
+from config import PROGRAM_DATA, BROWSER_CACHE_FILE_NAME
+from persistence import atomic_write
+
+
+def browser_path() -> str:
+    """
+    Returns the path of the first available browser on the system.
+    It is looked up only when the cached path no longer exists, e.g. after the first
+    start or when the browser was uninstalled; otherwise no browser is enumerated.
+    """
+
+    cache_path = PROGRAM_DATA / BROWSER_CACHE_FILE_NAME
+
+    try:
+        with cache_path.open("r", encoding="utf-8") as f:
+            path = json.load(f)["path"]
+
+        if os.path.isfile(path):
+            return path
+
+        logging.info(f"Cached browser '{path}' no longer exists.")
+
+    except FileNotFoundError:
+        pass
+
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Failed to read cached browser path: {e}")
+
+    # Enumerating installed browsers is slow (on Windows, it reads the registry)
+    # and so is importing the package doing it
+    from browsers import browsers
+
+    path = next(browsers())["path"]
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(cache_path, json.dumps({"path": path}).encode("utf-8"))
+    except OSError as e:
+        logging.warning(f"Failed to cache browser path: {e}")
+
+    logging.info(f"Found browser '{path}'.")
+
+    return path
+
+
+class StartupTimer:
+    """
+    Records when each phase of startup ended, counted from `started` (a time.perf_counter value).
+    """
+
+    def __init__(self, started: float, phases: Iterable[str]):
+        self.started = started
+        # phase -> milliseconds since start
+        self.phases: Dict[str, float] = {}
+        # Phases that have to end before the report is complete
+        self._waiting_for = set(phases)
+
+    def mark(self, phase: str) -> bool:
+        """
+        Records the end of a phase, only the first time it is marked.
+        Returns True when this was the last phase the report was waiting for.
+        """
+
+        if phase in self.phases:
+            return False
+
+        elapsed = (time.perf_counter() - self.started) * 1000
+        self.phases[phase] = elapsed
+        metrics.observe(f"startup.{phase}", elapsed)
+
+        if phase not in self._waiting_for:
+            return False
+
+        self._waiting_for.discard(phase)
+
+        return not self._waiting_for
+
+    def report(self) -> str:
+        """
+        Returns the phases in the order they ended, with the time since the previous one.
+        """
+
+        lines = ["Startup (ms since start, ms since the previous phase):"]
+        previous = 0.0
+
+        for phase, elapsed in sorted(self.phases.items(), key=lambda item: item[1]):
+            lines.append(f"  {phase:<20} {elapsed:8.1f} {elapsed - previous:+8.1f}")
+            previous = elapsed
+
+        return "\n".join(lines)
+
+    def save(self, path: Path) -> bool:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            data = {
+                "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "phases_ms": {phase: round(elapsed, 1) for phase, elapsed in self.phases.items()},
+            }
+            atomic_write(path, json.dumps(data, indent=4).encode("utf-8"))
+
+            return True
+
+        except Exception as e:
+            logging.error(f"Error saving startup report: {e}")
+
+            return False
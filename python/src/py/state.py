@@ -1,11 +1,100 @@
 """
 Module for holding globally accessible application state.
 
-This module defines variables that are used across multiple modules,
-such as the currently logged-in user.
+The state of a user (see UserContext) is read as attributes of this module,
+such as state.user, and comes from the context of the current greenlet:
+in server mode, calls from the frontend run with the context of their session's
+user (see use); otherwise, and in the desktop application, the default context
+of the logged-in user is used.
 """
 
+from contextlib import contextmanager
+from typing import Iterator
+import gevent
+import gevent.local
 from models.user import User
+from tag_cache import TagCache
+from folder_sync import ManifestStore
+from folder_watcher import FolderWatcher
+from search_index import SearchIndex
+from loudness import LoudnessAnalyzer
+from duplicates import HashCache
+from user_context import UserContext
+from sessions import SessionRegistry
 
 # Represents the currently logged-in user.
-user: User = None
\ No newline at end of file
+user: User
+
+# Cache of audio tag metadata shared by all library scans.
+tag_cache: TagCache
+
+# Manifests of the current user's playlist folders.
+manifests: ManifestStore
+
+# Watcher of the current user's playlist folders, None when watching is disabled.
+folder_watcher: FolderWatcher | None
+
+# Search index over the current user's playlists and tracks, built on the first search.
+search_index: SearchIndex
+
+# Loudness analysis of the current user's tracks, used for volume normalization.
+loudness: LoudnessAnalyzer
+
+# Content hashes of the current user's audio files, used to find duplicates.
+hash_cache: HashCache
+
+# Context of the logged-in user in the desktop application, None in server mode.
+default: UserContext | None = None
+
+# Registry of users and their sessions in server mode, None in the desktop application.
+sessions: SessionRegistry | None = None
+
+_local = gevent.local.local()
+
+
+def current() -> UserContext:
+    context = getattr(_local, "context", None) or default
+
+    if context is None:
+        raise RuntimeError("No user context, the user's data is not loaded")
+
+    return context
+
+
+@contextmanager
+def use(context: UserContext) -> Iterator[UserContext]:
+    """
+    Runs the body of the with statement with the given user's context.
+    """
+
+    previous = getattr(_local, "context", None)
+    _local.context = context
+    context.active += 1
+
+    try:
+        yield context
+    finally:
+        context.active -= 1
+        _local.context = previous
+
+
+def spawn(fn, *args) -> gevent.Greenlet:
+    """
+    Spawns a greenlet running with the context of the current one.
+    """
+
+    context = current()
+
+    def run():
+        with use(context):
+            return fn(*args)
+
+    return gevent.spawn(run)
+
+
+def __getattr__(name: str):
+    # Attributes of the user's state, the others are module globals
+    if name in UserContext.__dataclass_fields__:
+        return getattr(current(), name)
+
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,248 @@
+"""
+Module implementing the binary snapshot format of user data.
+
+Both kinds of files start with a header (magic bytes, format version), followed
+by a table of all distinct strings of the file, so repeated artists, folders
+and titles are stored once. Everything else refers to strings by index.
+
+User files hold the playlist headers. Track files store every field of the
+tracks as a column of fixed-size values, so they are read with a few array
+copies instead of being parsed. Files are read through mmap.
+
+All numbers are little-endian.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, List, TypeVar
+from models.track_store import ID_SIZE, TrackColumns, TrackStore
+
+USER_MAGIC = b"PLHU"
+TRACKS_MAGIC = b"PLHT"
+FORMAT_VERSION = 1
+
+# Magic bytes, format version, reserved
+HEADER = struct.Struct("<4sHH")
+COUNT = struct.Struct("<I")
+# Number of strings, length of their UTF-8 data
+STRING_TABLE = struct.Struct("<II")
+# ID, title, folder path, duration, track count
+PLAYLIST = struct.Struct("<IIIdI")
+# Track position, ID
+OTHER_ID = struct.Struct("<II")
+
+T = TypeVar("T")
+
+
+class _StringTableWriter:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def index(self, string: str) -> int:
+        index = self._indices.get(string)
+
+        if index is None:
+            index = len(self.strings)
+            # Strings are separated by NUL characters, which tags should not contain
+            self.strings.append(string.replace("\0", ""))
+            self._indices[string] = index
+
+        return index
+
+    def encode(self) -> bytes:
+        data = "\0".join(self.strings).encode("utf-8")
+
+        return STRING_TABLE.pack(len(self.strings), len(data)) + data
+
+
+class _Reader:
+    def __init__(self, buffer, magic: bytes):
+        self.buffer = buffer
+        self.offset = 0
+
+        file_magic, version, _ = self.unpack(HEADER)
+
+        if file_magic != magic:
+            raise ValueError("Not a snapshot file of this kind")
+
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Snapshot format version {version} is not supported")
+
+        count, size = self.unpack(STRING_TABLE)
+        data = self.read(size)
+        self.strings = str(data, "utf-8").split("\0") if count else []
+
+        if len(self.strings) != count:
+            raise ValueError("Corrupted string table")
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.buffer, self.offset)
+        self.offset += fmt.size
+
+        return values
+
+    def read(self, size: int) -> bytes:
+        if self.offset + size > len(self.buffer):
+            raise ValueError("Snapshot file is truncated")
+
+        data = self.buffer[self.offset : self.offset + size]
+        self.offset += size
+
+        return data
+
+    def read_array(self, typecode: str, count: int) -> array:
+        values = array(typecode)
+        values.frombytes(self.read(values.itemsize * count))
+
+        if sys.byteorder == "big":
+            values.byteswap()
+
+        return values
+
+
+def _encode_array(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values.tobytes()
+
+
+def encode_user(user_data: dict) -> bytes:
+    """
+    Encodes a user summary (see User.to_summary_dict).
+    """
+
+    strings = _StringTableWriter()
+    body = bytearray()
+
+    body += COUNT.pack(strings.index(user_data["username"]))
+
+    recently_played = user_data.get("recently_played_playlists", [])
+    body += COUNT.pack(len(recently_played))
+    body += _encode_array(array("I", [strings.index(title) for title in recently_played]))
+
+    playlists = user_data.get("playlists", [])
+    body += COUNT.pack(len(playlists))
+
+    for playlist in playlists:
+        body += PLAYLIST.pack(
+            strings.index(playlist["id"]),
+            strings.index(playlist["title"]),
+            strings.index(playlist["folder_path"]),
+            playlist["duration"],
+            playlist["track_count"],
+        )
+
+    return HEADER.pack(USER_MAGIC, FORMAT_VERSION, 0) + strings.encode() + body
+
+
+def decode_user(buffer) -> dict:
+    """
+    Decodes a user file into a dict like User.to_summary_dict.
+    """
+
+    reader = _Reader(buffer, USER_MAGIC)
+    strings = reader.strings
+
+    (username,) = reader.unpack(COUNT)
+    (recently_played_count,) = reader.unpack(COUNT)
+    recently_played = reader.read_array("I", recently_played_count)
+    (playlist_count,) = reader.unpack(COUNT)
+
+    playlists = []
+
+    for _ in range(playlist_count):
+        playlist_id, title, folder_path, duration, track_count = reader.unpack(PLAYLIST)
+        playlists.append(
+            {
+                "id": strings[playlist_id],
+                "title": strings[title],
+                "duration": duration,
+                "folder_path": strings[folder_path],
+                "track_count": track_count,
+            }
+        )
+
+    return {
+        "username": strings[username],
+        "playlists": playlists,
+        "recently_played_playlists": [strings[index] for index in recently_played],
+    }
+
+
+def encode_tracks(tracks: TrackStore) -> bytes:
+    columns = tracks.to_columns()
+    strings = _StringTableWriter()
+
+    # Indices into the store's own strings, mapped to this file's table
+    remap = array("I", [strings.index(string) for string in columns.strings])
+
+    titles = array("I", [strings.index(title) for title in columns.titles])
+    artists = array("I", [remap[index] for index in columns.artists])
+    folders = array("I", [remap[index] for index in columns.folders])
+    file_names = array("I", [strings.index(name) for name in columns.file_names])
+
+    body = bytearray()
+    body += COUNT.pack(len(titles))
+    body += columns.ids
+    body += COUNT.pack(len(columns.other_ids))
+
+    for position, track_id in columns.other_ids.items():
+        body += OTHER_ID.pack(position, strings.index(track_id))
+
+    for column in (columns.durations, titles, artists, folders, file_names):
+        body += _encode_array(column)
+
+    return HEADER.pack(TRACKS_MAGIC, FORMAT_VERSION, 0) + strings.encode() + body
+
+
+def decode_tracks(buffer) -> TrackStore:
+    reader = _Reader(buffer, TRACKS_MAGIC)
+    strings = reader.strings
+
+    (count,) = reader.unpack(COUNT)
+    ids = reader.read(ID_SIZE * count)
+
+    (other_id_count,) = reader.unpack(COUNT)
+    other_ids = {}
+
+    for _ in range(other_id_count):
+        position, track_id = reader.unpack(OTHER_ID)
+        other_ids[position] = strings[track_id]
+
+    durations = reader.read_array("d", count)
+    titles = reader.read_array("I", count)
+    artists = reader.read_array("I", count)
+    folders = reader.read_array("I", count)
+    file_names = reader.read_array("I", count)
+
+    return TrackStore.from_columns(
+        TrackColumns(
+            ids=ids,
+            other_ids=other_ids,
+            titles=[strings[index] for index in titles],
+            artists=artists,
+            durations=durations,
+            folders=folders,
+            file_names=[strings[index] for index in file_names],
+            strings=strings,
+        )
+    )
+
+
+def read_file(path: Path, decode: Callable[..., T]) -> T:
+    """
+    Decodes a snapshot file through a read-only memory map.
+    """
+
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            raise ValueError(f"Snapshot file '{path}' is empty")
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode(buffer)
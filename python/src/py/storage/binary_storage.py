@@ -0,0 +1,58 @@
+"""
+Module implementing the binary storage backend.
+
+Stores the same files as the JSON backend (a user file with playlist headers
+and one track file per playlist) in the binary snapshot format, which is
+smaller and much faster to read and write. Existing JSON data is converted
+on first load.
+"""
+
+import logging
+from pathlib import Path
+from models.user import User
+from models.playlist import Playlist
+from models.track_store import TrackStore
+from storage import binary_format
+from storage.json_storage import JsonStorage
+
+# Name of the binary user data file stored in every user's folder
+USER_BIN_FILE_NAME = "user.bin"
+
+
+class BinaryStorage(JsonStorage):
+    user_file_name = USER_BIN_FILE_NAME
+    tracks_file_suffix = ".bin"
+
+    def load_user(self, username: str) -> User:
+        """
+        Loads a user from their binary file, converting their JSON files on the first load.
+        """
+
+        json_storage = JsonStorage(self.root)
+
+        if not self.user_file(username).is_file() and json_storage.user_file(username).is_file():
+            return self._convert(json_storage.load_user(username))
+
+        return super().load_user(username)
+
+    def _convert(self, user: User) -> User:
+        # All tracks have to be in memory to be written in the new format
+        for playlist in user.playlists:
+            playlist.tracks.load()
+
+        if self.save_user(user):
+            logging.info(f"Converted user '{user.username}' to the binary format.")
+
+        return user
+
+    def _read_header(self, path: Path) -> dict:
+        return binary_format.read_file(path, binary_format.decode_user)
+
+    def _encode_header(self, user: User) -> bytes:
+        return binary_format.encode_user(user.to_summary_dict())
+
+    def _read_tracks(self, path: Path) -> TrackStore:
+        return binary_format.read_file(path, binary_format.decode_tracks)
+
+    def _encode_tracks(self, playlist: Playlist) -> bytes:
+        return binary_format.encode_tracks(playlist.tracks)
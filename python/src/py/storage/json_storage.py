@@ -0,0 +1,249 @@
+"""
+Module implementing the JSON storage backend.
+
+Every user is stored as a user.json document with playlist headers (title,
+folder, duration and track count), and the tracks of every playlist are stored
+in their own file in the playlists folder. Track files are only read when a
+playlist's tracks are first needed, and only files of changed playlists are
+rewritten (coalesced by WriteBehindSaver).
+
+Older user.json files with embedded tracks are split up on their first load.
+The encoding of both kinds of files can be replaced by subclasses (see BinaryStorage).
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Callable, List
+import gevent
+import metrics
+from config import SAVE_COALESCE_SECONDS
+from models.user import User
+from models.playlist import Playlist
+from models.track_store import LazyTrackStore, TrackStore
+from persistence import WriteBehindSaver
+
+# Name of the user data file stored in every user's folder
+USER_JSON_FILE_NAME = "user.json"
+
+# Folder with the track files of the playlists, in every user's folder
+PLAYLISTS_FOLDER_NAME = "playlists"
+
+
+class JsonStorage:
+    user_file_name = USER_JSON_FILE_NAME
+    tracks_file_suffix = ".json"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        # Coalesces bursts of saves (e.g. several track moves) into single writes
+        self._saver = WriteBehindSaver(SAVE_COALESCE_SECONDS)
+
+    def flush(self) -> None:
+        """
+        Writes saves still waiting to be coalesced, e.g. before the application exits.
+        """
+
+        self._saver.flush()
+
+    def close_user(self, user: User) -> None:
+        """
+        Nothing is kept open for a user, every save waits for its files to be written.
+        """
+
+    def user_file(self, username: str) -> Path:
+        return self.root / username / self.user_file_name
+
+    def tracks_file(self, username: str, playlist: Playlist) -> Path:
+        return (
+            self.root
+            / username
+            / PLAYLISTS_FOLDER_NAME
+            / f"{playlist.id}{self.tracks_file_suffix}"
+        )
+
+    def load_user(self, username: str) -> User:
+        """
+        Loads a user from their JSON file or creates a new one if not found.
+        Only playlist headers are read, tracks are loaded on first use.
+        """
+
+        with metrics.span("storage.load_user"):
+            return self._load_user(username)
+
+    def _load_user(self, username: str) -> User:
+        user_file = self.user_file(username)
+
+        if not user_file.is_file():
+            logging.warn(f"{self.user_file_name} does not exist for '{username}'!")
+
+            return User(username)
+
+        user_data = self._read_header(user_file)
+
+        playlists_data = user_data.get("playlists", [])
+
+        # Older files store the tracks inline
+        if any("tracks" in playlist_data for playlist_data in playlists_data):
+            return self._migrate(User.from_dict(user_data))
+
+        playlists = []
+
+        for playlist_data in playlists_data:
+            playlist = Playlist.from_dict(playlist_data)
+            playlist.tracks = LazyTrackStore(
+                playlist_data.get("track_count", 0),
+                self._tracks_loader(self.tracks_file(username, playlist)),
+            )
+            playlists.append(playlist)
+
+        return User(
+            username=user_data["username"],
+            playlists=playlists,
+            recently_played_playlists=user_data.get("recently_played_playlists", []),
+        )
+
+    def save_user(self, user: User) -> bool:
+        """
+        Saves the given user's data to JSON files in their dedicated folder.
+        Track files are written for all playlists whose tracks have been loaded,
+        the others are unchanged since they were read.
+
+        Saves requested while a file is being written are merged into its next write.
+        Returns only after the writes have finished, False if any of them failed.
+        """
+
+        return self._save(
+            user, [playlist for playlist in user.playlists if playlist.tracks.loaded]
+        )
+
+    def add_playlist(self, user: User, playlist: Playlist) -> bool:
+        return self._save(user, [playlist])
+
+    def remove_playlist(self, user: User, playlist: Playlist) -> bool:
+        if not self._save(user, []):
+            return False
+
+        try:
+            self.tracks_file(user.username, playlist).unlink(missing_ok=True)
+        except OSError as e:
+            # The orphaned file is harmless, the playlist is already gone from user.json
+            logging.warning(f"Failed to remove tracks of '{playlist.title}': {e}")
+
+        return True
+
+    def rename_playlist(self, user: User, playlist: Playlist) -> bool:
+        return self._save(user, [])
+
+    def move_track(
+        self, user: User, playlist: Playlist, from_index: int, to_index: int
+    ) -> bool:
+        return self._save(user, [playlist], header=False)
+
+    def update_playlists(self, user: User, playlists: List[Playlist]) -> bool:
+        return self._save(user, playlists)
+
+    def save_recently_played(self, user: User) -> bool:
+        return self._save(user, [])
+
+    def _save(self, user: User, playlists: List[Playlist], header: bool = True) -> bool:
+        """
+        Writes the track files of the given playlists, then user.json if `header` is set.
+        Track files go first, so user.json never lists a playlist without its tracks.
+        """
+
+        logging.info(f"Saving user '{user.username}'.")
+
+        with metrics.span("storage.save"):
+            return self._save_files(user, playlists, header)
+
+    def _save_files(self, user: User, playlists: List[Playlist], header: bool) -> bool:
+        try:
+            user_json_path = self.user_file(user.username)
+
+            # Create user directories if they don't exist
+            (user_json_path.parent / PLAYLISTS_FOLDER_NAME).mkdir(
+                parents=True, exist_ok=True
+            )
+
+            # Objects are converted to JSON when the coalesced writes happen,
+            # so they contain all changes made until then
+            saves = [
+                gevent.spawn(
+                    self._saver.save,
+                    self.tracks_file(user.username, playlist),
+                    # Bind the playlist now, not when the lambda runs
+                    lambda playlist=playlist: self._encode_tracks(playlist),
+                )
+                for playlist in playlists
+            ]
+            gevent.joinall(saves)
+
+            if not all(save.value for save in saves):
+                return False
+
+            if header and not self._saver.save(
+                user_json_path, lambda: self._encode_header(user)
+            ):
+                return False
+
+            logging.info(f"User '{user.username}' has been saved.")
+
+            return True
+
+        except Exception as e:
+            logging.error(f"Error saving user: {e}")
+
+            return False
+
+    def _migrate(self, user: User) -> User:
+        """
+        Splits a user.json with inline tracks into track files.
+        """
+
+        if self.save_user(user):
+            logging.info(f"Moved tracks of user '{user.username}' into track files.")
+
+        return user
+
+    def _tracks_loader(self, path: Path) -> Callable[[], TrackStore]:
+        def load() -> TrackStore:
+            # Large files take a while to read and parse, keep it off the event loop
+            return gevent.get_hub().threadpool.apply(self._load_tracks, (path,))
+
+        return load
+
+    def _load_tracks(self, path: Path) -> TrackStore:
+        if not path.is_file():
+            logging.warning(f"Track file '{path}' does not exist!")
+
+            return TrackStore()
+
+        with metrics.span("storage.load_tracks"):
+            return self._read_tracks(path)
+
+    # File encoding, overridden by other formats
+
+    def _read_header(self, path: Path) -> dict:
+        """
+        Reads user.json into a dict like User.to_summary_dict.
+        """
+
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _encode_header(self, user: User) -> bytes:
+        # Playlist headers, the tracks are in their own files
+        return json.dumps(
+            user.to_summary_dict(), indent=4, ensure_ascii=False
+        ).encode("utf-8")
+
+    def _read_tracks(self, path: Path) -> TrackStore:
+        with path.open("r", encoding="utf-8") as f:
+            return TrackStore.from_dicts(json.load(f))
+
+    def _encode_tracks(self, playlist: Playlist) -> bytes:
+        # Compact, as track files are large and not meant to be edited by hand
+        return json.dumps(
+            playlist.tracks.to_dicts(), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
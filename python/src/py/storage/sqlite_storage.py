@@ -0,0 +1,376 @@
+"""
+Module implementing the SQLite storage backend.
+
+Users, playlists and tracks are stored in separate tables of a per-user
+database, so every operation only touches the rows it changes, inside a
+single transaction. Existing user.json files are migrated on first load.
+Tracks of a playlist are only queried when they are first needed.
+"""
+
+import json
+import logging
+import sqlite3
+import metrics
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+from models.user import User
+from models.playlist import Playlist
+from models.track_store import LazyTrackStore, TrackStore
+from storage.json_storage import JsonStorage
+
+# Name of the database file stored in every user's folder
+USER_DB_FILE_NAME = "user.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    recently_played_playlists TEXT NOT NULL DEFAULT '[]'
+);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    uid TEXT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    duration REAL NOT NULL,
+    folder_path TEXT NOT NULL,
+    UNIQUE (username, folder_path)
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    uid TEXT,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    duration REAL NOT NULL,
+    file_path TEXT NOT NULL
+);
+
+"""
+
+# Statements upgrading databases created by older versions, indexed by PRAGMA user_version
+MIGRATIONS = [
+    # 1: stable playlist and track IDs
+    """
+    ALTER TABLE playlists ADD COLUMN uid TEXT;
+    ALTER TABLE tracks ADD COLUMN uid TEXT;
+    UPDATE playlists SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL;
+    UPDATE tracks SET uid = lower(hex(randomblob(16))) WHERE uid IS NULL;
+    """,
+]
+
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS playlists_by_uid ON playlists (uid);
+CREATE INDEX IF NOT EXISTS tracks_by_position ON tracks (playlist_id, position);
+CREATE INDEX IF NOT EXISTS tracks_by_file_path ON tracks (file_path);
+"""
+
+
+class SqliteStorage:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._connections: Dict[str, sqlite3.Connection] = {}
+
+    def load_user(self, username: str) -> User:
+        """
+        Loads a user from their database, migrating user.json on the first load.
+        """
+
+        with metrics.span("storage.load_user"):
+            return self._load_user(username)
+
+    def _load_user(self, username: str) -> User:
+        db = self._connect(username)
+
+        row = db.execute(
+            "SELECT recently_played_playlists FROM users WHERE username = ?",
+            (username,),
+        ).fetchone()
+
+        if row is None:
+            return self._migrate(username)
+
+        playlists: List[Playlist] = []
+
+        playlist_rows = db.execute(
+            "SELECT id, uid, title, duration, folder_path,"
+            " (SELECT COUNT(*) FROM tracks WHERE playlist_id = playlists.id)"
+            " FROM playlists WHERE username = ? ORDER BY position",
+            (username,),
+        ).fetchall()
+
+        for playlist_id, uid, title, duration, folder_path, track_count in playlist_rows:
+            tracks = LazyTrackStore(track_count, self._tracks_loader(username, playlist_id))
+
+            playlists.append(
+                Playlist(title, timedelta(seconds=duration), folder_path, tracks, uid)
+            )
+
+        return User(username, playlists, json.loads(row[0]))
+
+    def save_user(self, user: User) -> bool:
+        """
+        Replaces all stored data of the user.
+        """
+
+        def save(db: sqlite3.Connection) -> None:
+            # Tracks not loaded yet are read before their rows are replaced
+            for playlist in user.playlists:
+                playlist.tracks.load()
+
+            db.execute("DELETE FROM playlists WHERE username = ?", (user.username,))
+            db.execute(
+                "INSERT INTO users (username, recently_played_playlists) VALUES (?, ?)"
+                " ON CONFLICT (username) DO UPDATE"
+                " SET recently_played_playlists = excluded.recently_played_playlists",
+                (user.username, json.dumps(user.recently_played_playlists)),
+            )
+
+            for position, playlist in enumerate(user.playlists):
+                self._insert_playlist(db, user.username, playlist, position)
+
+        return self._transaction(user.username, "save user", save)
+
+    def add_playlist(self, user: User, playlist: Playlist) -> bool:
+        def add(db: sqlite3.Connection) -> None:
+            (position,) = db.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM playlists WHERE username = ?",
+                (user.username,),
+            ).fetchone()
+
+            self._insert_playlist(db, user.username, playlist, position)
+
+        return self._transaction(user.username, "add playlist", add)
+
+    def remove_playlist(self, user: User, playlist: Playlist) -> bool:
+        def remove(db: sqlite3.Connection) -> None:
+            # Tracks are removed by ON DELETE CASCADE
+            db.execute("DELETE FROM playlists WHERE uid = ?", (playlist.id,))
+
+        return self._transaction(user.username, "remove playlist", remove)
+
+    def rename_playlist(self, user: User, playlist: Playlist) -> bool:
+        def rename(db: sqlite3.Connection) -> None:
+            db.execute(
+                "UPDATE playlists SET title = ? WHERE uid = ?",
+                (playlist.title, playlist.id),
+            )
+
+        return self._transaction(user.username, "rename playlist", rename)
+
+    def move_track(
+        self, user: User, playlist: Playlist, from_index: int, to_index: int
+    ) -> bool:
+        """
+        Stores a track move. Only the moved track and the tracks between
+        both positions are updated, i.e. two rows for a move by one.
+        """
+
+        def move(db: sqlite3.Connection) -> None:
+            playlist_id = self._playlist_id(db, user.username, playlist)
+
+            # Park the moved track, shift the tracks in between, then place it
+            db.execute(
+                "UPDATE tracks SET position = -1 WHERE playlist_id = ? AND position = ?",
+                (playlist_id, from_index),
+            )
+
+            if from_index < to_index:
+                db.execute(
+                    "UPDATE tracks SET position = position - 1"
+                    " WHERE playlist_id = ? AND position > ? AND position <= ?",
+                    (playlist_id, from_index, to_index),
+                )
+            else:
+                db.execute(
+                    "UPDATE tracks SET position = position + 1"
+                    " WHERE playlist_id = ? AND position >= ? AND position < ?",
+                    (playlist_id, to_index, from_index),
+                )
+
+            db.execute(
+                "UPDATE tracks SET position = ? WHERE playlist_id = ? AND position = -1",
+                (to_index, playlist_id),
+            )
+
+        return self._transaction(user.username, "move track", move)
+
+    def update_playlists(self, user: User, playlists: List[Playlist]) -> bool:
+        """
+        Replaces the tracks and durations of the given playlists.
+        """
+
+        def update(db: sqlite3.Connection) -> None:
+            for playlist in playlists:
+                playlist.tracks.load()
+                playlist_id = self._playlist_id(db, user.username, playlist)
+
+                db.execute(
+                    "UPDATE playlists SET title = ?, duration = ? WHERE id = ?",
+                    (playlist.title, playlist.duration.total_seconds(), playlist_id),
+                )
+                db.execute("DELETE FROM tracks WHERE playlist_id = ?", (playlist_id,))
+                self._insert_tracks(db, playlist_id, playlist)
+
+        return self._transaction(user.username, "update playlists", update)
+
+    def save_recently_played(self, user: User) -> bool:
+        def save(db: sqlite3.Connection) -> None:
+            db.execute(
+                "UPDATE users SET recently_played_playlists = ? WHERE username = ?",
+                (json.dumps(user.recently_played_playlists), user.username),
+            )
+
+        return self._transaction(user.username, "save recently played", save)
+
+    def flush(self) -> None:
+        """
+        Nothing is left to write, every operation is committed by its own transaction.
+        """
+
+    def close_user(self, user: User) -> None:
+        """
+        Closes the user's database, e.g. when they are unloaded in server mode.
+        It is opened again by their next operation.
+        """
+
+        db = self._connections.pop(user.username, None)
+
+        if db is not None:
+            db.close()
+
+    def _connect(self, username: str) -> sqlite3.Connection:
+        db = self._connections.get(username)
+
+        if db is not None:
+            return db
+
+        user_folder_path = self.root / username
+        user_folder_path.mkdir(parents=True, exist_ok=True)
+
+        db = sqlite3.connect(user_folder_path / USER_DB_FILE_NAME)
+        db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.execute("PRAGMA foreign_keys = ON")
+        self._create_schema(db)
+
+        self._connections[username] = db
+
+        return db
+
+    def _create_schema(self, db: sqlite3.Connection) -> None:
+        (version,) = db.execute("PRAGMA user_version").fetchone()
+        (table_count,) = db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'"
+        ).fetchone()
+
+        db.executescript(SCHEMA)
+
+        # New databases are created with the latest schema
+        if table_count > 0:
+            for migration in MIGRATIONS[version:]:
+                db.executescript(migration)
+
+        db.executescript(INDEXES)
+        db.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+    def _transaction(self, username: str, operation: str, fn) -> bool:
+        logging.info(f"Storing '{operation}' for user '{username}'.")
+
+        try:
+            db = self._connect(username)
+
+            with metrics.span("storage.save"), db:
+                fn(db)
+
+            return True
+
+        except Exception as e:
+            logging.error(f"Error storing '{operation}': {e}")
+
+            return False
+
+    def _migrate(self, username: str) -> User:
+        """
+        Imports the user's existing user.json into the database.
+        """
+
+        user = JsonStorage(self.root).load_user(username)
+
+        if self.save_user(user):
+            logging.info(f"Migrated user '{username}' from user.json to SQLite.")
+
+        return user
+
+    def _tracks_loader(self, username: str, playlist_id: int) -> Callable[[], TrackStore]:
+        def load() -> TrackStore:
+            # Connected when the tracks are needed, the database may have been closed since
+            db = self._connect(username)
+
+            with metrics.span("storage.load_tracks"):
+                return TrackStore.from_dicts(
+                    {
+                        "id": uid,
+                        "title": title,
+                        "artist": artist,
+                        "duration": duration,
+                        "file_path": file_path,
+                    }
+                    for uid, title, artist, duration, file_path in db.execute(
+                        "SELECT uid, title, artist, duration, file_path FROM tracks"
+                        " WHERE playlist_id = ? ORDER BY position",
+                        (playlist_id,),
+                    )
+                )
+
+        return load
+
+    def _playlist_id(self, db: sqlite3.Connection, username: str, playlist: Playlist) -> int:
+        row = db.execute(
+            "SELECT id FROM playlists WHERE username = ? AND uid = ?",
+            (username, playlist.id),
+        ).fetchone()
+
+        if row is None:
+            raise LookupError(f"Playlist '{playlist.title}' is not stored.")
+
+        return row[0]
+
+    def _insert_playlist(
+        self, db: sqlite3.Connection, username: str, playlist: Playlist, position: int
+    ) -> None:
+        cursor = db.execute(
+            "INSERT INTO playlists (uid, username, position, title, duration, folder_path)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                playlist.id,
+                username,
+                position,
+                playlist.title,
+                playlist.duration.total_seconds(),
+                playlist.folder_path,
+            ),
+        )
+
+        self._insert_tracks(db, cursor.lastrowid, playlist)
+
+    def _insert_tracks(self, db: sqlite3.Connection, playlist_id: int, playlist: Playlist) -> None:
+        db.executemany(
+            "INSERT INTO tracks (playlist_id, uid, position, title, artist, duration, file_path)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    playlist_id,
+                    track.id,
+                    position,
+                    track.title,
+                    track.artist,
+                    track.duration.total_seconds(),
+                    track.file_path,
+                )
+                for position, track in enumerate(playlist.tracks)
+            ),
+        )
@@ -0,0 +1,109 @@
+"""
+Module implementing a persistent cache of audio tag metadata.
+
+Entries are keyed by file path and validated against the file's size and
+modification time, so files that did not change are never parsed again.
+"""
+
+import os
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from tinytag import TinyTag
+import metrics
+from models.track import Track
+from persistence import JsonCache
+from config import TAG_CACHE_MAX_ENTRIES
+
+
+class TagCache(JsonCache):
+    description = "tag cache"
+
+    def __init__(self, cache_path: Path, max_entries: int = TAG_CACHE_MAX_ENTRIES):
+        super().__init__(cache_path)
+        self.max_entries = max_entries
+        # file_path -> [size, mtime_ns, title, artist, duration_seconds]
+        # Ordered from the least to the most recently used entry.
+        # Scans read the cache from several worker threads at once, under _lock
+        self._entries: OrderedDict[str, list] = OrderedDict()
+
+    def get(self, file_path: str, size: int, mtime_ns: int) -> Track | None:
+        """
+        Returns the cached track for the given file, or None if the file is unknown
+        or has changed since it was cached.
+        """
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+
+            if entry is None:
+                return None
+
+            if entry[0] != size or entry[1] != mtime_ns:
+                # Stale entry, the file was modified
+                del self._entries[file_path]
+                self._dirty = True
+                return None
+
+            self._entries.move_to_end(file_path)
+
+        return Track(entry[2], entry[3], timedelta(seconds=entry[4]), file_path)
+
+    def put(self, track: Track, size: int, mtime_ns: int) -> None:
+        with self._lock:
+            self._entries[track.file_path] = [
+                size,
+                mtime_ns,
+                track.title,
+                track.artist,
+                track.duration.total_seconds(),
+            ]
+            self._entries.move_to_end(track.file_path)
+            self._dirty = True
+
+            self._evict()
+
+    def _loaded(self, entries: dict) -> None:
+        self._entries.update(entries)
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._dirty = True
+
+
+def read_track(
+    audio_file: Path, cache: TagCache | None = None, stat: os.stat_result | None = None
+) -> Track:
+    """
+    Reads the metadata of the given audio file, using the cache when possible.
+    The file's stat result is taken from `stat` when the caller already has it.
+    Raises an exception if the file cannot be read.
+    """
+
+    file_path = str(audio_file)
+
+    if stat is None:
+        stat = audio_file.stat()
+
+    if cache is not None:
+        track = cache.get(file_path, stat.st_size, stat.st_mtime_ns)
+
+        if track is not None:
+            metrics.increment("scan.tag_cache_hits")
+            return track
+
+    with metrics.span("scan.tag_parse"):
+        tag = TinyTag.get(file_path)
+
+    title = tag.title or audio_file.stem
+    artist = tag.artist or "Unknown"
+    duration = timedelta(seconds=tag.duration or 0.0)
+
+    track = Track(title, artist, duration, file_path)
+
+    if cache is not None:
+        cache.put(track, stat.st_size, stat.st_mtime_ns)
+
+    return track
@@ -0,0 +1,154 @@
+"""
+Module implementing rollback of changes to the user's data.
+
+Changes are made through a UnitOfWork, which records the inverse of each of
+them (remove for add, insert at the old position for remove, the old title
+for rename, moving the track back for a move). When saving the changes fails,
+rollback() applies the inverses in reverse order, at a constant cost per
+change, instead of restoring copies of the data taken beforehand.
+
+Changes are made under the user's changes_lock (see UserContext), but saved
+after it is released, so that concurrent changes can share a write (see
+WriteBehindSaver). When a shared write fails, undoing each unit as its caller
+wakes up would undo them out of order; instead, the first unit to fail also
+undoes all units made after it that are not saved yet, the most recent first.
+"""
+
+import logging
+from typing import Callable, List
+from models.playlist import Playlist
+from models.user import User
+
+
+class UnitOfWork:
+    def __init__(self, user: User, unsaved: List["UnitOfWork"] | None = None):
+        self.user = user
+        # Inverse operations, in the order the changes were made
+        self._undo: List[Callable[[], None]] = []
+        # Units of the user made but not saved yet, oldest first, shared by all of them
+        self._unsaved = unsaved if unsaved is not None else []
+        self._unsaved.append(self)
+        self.rolled_back = False
+
+    def add_playlist(self, playlist: Playlist) -> None:
+        self.user.add_playlist(playlist)
+        self._undo.append(lambda: self.user.remove_playlist(playlist))
+
+    def remove_playlist(self, playlist: Playlist) -> bool:
+        # Removed by another request, e.g. while waiting for changes_lock
+        if self.user.get_playlist(playlist.id) is not playlist:
+            logging.error(f"Failed to remove '{playlist.title}' playlist")
+            return False
+
+        index = self.user.index_of_playlist(playlist)
+
+        if not self.user.remove_playlist(playlist):
+            return False
+
+        self._undo.append(lambda: self.user.insert_playlist(index, playlist))
+        return True
+
+    def rename_playlist(self, playlist: Playlist, new_title: str) -> None:
+        old_title = playlist.title
+        playlist.title = new_title
+
+        def undo() -> None:
+            playlist.title = old_title
+
+        self._undo.append(undo)
+
+    def move_track(self, playlist: Playlist, from_index: int, to_index: int) -> None:
+        playlist.tracks.move(from_index, to_index)
+        track_id = playlist.tracks[to_index].id
+
+        def undo() -> None:
+            # Found by ID, folder refreshes may have added or removed tracks since
+            index = next(
+                (i for i, track in enumerate(playlist.tracks) if track.id == track_id), None
+            )
+
+            if index is not None:
+                playlist.tracks.move(index, min(from_index, len(playlist.tracks) - 1))
+
+        self._undo.append(undo)
+
+    def add_to_recently_played(self, playlist: Playlist) -> None:
+        # The list holds only a few titles, keeping the old one is cheap
+        old_titles = list(self.user.recently_played_playlists)
+        self.user.add_to_recently_played(playlist)
+
+        def undo() -> None:
+            self.user.recently_played_playlists = old_titles
+
+        self._undo.append(undo)
+
+    def save(self, save: Callable[[], bool]) -> bool:
+        """
+        Saves the changes with `save` (called without holding any lock), and rolls
+        them back if it fails, together with the unsaved units made after this one.
+        Returns whether the changes were saved and are still applied.
+        """
+
+        try:
+            saved = save()
+        except Exception as e:
+            logging.error(f"Error saving changes: {e}")
+            saved = False
+
+        if not saved and not self.rolled_back:
+            logging.error("Failed to save user data! Rolling back changes.")
+
+            if not self._rollback_since():
+                logging.critical("Failed to revert changes!")
+
+        self.discard()
+
+        if saved and self.rolled_back:
+            # Undone by an earlier unit while this one was being written, the files
+            # may contain the reverted changes: write them again without
+            if not save():
+                logging.critical("Failed to save reverted changes!")
+
+        return saved and not self.rolled_back
+
+    def discard(self) -> None:
+        """
+        Forgets a unit without changes to save, e.g. when its only change was refused.
+        """
+
+        if self in self._unsaved:
+            self._unsaved.remove(self)
+
+    def rollback(self) -> bool:
+        """
+        Reverts all changes made through this unit of work, the most recent first.
+        Returns False if any of them could not be reverted.
+        """
+
+        reverted = True
+        self.rolled_back = True
+
+        while self._undo:
+            undo = self._undo.pop()
+
+            try:
+                undo()
+            except Exception as e:
+                logging.critical(f"Failed to revert a change: {e}")
+                reverted = False
+
+        return reverted
+
+    def _rollback_since(self) -> bool:
+        """
+        Rolls back this unit and the unsaved units made after it, the most recent first.
+        """
+
+        reverted = True
+
+        # This unit is the first of them, it is only removed from the list once saved
+        for unit in reversed(self._unsaved[self._unsaved.index(self) :]):
+            if not unit.rolled_back:
+                reverted = unit.rollback() and reverted
+
+        return reverted
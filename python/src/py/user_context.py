@@ -0,0 +1,97 @@
+"""
+Module defining the state kept for a user while the application serves them:
+their data, the caches of their library and their search index.
+
+The desktop application has a single context, for the logged-in user.
+In server mode (see sessions.py) there is one per user with open sessions.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import List
+import gevent
+import gevent.lock
+import user_helper
+from duplicates import HashCache
+from folder_sync import ManifestStore
+from folder_watcher import FolderWatcher
+from loudness import LoudnessAnalyzer
+from models.user import User
+from search_index import SearchIndex
+from tag_cache import TagCache
+from unit_of_work import UnitOfWork
+
+
+@dataclass
+class UserContext:
+    username: str
+    user: User
+    # Cache of audio tag metadata shared by all library scans.
+    tag_cache: TagCache
+    # Manifests of the user's playlist folders.
+    manifests: ManifestStore
+    # Content hashes of the user's audio files, used to find duplicates.
+    hash_cache: HashCache
+    # Loudness analysis of the user's tracks, used for volume normalization.
+    loudness: LoudnessAnalyzer
+    # Search index over the user's playlists and tracks, built on the first search.
+    search_index: SearchIndex = field(default_factory=SearchIndex)
+    # Watcher of the user's playlist folders, None when watching is disabled.
+    folder_watcher: FolderWatcher | None = None
+    # Serialises folder refreshes, so the same playlist is never synchronised twice at once
+    refresh_lock: gevent.lock.Semaphore = field(default_factory=gevent.lock.Semaphore)
+    # Serialises changes of the user's data (see UnitOfWork); it is released before the
+    # changes are saved, so concurrent changes can share a write
+    changes_lock: gevent.lock.Semaphore = field(default_factory=gevent.lock.Semaphore)
+    # Units of work made but not saved yet, oldest first: when a shared write fails,
+    # the first of them to fail undoes the later ones too, the most recent first
+    unsaved_changes: List[UnitOfWork] = field(default_factory=list)
+    # Serialises building the search index, which happens on the first search
+    search_index_lock: gevent.lock.Semaphore = field(default_factory=gevent.lock.Semaphore)
+    # Number of greenlets running with this context (see state.use), it is not unloaded while in use
+    active: int = 0
+
+    @classmethod
+    def load(cls, username: str, loudness_mode: str | None = None) -> "UserContext":
+        """
+        Loads the user's saved data. Caches are plain files, possibly large ones,
+        so they are read on gevent's thread pool.
+        """
+
+        threadpool = gevent.get_hub().threadpool
+
+        tag_cache = threadpool.apply(user_helper.load_tag_cache, (username,))
+        manifests = threadpool.apply(user_helper.load_manifests, (username,))
+        hash_cache = threadpool.apply(user_helper.load_hash_cache, (username,))
+        loudness_cache = threadpool.apply(user_helper.load_loudness_cache, (username,))
+
+        if loudness_mode is None:
+            loudness = LoudnessAnalyzer(loudness_cache)
+        else:
+            loudness = LoudnessAnalyzer(loudness_cache, mode=loudness_mode)
+
+        # Playlists are loaded lazily, only their summaries are read here
+        user = user_helper.load_user(username)
+
+        return cls(username, user, tag_cache, manifests, hash_cache, loudness)
+
+    def close(self) -> None:
+        """
+        Stops watching the user's folders, saves the caches that changed and releases
+        what the storage backend keeps open for the user (e.g. their database).
+        User data itself is saved by every change, there is nothing left to write.
+        """
+
+        if self.folder_watcher is not None:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+
+        threadpool = gevent.get_hub().threadpool
+
+        for cache in (self.tag_cache, self.manifests, self.hash_cache, self.loudness.cache):
+            try:
+                threadpool.apply(cache.save)
+            except Exception as e:
+                logging.error(f"Failed to save caches of user '{self.username}': {e}")
+
+        user_helper.storage.close_user(self.user)
@@ -1,149 +1,229 @@
 """
 Module for saving and loading user data including playlists and tracks.
-Implements serialization to JSON and handles dynamic playlist updates.
+Delegates persistence to the configured storage backend and handles dynamic playlist updates.
 """
 
-import json
 from pathlib import Path
 from models.user import User
 from models.playlist import Playlist
-from models.track import Track
-from config import PROGRAM_DATA, AUDIO_EXTENSIONS
-from typing import List
+from config import (
+    PROGRAM_DATA,
+    TAG_CACHE_FILE_NAME,
+    MANIFESTS_FILE_NAME,
+    LOUDNESS_CACHE_FILE_NAME,
+    HASH_CACHE_FILE_NAME,
+    STORAGE_BACKEND,
+)
+from storage.json_storage import JsonStorage
+from tag_cache import TagCache
+from loudness import LoudnessCache
+from duplicates import HashCache
+from folder_sync import (
+    FolderChanges,
+    ManifestStore,
+    known_files,
+    sync_folder,
+    apply_changes,
+)
+from persistence import atomic_write
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, List
+import json
 import logging
-import tinytag
-from datetime import timedelta
+
+
+def _create_storage() -> JsonStorage:
+    # Only the selected backend is imported (sqlite3 and mmap are not needed otherwise)
+    if STORAGE_BACKEND == "sqlite":
+        from storage.sqlite_storage import SqliteStorage
+
+        return SqliteStorage(PROGRAM_DATA)
+
+    if STORAGE_BACKEND == "binary":
+        from storage.binary_storage import BinaryStorage
+
+        return BinaryStorage(PROGRAM_DATA)
+
+    if STORAGE_BACKEND != "json":
+        logging.warning(f"Unknown storage backend '{STORAGE_BACKEND}', using JSON.")
+
+    return JsonStorage(PROGRAM_DATA)
+
+
+# Backend persisting user data, selected by STORAGE_BACKEND.
+# Operations changing a single playlist should use its dedicated methods
+# (e.g. storage.move_track), so backends can store only what changed.
+storage = _create_storage()
 
 
 def save_user(user: User) -> bool:
     """
-    Saves the given user's data to a JSON file in their dedicated folder.
+    Saves all of the given user's data.
     """
 
-    logging.info(f"Saving user '{user.username}'.")
+    return storage.save_user(user)
 
-    try:
-        user_folder_path = PROGRAM_DATA / user.username
 
-        # Create user directory if it doesn't exist
-        # if not user_folder_path.exists():
-        user_folder_path.mkdir(parents=True, exist_ok=True)
+def load_user(username: str) -> User:
+    """
+    Loads a user or creates a new one if not found.
+    Playlists are returned as they were saved; use refresh_user to
+    synchronise them with their folders.
+    """
 
-        # Define path to user.json
-        user_json_path = user_folder_path / "user.json"
+    return storage.load_user(username)
 
-        # Convert User object to dictionary for serialization
-        user_dict = user.to_dict()
 
-        # Write data to JSON file
-        with open(user_json_path, "w", encoding="utf-8") as f:
-            json.dump(user_dict, f, indent=4, ensure_ascii=False)
+def export_user_json(user: User, path: Path) -> bool:
+    """
+    Writes all of the user's data, tracks included, to a single JSON file,
+    whatever the storage backend. Such a file can be used as user.json again.
+    """
 
-        logging.info(f"User '{user.username}' has been saved.")
+    logging.info(f"Exporting user '{user.username}' to '{path}'.")
+
+    try:
+        data = json.dumps(user.to_dict(), indent=4, ensure_ascii=False)
+        atomic_write(Path(path), data.encode("utf-8"))
 
         return True
 
     except Exception as e:
-        logging.error(f"Error saving user: {e}")
+        logging.error(f"Error exporting user: {e}")
 
         return False
 
 
-def load_user(username: str) -> User:
+def load_tag_cache(username: str) -> TagCache:
+    """
+    Loads the tag metadata cache stored next to the user's JSON file.
+    """
+
+    return TagCache.load(PROGRAM_DATA / username / TAG_CACHE_FILE_NAME)
+
+
+def load_manifests(username: str) -> ManifestStore:
     """
-    Loads a user from their JSON file or creates a new one if not found.
+    Loads the manifests of the user's playlist folders.
     """
 
-    user_file = PROGRAM_DATA / username / "user.json"
+    return ManifestStore.load(PROGRAM_DATA / username / MANIFESTS_FILE_NAME)
 
-    if not user_file.is_file():
-        logging.warn(f"user.json does not exist for '{username}'!")
 
-        return User(username)
+def load_loudness_cache(username: str) -> LoudnessCache:
+    """
+    Loads the measured loudness of the user's audio files.
+    """
 
-    with user_file.open("r", encoding="utf-8") as f:
-        user_data = json.load(f)
+    return LoudnessCache.load(PROGRAM_DATA / username / LOUDNESS_CACHE_FILE_NAME)
 
-    # Deserialize user data
-    user = User.from_dict(user_data)
 
-    # Load and refresh associated playlist
-    user.playlists = _load_playlists(user)
+def load_hash_cache(username: str) -> HashCache:
+    """
+    Loads the content hashes of the user's audio files, used to find duplicates.
+    """
+
+    return HashCache.load(PROGRAM_DATA / username / HASH_CACHE_FILE_NAME)
 
-    return user
 
 
-def _load_playlists(user: User) -> List[Playlist]:
+def refresh_user(
+    user: User,
+    tag_cache: TagCache | None = None,
+    manifests: ManifestStore | None = None,
+    on_playlist_refreshed: Callable[[Playlist], None] | None = None,
+    run_blocking: Callable[..., Any] | None = None,
+    playlists: List[Playlist] | None = None,
+    changes_lock: ContextManager | None = None,
+) -> None:
     """
-    Reloads each playlist's folder content to detect new audio files.
-    Updates track lists and recalculates durations accordingly.
+    Synchronises each playlist (or only the given ones) with its folder content.
+    Only added, removed and modified files are processed, and durations
+    are updated by the differences.
+
+    Folder scanning and tag reading go through `run_blocking(fn, *args)`,
+    so a caller running on an event loop can move them to a worker thread.
+    Changes are applied to the user one playlist at a time, under `changes_lock`
+    (see UnitOfWork), and `on_playlist_refreshed` is called after each of them.
     """
 
+    if run_blocking is None:
+        run_blocking = _run_inline
+
+    if changes_lock is None:
+        changes_lock = nullcontext()
+
+    if playlists is None:
+        playlists = list(user.playlists)
+
     logging.info(f"Loading '{user.username}' playlists.")
-    logging.info(f"Detected playlists: {len(user.playlists)}'")
+    logging.info(f"Detected playlists: {len(playlists)}'")
 
-    refreshed_playlists: List[Playlist] = []
+    changed_playlists: List[Playlist] = []
 
-    for playlist in user.playlists:
+    for playlist in playlists:
         logging.info(f"Refreshing '{playlist.title}' playlist.")
 
-        playlist_folder = Path(playlist.folder_path)
+        try:
+            manifest = manifests.get(playlist.folder_path) if manifests else {}
+            known = known_files(playlist, manifest)
 
-        if not playlist_folder.is_dir():
-            logging.warning(
-                f"Skipping playlist '{playlist.title}': Folder does not exist: {playlist_folder}"
-            )
-            continue
+            changes = run_blocking(_scan_folder, playlist.folder_path, known, tag_cache)
 
-        try:
-            # Get all valid audio files from the playlist folder
-            audio_files = [
-                f
-                for f in playlist_folder.iterdir()
-                if f.is_file() and f.suffix.lower() in AUDIO_EXTENSIONS
-            ]
+            if changes is None:
+                logging.warning(
+                    f"Skipping playlist '{playlist.title}': Folder does not exist: {playlist.folder_path}"
+                )
+                continue
 
-            logging.info(f"Found {len(audio_files)} audio files in '{playlist.title}'.")
+            with changes_lock:
+                # The playlist may have been removed while its folder was being scanned
+                if not any(p is playlist for p in user.playlists):
+                    continue
 
-            # Prepare existing tracks and total duration
-            updated_tracks = list(playlist.tracks)
-            total_duration = sum((t.duration for t in playlist.tracks), timedelta())
+                if changes:
+                    logging.info(
+                        f"Changes in '{playlist.title}': {len(changes.added)} added, "
+                        f"{len(changes.removed)} removed, {len(changes.modified)} modified."
+                    )
 
-            # Set of existing file paths to avoid duplicates
-            existing_paths = {t.file_path for t in updated_tracks}
+                    apply_changes(playlist, changes)
+                    changed_playlists.append(playlist)
 
-            # Process each file and add new one
-            for audio_file in audio_files:
-                file_path_str = str(audio_file)
+                if manifests is not None:
+                    manifests.set(playlist.folder_path, changes.manifest)
 
-                if file_path_str in existing_paths:
-                    continue
+            logging.info(f"Finished refreshing playlist '{playlist.title}'.")
 
-                try:
-                    tag = tinytag.TinyTag.get(file_path_str)
+            if changes and on_playlist_refreshed is not None:
+                on_playlist_refreshed(playlist)
 
-                    title = tag.title or audio_file.stem
-                    artist = tag.artist or "Unknown"
-                    duration = timedelta(seconds=tag.duration or 0)
+        except Exception as ex:
+            logging.error(f"Failed to load playlist '{playlist.title}': {ex}")
 
-                    new_track = Track(title, artist, duration, file_path_str)
-                    updated_tracks.append(new_track)
-                    total_duration += duration
+    if tag_cache is not None:
+        run_blocking(tag_cache.save)
 
-                    logging.info(f"Added new track: '{new_track.title}'.")
+    if manifests is not None:
+        manifests.prune({playlist.folder_path for playlist in user.playlists})
 
-                except Exception as ex:
-                    logging.warning(f"Skipped file '{audio_file.name}': {ex}")
+    # Persist the refreshed playlists before the manifests,
+    # so a manifest never describes changes missing from user.json
+    if changed_playlists and not storage.update_playlists(user, changed_playlists):
+        return
 
-            logging.info(f"Finished refreshing playlist '{playlist.title}'.")
+    if manifests is not None:
+        run_blocking(manifests.save)
 
-            # Update playlist with new data
-            playlist.tracks = updated_tracks
-            playlist.duration = total_duration
 
-            refreshed_playlists.append(playlist)
+def _scan_folder(
+    folder_path: str, known: dict, tag_cache: TagCache | None
+) -> FolderChanges | None:
+    if not Path(folder_path).is_dir():
+        return None
+
+    return sync_folder(folder_path, known, tag_cache)
 
-        except Exception as ex:
-            logging.error(f"Failed to load playlist '{playlist.title}': {ex}")
 
-    return refreshed_playlists
+def _run_inline(fn: Callable[..., Any], *args) -> Any:
+    return fn(*args)
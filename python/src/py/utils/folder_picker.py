@@ -1,13 +1,58 @@
 """
-Simple script to open a folder selection dialog and print the selected folder path.
-Used for selecting music directories via GUI in other parts of the application.
+Helper process opening folder selection dialogs for the application (see picker_helper.py).
+It is started once and reused, so tkinter is imported and its root window created only once.
+
+Requests are read from stdin and responses written to stdout, one JSON object per line:
+    {"id": 1, "command": "pick", "initial_dir": "C:/Music"}  ->  {"id": 1, "path": "C:/Music/Rock"}
+    {"id": 2, "command": "quit"}                              ->  (exits)
+An empty path means the dialog was cancelled. Dialogs open in the last selected
+folder unless another one is given. The helper also exits when stdin is closed,
+e.g. when the application has ended.
 """
 
+import json
+import sys
 import tkinter as tk
 from tkinter import filedialog
 
-root = tk.Tk()
-root.withdraw()
-root.attributes("-topmost", True)
-folder = filedialog.askdirectory()
-print(folder)
\ No newline at end of file
+
+def main() -> None:
+    root = tk.Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+
+    last_directory = None
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+
+        command = request.get("command")
+
+        if command == "quit":
+            break
+
+        if command == "pick":
+            folder = filedialog.askdirectory(
+                parent=root, initialdir=request.get("initial_dir") or last_directory
+            )
+            # Let the dialog window close before waiting for the next request
+            root.update()
+
+            if folder:
+                last_directory = folder
+
+            response = {"id": request.get("id"), "path": folder or ""}
+        else:
+            response = {"id": request.get("id"), "error": f"Unknown command '{command}'"}
+
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
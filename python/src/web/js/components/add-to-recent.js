@@ -1,9 +1,8 @@
 import { addToRecentlyPlayed } from "../services/api.js"
-import { refresh } from "../utils/refresh-util.js"
 
 /**
  * Adds the given playlist to the list of recently played playlists on the backend.
- * After successful addition, refreshes relevant parts of the UI (e.g., home page).
+ * The backend pushes the updated list, which refreshes the home page.
  *
  * @param {Playlist} playlist - The playlist object to add to recently played.
  * 
@@ -12,7 +11,7 @@ import { refresh } from "../utils/refresh-util.js"
 export const addToRecent = async (playlist) => {
     console.log(`Adding '${playlist.title}' to list of recently played playlists.`)
 
-    const success = await addToRecentlyPlayed(playlist)
+    const success = await addToRecentlyPlayed(playlist.id)
 
     if (!success) {
         console.error('Failed to add playlist to list of recently played!')
@@ -20,6 +19,4 @@ export const addToRecent = async (playlist) => {
     }
 
     console.log(`Successfully added '${playlist.title}' to recently played playlists.`)
-
-    await refresh(['home'])
 }
\ No newline at end of file
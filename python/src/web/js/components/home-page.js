@@ -35,7 +35,7 @@ export const loadHomePage = (recentlyPlayedPlaylistsTitles) => {
     const infoDiv = document.createElement("div")
     infoDiv.innerHTML = `
       <p class="font-semibold">${playlist.title}</p>
-      <p class="text-xs uppercase font-semibold opacity-60">Total tracks: ${playlist.tracks.length}</p>
+      <p class="text-xs uppercase font-semibold opacity-60">Total tracks: ${playlist.track_count}</p>
       <p class="text-xs uppercase font-semibold opacity-60">Total duration: ${formatDuration(playlist.duration)}</p>
     `
 
@@ -1,80 +1,79 @@
-import { getCurrentTrackInfo, getCurrentTrackPosition, isMediaPlaying, pauseCurrentTrack, resumeCurrentTrack, setVolume, skipToNextTrack, skipToPreviousTrack } from "../services/api.js"
+import { pauseCurrentTrack, resumeCurrentTrack, setRepeatMode, setShuffle, setVolume, skipToNextTrack, skipToPreviousTrack } from "../services/api.js"
 import { formatDuration } from "../utils/format-duration-util.js"
 import { appState } from "../state.js"
 
-const nextTrack = async () => {
+// Order in which the repeat button cycles through the backend repeat modes
+const REPEAT_MODES = ['off', 'all', 'one']
+
+/**
+ * Switches the play/pause button icon.
+ *
+ * @param {boolean} isPlaying - Whether the media player is playing.
+ */
+const showPlayingState = (isPlaying) => {
     const playIcon = document.querySelector('#play-pause-btn-play-icon')
     const pauseIcon = document.querySelector('#play-pause-btn-pause-icon')
 
+    appState.isPlaying = isPlaying
+
+    if (isPlaying) {
+        playIcon.classList.add('hidden')
+        pauseIcon.classList.remove('hidden')
+    } else {
+        pauseIcon.classList.add('hidden')
+        playIcon.classList.remove('hidden')
+    }
+}
+
+const nextTrack = async () => {
     const volumeSlider = document.querySelector('#volume-slider')
 
     console.log('Skipping to next track.')
 
-    const success = skipToNextTrack()
+    const success = await skipToNextTrack()
 
     if (!success) {
         console.error('Failed to skip to next track!')
         return
     }
 
-    playIcon.classList.add('hidden')
-    pauseIcon.classList.remove('hidden')
-
     setVolume(volumeSlider.value / 100)
-    await updateTrackInfo()
 }
 
 /**
- * Updates the UI with the current playback position of the currently playing track.
- * Fetches data from the backend and updates both time display and progress bar.
+ * Updates the UI with the given playback position of the currently playing track.
  *
- * @async
- * @returns {Promise<void>}
+ * @param {number} trackPosition - Position in seconds.
  */
-export const updateTrackPosition = async () => {
+const updateTrackPosition = (trackPosition) => {
     const infoTrackCurrentTime = document.querySelector('#track-current-time')
     const infoTrackProgress = document.querySelector('#track-progress')
 
-    const trackPosition = await getCurrentTrackPosition()
-
-    console.log(`Current track position: ${trackPosition}.`)
-
     infoTrackCurrentTime.textContent = formatDuration(trackPosition)
     infoTrackProgress.value = trackPosition
-
-    if (trackPosition <= 0) {
-        console.log('Current track ended. Playing next track.')
-        await nextTrack()
-    }
 }
 
 /**
  * Updates the UI elements with detailed information about the currently playing track.
- * 
- * @async
- * @returns {Promise<void>}
+ *
+ * @param {Object} trackInfo - Track information sent by the backend.
  */
-export const updateTrackInfo = async () => {
+const updateTrackInfo = (trackInfo) => {
     const infoTrackTitle = document.querySelector('#track-title')
     const infoTrackArtist = document.querySelector('#track-artist')
     const infoTrackCurrentTime = document.querySelector('#track-current-time')
     const infoTrackCurrentIndex = document.querySelector('#current-track-index')
+    const infoTrackLastIndex = document.querySelector('#last-track-index')
     const infoTrackEndTime = document.querySelector('#track-end-time')
     const infoTrackProgress = document.querySelector('#track-progress')
 
     console.log('Updating track info.')
 
-    const trackInfo = await getCurrentTrackInfo()
-
-    if (!trackInfo) {
-        console.error('Failed to receive current track info!')
-        return
-    }
-
     // Set track details
     infoTrackTitle.textContent = trackInfo.title
     infoTrackArtist.textContent = trackInfo.artist
     infoTrackCurrentIndex.textContent = trackInfo.current_index + 1
+    infoTrackLastIndex.textContent = trackInfo.track_count
     infoTrackCurrentTime.textContent = formatDuration(trackInfo.position)
     infoTrackEndTime.textContent = formatDuration(trackInfo.duration)
 
@@ -83,20 +82,83 @@ export const updateTrackInfo = async () => {
     infoTrackProgress.value = trackInfo.position
 }
 
+/**
+ * Shows the shuffle and repeat settings of the backend queue.
+ *
+ * @param {{ shuffle: boolean, repeat_mode: string }} queueInfo - Queue settings sent by the backend.
+ */
+const updateQueueInfo = (queueInfo) => {
+    const shuffleBtn = document.querySelector('#shuffle-btn')
+    const repeatBtn = document.querySelector('#repeat-btn')
+    const repeatOneBadge = document.querySelector('#repeat-one-badge')
+
+    appState.shuffle = queueInfo.shuffle
+    appState.repeatMode = queueInfo.repeat_mode
+
+    shuffleBtn.classList.toggle('btn-active', queueInfo.shuffle)
+    repeatBtn.classList.toggle('btn-active', queueInfo.repeat_mode !== 'off')
+    repeatOneBadge.classList.toggle('hidden', queueInfo.repeat_mode !== 'one')
+    repeatBtn.setAttribute('aria-label', `Repeat: ${queueInfo.repeat_mode}`)
+}
+
+/**
+ * Handles playback events pushed by the backend media player.
+ *
+ * @param {{ type: string, track?: Object, position?: number }} event - The playback event.
+ * @returns {Promise<void>}
+ */
+const onPlaybackEvent = async (event) => {
+    switch (event.type) {
+        case 'track_changed':
+            if (event.track) {
+                updateTrackInfo(event.track)
+            }
+            break
+
+        case 'position':
+            updateTrackPosition(event.position)
+            break
+
+        case 'resumed':
+            showPlayingState(true)
+            break
+
+        case 'paused':
+            showPlayingState(false)
+            break
+
+        case 'queue_changed':
+            updateQueueInfo(event.queue)
+            break
+
+        case 'track_ended':
+            // The backend continues with the next track by itself,
+            // so this is only sent after the last one
+            console.log('Playlist ended.')
+            showPlayingState(false)
+            break
+
+        default:
+            console.warn(`Unknown playback event: ${event.type}`)
+    }
+}
+
 /**
  * Initializes event listeners for playback control buttons:
  * - Play/Pause
  * - Next Track
  * - Previous Track
+ * - Shuffle
+ * - Repeat (off, all, one)
  *
- * Handles icon state changes and refreshes track info after navigation.
+ * Icons and track info are updated by playback events pushed from the backend.
  */
 export const initControlBtns = () => {
     const playPauseBtn = document.querySelector('#play-pause-btn')
     const prevBtn = document.querySelector('#prev-btn')
     const nextBtn = document.querySelector('#next-btn')
-    const playIcon = document.querySelector('#play-pause-btn-play-icon')
-    const pauseIcon = document.querySelector('#play-pause-btn-pause-icon')
+    const shuffleBtn = document.querySelector('#shuffle-btn')
+    const repeatBtn = document.querySelector('#repeat-btn')
 
     prevBtn.addEventListener('click', async () => {
         const volumeSlider = document.querySelector('#volume-slider')
@@ -110,38 +172,38 @@ export const initControlBtns = () => {
             return
         }
 
-        playIcon.classList.add('hidden')
-        pauseIcon.classList.remove('hidden')
-
         setVolume(volumeSlider.value / 100)
-        await updateTrackInfo()
     })
 
     nextBtn.addEventListener('click', async () => {
         await nextTrack()
     })
 
-    playPauseBtn.addEventListener('click', async () => {
-        const isPlaying = await isMediaPlaying()
+    shuffleBtn.addEventListener('click', () => {
+        console.log(`Turning shuffle ${appState.shuffle ? 'off' : 'on'}.`)
 
-        if (isPlaying) {
-            console.log('Pausing media player.')
+        setShuffle(!appState.shuffle)
+    })
 
-            pauseCurrentTrack()
+    repeatBtn.addEventListener('click', async () => {
+        const nextMode = REPEAT_MODES[(REPEAT_MODES.indexOf(appState.repeatMode) + 1) % REPEAT_MODES.length]
 
-            pauseIcon.classList.add('hidden')
-            playIcon.classList.remove('hidden')
+        console.log(`Setting repeat mode to '${nextMode}'.`)
 
-            clearInterval(appState.intervailId)
+        if (!await setRepeatMode(nextMode)) {
+            console.error('Failed to set repeat mode!')
+        }
+    })
+
+    playPauseBtn.addEventListener('click', () => {
+        if (appState.isPlaying) {
+            console.log('Pausing media player.')
+
+            pauseCurrentTrack()
         } else {
             console.log('Resuming media player.')
 
             resumeCurrentTrack()
-
-            playIcon.classList.add('hidden')
-            pauseIcon.classList.remove('hidden')
-
-            appState.intervailId = setInterval(updateTrackPosition, 1000)
         }
     })
 }
@@ -156,4 +218,7 @@ export const initVolumeSlider = () => {
     volumeSlider.addEventListener('input', () => {
         setVolume(volumeSlider.value / 100)
     })
-}
\ No newline at end of file
+}
+
+// Functions callable from the Python backend
+eel.expose(onPlaybackEvent, 'playback_event')
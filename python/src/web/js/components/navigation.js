@@ -5,11 +5,14 @@ import { showPage } from "./show-page.js"
  * Currently supports:
  * - Home page ('home')
  * - Playlists page ('playlists')
+ * - Search page ('search')
  */
 export const initNavBtns = () => {
     const homeNavBtn = document.querySelector('#btn-home')
     const playlistsNavBtn = document.querySelector('#btn-playlists')
+    const searchNavBtn = document.querySelector('#btn-search')
 
     homeNavBtn.addEventListener('click', () => showPage('home'))
     playlistsNavBtn.addEventListener('click', () => showPage('playlists'))
+    searchNavBtn.addEventListener('click', () => showPage('search'))
 }
\ No newline at end of file
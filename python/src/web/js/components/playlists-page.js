@@ -30,7 +30,7 @@ export const loadPlaylistPage = (playlists) => {
     const infoDiv = document.createElement("div")
     infoDiv.innerHTML = `
       <p class="font-semibold">${playlist.title}</p>
-      <p class="text-xs uppercase font-semibold opacity-60">Total tracks: ${playlist.tracks.length}</p>
+      <p class="text-xs uppercase font-semibold opacity-60">Total tracks: ${playlist.track_count}</p>
       <p class="text-xs uppercase font-semibold opacity-60">Total duration: ${formatDuration(playlist.duration)}</p>
     `
 
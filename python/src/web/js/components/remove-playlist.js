@@ -1,9 +1,8 @@
 import { removePlaylist } from "../services/api.js"
-import { refresh } from "../utils/refresh-util.js"
 
 /**
- * Removes the specified playlist by calling the backend,
- * then refreshes the 'home' and 'playlists' pages.
+ * Removes the specified playlist by calling the backend.
+ * The backend pushes the removal, which refreshes the 'home' and 'playlists' pages.
  *
  * @param {Playlist} playlist - The playlist object to remove.
  * @returns {Promise<void>}
@@ -11,7 +10,7 @@ import { refresh } from "../utils/refresh-util.js"
 export const removePlaylistBtn = async (playlist) => {
     console.log(`Removing '${playlist.title}' playlist.`)
 
-    const success = await removePlaylist(playlist)
+    const success = await removePlaylist(playlist.id)
 
     if (!success) {
         console.error(`Failed to remove playlist: '${playlist.title}'`)
@@ -19,6 +18,4 @@ export const removePlaylistBtn = async (playlist) => {
     }
 
     console.log(`Playlist '${playlist.title}' has been removed.`)
-
-    await refresh(['home', 'playlists'])
 }
\ No newline at end of file
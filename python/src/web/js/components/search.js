@@ -0,0 +1,144 @@
+import { appState } from "../state.js"
+import { search } from "../services/api.js"
+import { seePlaylist } from "./see-playlist.js"
+
+/** @typedef {import('../types.js').SearchResult} SearchResult */
+
+// Searching starts from this many characters, single letters match nearly everything
+const MIN_QUERY_LENGTH = 2
+
+// Quiet period after the last keystroke before searching
+const DEBOUNCE_MS = 150
+
+/**
+ * State of the search page: the searched query, its total number of results and the results loaded so far.
+ */
+const searchState = {
+    query: '',
+    total: 0,
+    /** @type {SearchResult[]} */
+    results: [],
+    /** @type {number | null} */
+    debounceTimer: null
+}
+
+/**
+ * Renders a single search result as a list item, opening its playlist when clicked.
+ *
+ * @param {SearchResult} result - The result to render.
+ * @returns {HTMLLIElement}
+ */
+const renderResult = (result) => {
+    const resultLi = document.createElement("li")
+    resultLi.className = "list-row flex justify-between items-center p-4 border-b"
+
+    const infoDiv = document.createElement("div")
+
+    const titleP = document.createElement("p")
+    titleP.className = "font-semibold"
+    titleP.textContent = result.title
+
+    const detailsP = document.createElement("p")
+    detailsP.className = "text-xs uppercase font-semibold opacity-60"
+    detailsP.textContent = result.type === 'track'
+        ? `${result.artist} · ${result.playlist_title}`
+        : 'Playlist'
+
+    infoDiv.appendChild(titleP)
+    infoDiv.appendChild(detailsP)
+
+    const seeBtn = document.createElement("button")
+    seeBtn.onclick = () => {
+        const playlist = appState.user.playlists.find(p => p.id === result.playlist_id)
+
+        if (!playlist) {
+            console.warn(`Cannot find playlist with ID: ${result.playlist_id}.`)
+            return
+        }
+
+        seePlaylist(playlist)
+    }
+    seeBtn.className = "btn"
+    seeBtn.textContent = "See playlist"
+
+    resultLi.appendChild(infoDiv)
+    resultLi.appendChild(seeBtn)
+
+    return resultLi
+}
+
+/**
+ * Renders the loaded results, the number of all results and the "Load more" button.
+ */
+const renderResults = () => {
+    const resultsList = document.querySelector('#search-results-list')
+    const summary = document.querySelector('#search-summary')
+    const loadMoreBtn = document.querySelector('#load-more-results-btn')
+
+    resultsList.innerHTML = ''
+    searchState.results.forEach(result => resultsList.appendChild(renderResult(result)))
+
+    summary.textContent = searchState.query ? `Results: ${searchState.total}` : ''
+    loadMoreBtn.classList.toggle('hidden', searchState.results.length >= searchState.total)
+}
+
+/**
+ * Searches for the given query and shows the first page of results.
+ * Results of queries the user has typed over in the meantime are dropped.
+ *
+ * @param {string} query - Text to search for.
+ * @returns {Promise<void>}
+ */
+const runSearch = async (query) => {
+    searchState.query = query
+
+    if (query.length < MIN_QUERY_LENGTH) {
+        searchState.total = 0
+        searchState.results = []
+        renderResults()
+        return
+    }
+
+    const page = await search(query, 0)
+
+    if (searchState.query !== query) {
+        return
+    }
+
+    searchState.total = page.total
+    searchState.results = page.results
+    renderResults()
+}
+
+/**
+ * Loads the next page of results of the current query.
+ *
+ * @returns {Promise<void>}
+ */
+const loadMoreResults = async () => {
+    const query = searchState.query
+    const page = await search(query, searchState.results.length)
+
+    if (searchState.query !== query) {
+        return
+    }
+
+    searchState.total = page.total
+    searchState.results.push(...page.results)
+    renderResults()
+}
+
+/**
+ * Initializes the search input, searching as the user types, and the "Load more" button.
+ */
+export const initSearch = () => {
+    const searchInput = document.querySelector('#search-input')
+    const loadMoreBtn = document.querySelector('#load-more-results-btn')
+
+    searchInput.addEventListener('input', () => {
+        clearTimeout(searchState.debounceTimer)
+        searchState.debounceTimer = setTimeout(() => runSearch(searchInput.value.trim()), DEBOUNCE_MS)
+    })
+
+    loadMoreBtn.addEventListener('click', loadMoreResults)
+}
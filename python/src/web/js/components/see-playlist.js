@@ -1,13 +1,13 @@
 import { appState } from "../state.js"
 import { formatDuration } from "../utils/format-duration-util.js"
-import { moveTrack } from "../services/api.js"
-import { refresh } from "../utils/refresh-util.js"
+import { enqueueTrack, getPlaylistTracks, moveTrack } from "../services/api.js"
 import { showPage } from "./show-page.js"
 import { renameButton, toggleRenameButton } from "../modals/rename-playlist-modal.js"
 
 /**
  * Moves a track within the playlist to a new index.
  * Disables all move buttons during the operation to prevent duplicate actions.
+ * On success the loaded tracks are reordered locally instead of being fetched again.
  *
  * @param {Playlist} playlist - Playlist containing the track.
  * @param {number} fromIndex - Index of the track to move.
@@ -16,6 +16,7 @@ import { renameButton, toggleRenameButton } from "../modals/rename-playlist-moda
  */
 const moveTrackBtn = async (playlist, fromIndex, toIndex) => {
   const moveBtns = document.querySelectorAll('.move-btn')
+  const openedPlaylist = appState.openedPlaylist
 
   console.log(`Moving track from index ${fromIndex} to index ${toIndex} in playlist '${playlist.title}'.`)
 
@@ -25,7 +26,7 @@ const moveTrackBtn = async (playlist, fromIndex, toIndex) => {
   })
 
   // Validate indices
-  if (toIndex < 0 || toIndex >= playlist.tracks.length) {
+  if (toIndex < 0 || toIndex >= openedPlaylist.total) {
     console.error('Cannot move this track — invalid target index.')
 
     // Re-enable buttons
@@ -36,52 +37,93 @@ const moveTrackBtn = async (playlist, fromIndex, toIndex) => {
     return
   }
 
-  const success = await moveTrack(playlist, fromIndex, toIndex)
+  const success = await moveTrack(playlist.id, fromIndex, toIndex)
 
   if (!success) {
     console.error('Failed to move track!')
+
+    // Re-enable buttons
+    moveBtns.forEach(btn => {
+      btn.disabled = false
+    })
+
     return
   }
 
   console.log(`Track from index ${fromIndex} has been moved to index ${toIndex}.`)
 
-  await refresh(['home', 'playlists'])
-  seePlaylist(appState.user.playlists.find(p => p.folder_path === playlist.folder_path))
+  if (toIndex < openedPlaylist.tracks.length) {
+    const [track] = openedPlaylist.tracks.splice(fromIndex, 1)
+    openedPlaylist.tracks.splice(toIndex, 0, track)
+  } else {
+    // The track moved past the loaded tracks
+    openedPlaylist.tracks.splice(fromIndex, 1)
+    await loadNextTracksPage()
+  }
+
+  renderTracks(playlist)
 }
 
 /**
- * Displays the playlist details page with its tracks and controls.
- * - Shows track list with move-up/move-down buttons.
- * - Sets up renaming functionality for the playlist.
- * - Disables move buttons at the edges (first/last track).
+ * Queues a track to be played after the current one or at the end of the queue.
+ * Only tracks of the playing playlist can be queued.
  *
- * @param {Playlist} playlist - The playlist object to display.
+ * @param {Playlist} playlist - Playlist containing the track.
+ * @param {number} index - Index of the track to queue.
+ * @param {boolean} playNext - Whether to play the track right after the current one.
+ * @returns {Promise<void>}
  */
-export const seePlaylist = (playlist) => {
-  const playlistTracksList = document.querySelector('#playlist-tracks-list')
-  const playlistTracksTitle = document.querySelector('#playlist-tracks-title')
-  const playlistTitleInput = document.querySelector('#renamePlaylistTitle')
-  const renamePlaylistBtn = document.querySelector('#renamePlaylistButton')
+const enqueueTrackBtn = async (playlist, index, playNext) => {
+  console.log(`Queueing track ${index} of playlist '${playlist.title}'.`)
 
-  // Remove existing listeners to avoid duplication
-  playlistTitleInput.removeEventListener('input', appState.renameInputListener)
-  renamePlaylistBtn.removeEventListener('click', appState.renameClickListener)
+  const success = await enqueueTrack(playlist.id, index, playNext)
 
-  // Set up new listeners
-  appState.renameInputListener = () => toggleRenameButton(playlist.title)
-  appState.renameClickListener = () => renameButton(playlist)
-  playlistTitleInput.addEventListener('input', appState.renameInputListener)
-  renamePlaylistBtn.addEventListener('click', appState.renameClickListener)
+  if (!success) {
+    console.error('Failed to queue track! Is the playlist playing?')
+  }
+}
 
-  console.log(`Loading '${playlist.title}' playlist page.`)
+/**
+ * Fetches the next page of tracks of the opened playlist and appends it to the loaded ones.
+ *
+ * @returns {Promise<void>}
+ */
+const loadNextTracksPage = async () => {
+  const openedPlaylist = appState.openedPlaylist
+  const page = await getPlaylistTracks(openedPlaylist.id, openedPlaylist.tracks.length)
+
+  if (!page) {
+    console.error('Failed to load playlist tracks!')
+    return
+  }
+
+  // Ignore responses for a playlist that is no longer opened
+  if (appState.openedPlaylist !== openedPlaylist) {
+    return
+  }
+
+  openedPlaylist.total = page.total
+  openedPlaylist.tracks.push(...page.tracks)
+}
+
+/**
+ * Renders the loaded tracks of the opened playlist.
+ * - Shows track list with play-next, add-to-queue and move-up/move-down buttons.
+ * - Disables move buttons at the edges (first/last track).
+ * - Shows the "Load more" button while not all tracks are loaded.
+ *
+ * @param {Playlist} playlist - The opened playlist.
+ */
+const renderTracks = (playlist) => {
+  const playlistTracksList = document.querySelector('#playlist-tracks-list')
+  const loadMoreBtn = document.querySelector('#load-more-tracks-btn')
+  const { tracks, total } = appState.openedPlaylist
 
   // Clear previous content
   playlistTracksList.innerHTML = ''
-  playlistTracksTitle.textContent = playlist.title
-  playlistTitleInput.value = playlist.title
 
   // Generate track list
-  playlist.tracks.forEach((track, index) => {
+  tracks.forEach((track, index) => {
     const trackLi = document.createElement('li')
     trackLi.className = 'list-row flex justify-between items-center p-4 border-b'
 
@@ -95,9 +137,29 @@ export const seePlaylist = (playlist) => {
     const actionsDiv = document.createElement('div')
     actionsDiv.className = 'flex gap-2'
 
+    const playNextBtn = document.createElement('button')
+    playNextBtn.onclick = () => enqueueTrackBtn(playlist, index, true)
+    playNextBtn.className = "btn"
+    playNextBtn.title = "Play next"
+    playNextBtn.innerHTML = `
+      <svg xmlns="http://www.w3.org/2000/svg" height="24px" viewBox="0 -960 960 960" width="24px" fill="currentColor">
+        <path d="M120-320v-80h280v80H120Zm0-160v-80h440v80H120Zm0-160v-80h440v80H120Zm520 480v-320l240 160-240 160Z"/>
+      </svg>
+    `
+
+    const enqueueBtn = document.createElement('button')
+    enqueueBtn.onclick = () => enqueueTrackBtn(playlist, index, false)
+    enqueueBtn.className = "btn"
+    enqueueBtn.title = "Add to queue"
+    enqueueBtn.innerHTML = `
+      <svg xmlns="http://www.w3.org/2000/svg" height="24px" viewBox="0 -960 960 960" width="24px" fill="currentColor">
+        <path d="M120-320v-80h280v80H120Zm0-160v-80h440v80H120Zm0-160v-80h440v80H120Zm520 480v-160H480v-80h160v-160h80v160h160v80H720v160h-80Z"/>
+      </svg>
+    `
+
     const upBtn = document.createElement('button')
     upBtn.onclick = () => moveTrackBtn(playlist, index, index - 1)
-    upBtn.className = "btn"
+    upBtn.className = "btn move-btn"
     upBtn.innerHTML = `
       <svg xmlns="http://www.w3.org/2000/svg" height="24px" viewBox="0 -960 960 960" width="24px" fill="currentColor">
         <path d="M480-528 296-344l-56-56 240-240 240 240-56 56-184-184Z"/>
@@ -106,7 +168,7 @@ export const seePlaylist = (playlist) => {
 
     const downBtn = document.createElement('button')
     downBtn.onclick = () => moveTrackBtn(playlist, index, index + 1)
-    downBtn.className = "btn"
+    downBtn.className = "btn move-btn"
     downBtn.innerHTML = `
       <svg xmlns="http://www.w3.org/2000/svg" height="24px" viewBox="0 -960 960 960" width="24px" fill="currentColor">
         <path d="M480-344 240-584l56-56 184 184 184-184 56 56-240 240Z"/>
@@ -117,11 +179,13 @@ export const seePlaylist = (playlist) => {
       upBtn.disabled = true
       upBtn.classList.add('btn-disabled')
     }
-    if (index === playlist.tracks.length - 1) {
+    if (index === total - 1) {
       downBtn.disabled = true
       downBtn.classList.add('btn-disabled')
     }
 
+    actionsDiv.appendChild(playNextBtn)
+    actionsDiv.appendChild(enqueueBtn)
     actionsDiv.appendChild(upBtn)
     actionsDiv.appendChild(downBtn)
 
@@ -131,7 +195,76 @@ export const seePlaylist = (playlist) => {
     playlistTracksList.appendChild(trackLi)
   })
 
+  tracks.length < total
+    ? loadMoreBtn.classList.remove('hidden')
+    : loadMoreBtn.classList.add('hidden')
+
+  loadMoreBtn.onclick = async () => {
+    await loadNextTracksPage()
+    renderTracks(playlist)
+  }
+}
+
+/**
+ * Reloads the tracks of the opened playlist, keeping as many tracks loaded as before.
+ * Used when the playlist changed on the backend (e.g. new files in its folder).
+ *
+ * @returns {Promise<void>}
+ */
+export const reloadOpenedPlaylist = async () => {
+  const openedPlaylist = appState.openedPlaylist
+  const playlist = appState.user.playlists.find(p => p.id === openedPlaylist.id)
+
+  if (!playlist) {
+    return
+  }
+
+  const loadedCount = openedPlaylist.tracks.length
+  openedPlaylist.tracks = []
+
+  do {
+    await loadNextTracksPage()
+  } while (openedPlaylist.tracks.length < Math.min(loadedCount, openedPlaylist.total))
+
+  renderTracks(playlist)
+}
+
+/**
+ * Displays the playlist details page with its first page of tracks and controls.
+ * - Sets up renaming functionality for the playlist.
+ *
+ * @param {Playlist} playlist - The playlist object to display.
+ * @returns {Promise<void>}
+ */
+export const seePlaylist = async (playlist) => {
+  const playlistTracksTitle = document.querySelector('#playlist-tracks-title')
+  const playlistTitleInput = document.querySelector('#renamePlaylistTitle')
+  const renamePlaylistBtn = document.querySelector('#renamePlaylistButton')
+
+  // Remove existing listeners to avoid duplication
+  playlistTitleInput.removeEventListener('input', appState.renameInputListener)
+  renamePlaylistBtn.removeEventListener('click', appState.renameClickListener)
+
+  // Set up new listeners
+  appState.renameInputListener = () => toggleRenameButton(playlist.title)
+  appState.renameClickListener = () => renameButton(playlist)
+  playlistTitleInput.addEventListener('input', appState.renameInputListener)
+  renamePlaylistBtn.addEventListener('click', appState.renameClickListener)
+
+  console.log(`Loading '${playlist.title}' playlist page.`)
+
+  playlistTracksTitle.textContent = playlist.title
+  playlistTitleInput.value = playlist.title
+
+  // Keep already loaded tracks when the same playlist is shown again (e.g. after renaming)
+  if (appState.openedPlaylist?.id !== playlist.id) {
+    appState.openedPlaylist = { id: playlist.id, total: playlist.track_count, tracks: [] }
+    await loadNextTracksPage()
+  }
+
+  renderTracks(playlist)
+
   console.log(`'${playlist.title}' playlist page loading completed.`)
 
   showPage('playlist-tracks')
-}
\ No newline at end of file
+}
@@ -1,16 +1,18 @@
 /**
  * Displays the specified page and updates the navigation UI accordingly.
  *
- * @param {'home' | 'playlists' | 'playlist-tracks'} page - The name of the page to show.
+ * @param {'home' | 'playlists' | 'playlist-tracks' | 'search'} page - The name of the page to show.
  */
 export const showPage = (page) => {
     const homeNavBtn = document.querySelector('#btn-home')
     const playlistsNavBtn = document.querySelector('#btn-playlists')
+    const searchNavBtn = document.querySelector('#btn-search')
     const navBtns = document.querySelectorAll('.nav-btn')
     const pages = document.querySelectorAll('.page')
     const homePage = document.querySelector('#home-page')
     const playlistsPage = document.querySelector('#playlists-page')
     const playlistTracksPage = document.querySelector('#playlist-tracks-page')
+    const searchPage = document.querySelector('#search-page')
 
     console.log(`Changing page to: ${page}`)
 
@@ -40,6 +42,12 @@ export const showPage = (page) => {
             playlistTracksPage.classList.remove('hidden')
             break
 
+        case 'search':
+            searchPage.classList.remove('hidden')
+            searchNavBtn.classList.add('btn-active')
+            document.querySelector('#search-input').focus()
+            break
+
         default:
             console.warn(`Unknown page requested: ${page}`)
             break
@@ -6,16 +6,28 @@
 
 import { initControlBtns, initVolumeSlider } from "./components/media-player.js"
 import { initNavBtns } from "./components/navigation.js"
+import { initSearch } from "./components/search.js"
 import { showPage } from "./components/show-page.js"
 import { initCreatePlaylistModal } from "./modals/create-playlist-modal.js"
 import { refresh } from "./utils/refresh-util.js"
+import { openSession } from "./services/api.js"
+import { listenToSession } from "./services/events.js"
 
 document.addEventListener('DOMContentLoaded', async () => {
+    // In server mode, every call is made for the session's user
+    const sessionId = await openSession()
+    const serverMode = sessionId !== null
+
+    if (serverMode) {
+        listenToSession(sessionId)
+    }
+
     // Initialize UI controls
     initNavBtns()
     initVolumeSlider()
     initControlBtns()
-    initCreatePlaylistModal()
+    initCreatePlaylistModal(serverMode)
+    initSearch()
 
     // Load user data and refresh pages
     await refresh(['home', 'playlists'])
@@ -1,14 +1,17 @@
 import { pickFolder, createPlaylist } from "../services/api.js"
-import { refresh } from "../utils/refresh-util.js"
 
 /**
  * Initializes the "Create Playlist" modal UI.
  * Sets up event listeners for:
  * - Input validation (title and folder path)
  * - Folder selection via backend
- * - Playlist creation and page refresh
+ * - Playlist creation (the backend pushes the new playlist to the pages)
+ *
+ * In server mode there is no folder dialog, the folder path on the server is typed in.
+ *
+ * @param {boolean} serverMode - Whether the backend runs in server mode.
  */
-export const initCreatePlaylistModal = () => {
+export const initCreatePlaylistModal = (serverMode = false) => {
     const newPlaylistTitle = document.querySelector('#newPlaylistTitle')
     const newPlaylistFolder = document.querySelector('#newPlaylistFolder')
     const browseFolderButton = document.querySelector('#browseFolderButton')
@@ -27,6 +30,12 @@ export const initCreatePlaylistModal = () => {
     // Listen for changes in title input to update button state
     newPlaylistTitle.addEventListener('input', toggleCreateButton)
 
+    if (serverMode) {
+        newPlaylistFolder.removeAttribute('disabled')
+        newPlaylistFolder.addEventListener('input', toggleCreateButton)
+        browseFolderButton.classList.add('hidden')
+    }
+
     // Handle folder selection button click
     browseFolderButton.addEventListener('click', async () => {
         console.log('Opening folder picker dialog.')
@@ -70,7 +79,5 @@ export const initCreatePlaylistModal = () => {
         }
 
         console.log(`Playlist '${title}' has been created.`)
-
-        await refresh(['playlists'])
     })
 }
\ No newline at end of file
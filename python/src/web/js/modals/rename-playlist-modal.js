@@ -1,5 +1,4 @@
 import { renamePlaylist } from "../services/api.js"
-import { refresh } from "../utils/refresh-util.js"
 import { seePlaylist } from "../components/see-playlist.js"
 import { appState } from "../state.js"
 
@@ -20,7 +19,8 @@ export const toggleRenameButton = (playlistTitle) => {
 
 /**
  * Renames the given playlist to the new title provided in the input field.
- * Calls backend to perform the rename operation and refreshes relevant pages on success.
+ * Calls backend to perform the rename operation and updates the playlist page on success.
+ * Other pages are refreshed by the update pushed from the backend.
  * Closes the rename modal regardless of success.
  * 
  * @param {Playlist} playlist - The playlist object to rename.
@@ -36,7 +36,7 @@ export const renameButton = async (playlist) => {
 
     renamePlaylistModal.close()
 
-    const success = await renamePlaylist(playlist, newTitle)
+    const success = await renamePlaylist(playlist.id, newTitle)
 
     if (!success) {
         console.error('Failed to rename playlist!')
@@ -45,6 +45,5 @@ export const renameButton = async (playlist) => {
 
     console.log('Playlist has been renamed.')
 
-    await refresh(['home', 'playlists'])
-    seePlaylist(appState.user.playlists.find(p => p.folder_path === playlist.folder_path))
+    seePlaylist(appState.user.playlists.find(p => p.id === playlist.id))
 }
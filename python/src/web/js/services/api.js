@@ -1,23 +1,51 @@
+// Session ID in server mode, passed before the arguments of every call; empty in the desktop application
+let session = []
+
+/**
+ * Opens a session for the user named by the `user` query parameter of the page,
+ * with the token given by the `token` parameter.
+ * Returns the session ID in server mode, null in the desktop application.
+ *
+ * @returns {Promise<string|null>}
+ */
+export const openSession = async () => {
+    const params = new URLSearchParams(window.location.search)
+    const sessionId = await eel.open_session(params.get('user'), params.get('token'))()
+
+    session = sessionId ? [sessionId] : []
+
+    return sessionId
+}
+
 // User
-export const getUserData = async () => { return await eel.get_user_data()() }
+export const getUserData = async () => { return await eel.get_user_data(...session)() }
+export const getPlaylistTracks = async (playlistId, offset) => { return await eel.get_playlist_tracks(...session, playlistId, offset)() }
 
 // Playlist
-export const createPlaylist = async (title, folderPath) => { return await eel.create_playlist(title, folderPath)() }
-export const addToRecentlyPlayed = async (playlist) => { return await eel.add_to_recently_played(playlist)() }
-export const renamePlaylist = async (playlist, newTitle) => { return await eel.rename_playlist(playlist, newTitle)() }
-export const removePlaylist = async (playlist) => { return await eel.remove_playlist(playlist)() }
+export const createPlaylist = async (title, folderPath) => { return await eel.create_playlist(...session, title, folderPath)() }
+export const addToRecentlyPlayed = async (playlistId) => { return await eel.add_to_recently_played(...session, playlistId)() }
+export const renamePlaylist = async (playlistId, newTitle) => { return await eel.rename_playlist(...session, playlistId, newTitle)() }
+export const removePlaylist = async (playlistId) => { return await eel.remove_playlist(...session, playlistId)() }
+
+// Search
+export const search = async (query, offset) => { return await eel.search(...session, query, offset)() }
+export const findDuplicates = async () => { return await eel.find_duplicates(...session)() }
 
 // Util
-export const pickFolder = async () => { return await eel.pick_folder()() }
+export const pickFolder = async () => { return await eel.pick_folder(...session)() }
+export const getMetrics = async () => { return await eel.get_metrics(...session)() }
 
 // MediaPlayer
-export const getCurrentTrackPosition = async () => { return await eel.get_current_track_position()() }
-export const getCurrentTrackInfo = async () => { return await eel.get_current_track_info()() }
-export const isMediaPlaying = async () => { return await eel.is_playing()() }
-export const mediaPlay = async (playlist) => { return await eel.play_playlist(playlist)() }
-export const skipToPreviousTrack = async () => { return await eel.prev_track()() }
-export const skipToNextTrack = async () => { return await eel.next_track()() }
-export const moveTrack = async (playlist, fromIndex, toIndex) => { return await eel.move_track(playlist, fromIndex, toIndex)() }
-export const pauseCurrentTrack = () => { eel.pause_current_track() }
-export const resumeCurrentTrack = () => { eel.resume_current_track() }
-export const setVolume = (volume) => { eel.set_volume(volume) }
\ No newline at end of file
+export const getCurrentTrackInfo = async () => { return await eel.get_current_track_info(...session)() }
+export const mediaPlay = async (playlistId) => { return await eel.play_playlist(...session, playlistId)() }
+export const skipToPreviousTrack = async () => { return await eel.prev_track(...session)() }
+export const skipToNextTrack = async () => { return await eel.next_track(...session)() }
+export const moveTrack = async (playlistId, fromIndex, toIndex) => { return await eel.move_track(...session, playlistId, fromIndex, toIndex)() }
+export const pauseCurrentTrack = () => { eel.pause_current_track(...session) }
+export const resumeCurrentTrack = () => { eel.resume_current_track(...session) }
+export const setVolume = (volume) => { eel.set_volume(...session, volume) }
+
+// Queue
+export const enqueueTrack = async (playlistId, trackIndex, playNext) => { return await eel.enqueue_track(...session, playlistId, trackIndex, playNext)() }
+export const setShuffle = (shuffle) => { eel.set_shuffle(...session, shuffle) }
+export const setRepeatMode = async (mode) => { return await eel.set_repeat_mode(...session, mode)() }
\ No newline at end of file
@@ -0,0 +1,119 @@
+import { appState } from "../state.js"
+import { render } from "../utils/refresh-util.js"
+import { reloadOpenedPlaylist } from "../components/see-playlist.js"
+
+/**
+ * Called by the backend when a playlist has been created or renamed.
+ * Inserts or replaces the playlist summary and re-renders the pages showing it.
+ *
+ * @param {Playlist} playlist - Summary of the updated playlist.
+ */
+const onPlaylistUpdated = (playlist) => {
+    console.log(`Playlist '${playlist.title}' has been updated.`)
+
+    if (!appState.user) {
+        // User data has not been loaded yet, it will already contain the changes
+        return
+    }
+
+    const index = appState.user.playlists.findIndex(p => p.id === playlist.id)
+
+    if (index === -1) {
+        appState.user.playlists.push(playlist)
+    } else {
+        appState.user.playlists[index] = playlist
+    }
+
+    render(['home', 'playlists'])
+}
+
+/**
+ * Called by the backend when tracks of a playlist changed on disk,
+ * e.g. after the playlist folder has been synchronised in the background.
+ *
+ * @param {Playlist} playlist - Summary of the changed playlist.
+ */
+const onPlaylistTracksChanged = async (playlist) => {
+    onPlaylistUpdated(playlist)
+
+    if (appState.openedPlaylist?.id === playlist.id) {
+        await reloadOpenedPlaylist()
+    }
+}
+
+/**
+ * Called by the backend when a playlist has been removed.
+ *
+ * @param {string} playlistId - ID of the removed playlist.
+ */
+const onPlaylistRemoved = (playlistId) => {
+    console.log(`Playlist '${playlistId}' has been removed.`)
+
+    if (!appState.user) {
+        return
+    }
+
+    appState.user.playlists = appState.user.playlists.filter(p => p.id !== playlistId)
+
+    render(['home', 'playlists'])
+}
+
+/**
+ * Called by the backend when the list of recently played playlists changed.
+ *
+ * @param {string[]} titles - Titles of recently played playlists.
+ */
+const onRecentlyPlayedUpdated = (titles) => {
+    if (!appState.user) {
+        return
+    }
+
+    appState.user.recently_played_playlists = titles
+
+    render(['home'])
+}
+
+// Functions callable from the Python backend
+eel.expose(onPlaylistUpdated, 'playlist_updated')
+eel.expose(onPlaylistTracksChanged, 'playlist_tracks_changed')
+eel.expose(onPlaylistRemoved, 'playlist_removed')
+eel.expose(onRecentlyPlayedUpdated, 'recently_played_updated')
+
+// The same functions, by the name of the updates pushed over the event socket in server mode
+const handlers = {
+    playlist_updated: onPlaylistUpdated,
+    playlist_tracks_changed: onPlaylistTracksChanged,
+    playlist_removed: onPlaylistRemoved,
+    recently_played_updated: onRecentlyPlayedUpdated,
+}
+
+// Delay before reconnecting a closed event socket
+const RECONNECT_DELAY_MS = 2000
+
+/**
+ * Receives the updates of the session's user in server mode, where the backend
+ * pushes them to the tabs of that user only instead of calling exposed functions.
+ *
+ * @param {string} sessionId - ID returned by openSession.
+ */
+export const listenToSession = (sessionId) => {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
+    const socket = new WebSocket(`${protocol}//${window.location.host}/events?session=${encodeURIComponent(sessionId)}`)
+
+    socket.onmessage = (message) => {
+        const { name, args } = JSON.parse(message.data)
+        const handler = handlers[name]
+
+        if (!handler) {
+            console.warn(`Unknown event '${name}'.`)
+            return
+        }
+
+        handler(...args)
+    }
+
+    socket.onclose = () => {
+        console.warn('Event socket closed, reconnecting.')
+        setTimeout(() => listenToSession(sessionId), RECONNECT_DELAY_MS)
+    }
+}
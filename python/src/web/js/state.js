@@ -1,4 +1,5 @@
 /** @typedef {import('./types.js').User} User */
+/** @typedef {import('./types.js').Track} Track */
 
 /**
  * Global application state object.
@@ -11,6 +12,12 @@ export const appState = {
      */
     user: null,
 
+    /**
+     * The playlist shown on the playlist page, with the pages of tracks loaded so far.
+     * @type {{ id: string, total: number, tracks: Track[] } | null}
+     */
+    openedPlaylist: null,
+
     /** 
      * Event listener for rename button click, or null if not set.
      * @type {function | null} 
@@ -22,9 +29,21 @@ export const appState = {
      */
     renameInputListener: null,
 
-    /** 
-     * Stores the interval ID used to update track position during playback.
-     * @type {funciton | null} 
+    /**
+     * Whether the media player is playing, updated by playback events from the backend.
+     * @type {boolean}
+     */
+    isPlaying: false,
+
+    /**
+     * Whether the backend queue plays the tracks in random order.
+     * @type {boolean}
+     */
+    shuffle: false,
+
+    /**
+     * Repeat mode of the backend queue: 'off', 'all' or 'one'.
+     * @type {string}
      */
-    intervailId: null
+    repeatMode: 'off'
 }
\ No newline at end of file
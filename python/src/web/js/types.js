@@ -7,20 +7,67 @@
 
 /**
  * @typedef {Object} Playlist
+ * @property {string} id - Stable identifier of the playlist.
  * @property {string} title - Title of the playlist.
  * @property {number} duration - Total duration in seconds.
  * @property {string} folder_path - Path to the playlist folder.
- * @property {Track[]} tracks - List of tracks in the playlist.
+ * @property {number} track_count - Number of tracks in the playlist.
+ */
+
+/**
+ * @typedef {Object} TracksPage
+ * @property {string} playlist_id - ID of the playlist the tracks belong to.
+ * @property {number} offset - Index of the first track of the page.
+ * @property {number} total - Number of tracks in the whole playlist.
+ * @property {Track[]} tracks - Tracks of the page.
  */
 
 /**
  * @typedef {Object} Track
+ * @property {string} id - Stable identifier of the track.
  * @property {string} title - Title of the track.
  * @property {string} artist - Artist name.
  * @property {number} duration - Duration in seconds.
  * @property {string} file_path - Path to the audio file.
  */
 
+/**
+ * @typedef {Object} SearchResult
+ * @property {'track' | 'playlist'} type - Kind of the result.
+ * @property {string} playlist_id - ID of the playlist (of the track, for tracks).
+ * @property {string} playlist_title - Title of the playlist.
+ * @property {string} title - Title of the track or playlist.
+ * @property {string} [track_id] - ID of the track, for tracks.
+ * @property {string} [artist] - Artist name, for tracks.
+ * @property {number} score - Relevance of the result.
+ */
+
+/**
+ * @typedef {Object} SearchResults
+ * @property {string} query - The searched text.
+ * @property {number} offset - Index of the first result of the page.
+ * @property {number} total - Number of all matching tracks and playlists.
+ * @property {SearchResult[]} results - Results of the page, best first.
+ */
+
+/**
+ * @typedef {Object} DuplicateTrack
+ * @property {string} playlist_id - ID of the playlist containing the track.
+ * @property {string} playlist_title - Title of the playlist.
+ * @property {string} track_id - ID of the track.
+ * @property {number} index - Position of the track in the playlist.
+ * @property {string} title - Title of the track.
+ * @property {string} artist - Artist name.
+ * @property {string} file_path - Path to the audio file.
+ */
+
+/**
+ * @typedef {Object} DuplicateGroup
+ * @property {number} size - Size of each file in bytes.
+ * @property {number} wasted_bytes - Bytes taken by all copies but one.
+ * @property {DuplicateTrack[]} tracks - Tracks whose files have the same content.
+ */
+
 // /** @typedef {import('./types.js').User} User */
 // /** @typedef {import('./types.js').Playlist} Playlist */
 // /** @typedef {import('./types.js').Track} Track */
\ No newline at end of file
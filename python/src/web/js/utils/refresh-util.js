@@ -14,6 +14,15 @@ export const refresh = async (pages) => {
 
     appState.user = await getUserData()
 
+    render(pages)
+}
+
+/**
+ * Reloads specified pages from the user data already held in the application state.
+ *
+ * @param {string[]} pages - Array of page names to reload. Supported values: 'home', 'playlists'.
+ */
+export const render = (pages) => {
     console.log(`Refreshing pages: ${[...pages].join(', ')}.`)
 
     pages.forEach(page => {
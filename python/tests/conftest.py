@@ -0,0 +1,8 @@
+"""
+Makes the backend modules (src/py) importable by the tests, like app.py sees them.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "py"))
@@ -0,0 +1,71 @@
+from datetime import timedelta
+import pytest
+from models.track import Track
+from models.track_store import TrackStore
+from storage.binary_format import decode_tracks, decode_user, encode_tracks, encode_user, read_file
+
+
+def test_user_round_trip():
+    user_data = {
+        "username": "someone",
+        "recently_played_playlists": ["Rock", "Jazz"],
+        "playlists": [
+            {"id": "a" * 32, "title": "Rock", "duration": 125.5, "folder_path": "/music/rock", "track_count": 3},
+            {"id": "b" * 32, "title": "Jazz", "duration": 0.0, "folder_path": "/music/jazz", "track_count": 0},
+        ],
+    }
+
+    assert decode_user(encode_user(user_data)) == user_data
+
+
+def test_empty_user_round_trip():
+    user_data = {"username": "someone", "recently_played_playlists": [], "playlists": []}
+
+    assert decode_user(encode_user(user_data)) == user_data
+
+
+def test_tracks_round_trip():
+    tracks = [
+        Track(f"Title {i}", f"Artist {i % 2}", timedelta(seconds=i * 1.5), f"/music/album {i % 3}/{i}.mp3")
+        for i in range(10)
+    ]
+    tracks[3].id = "hand-edited id"
+    tracks[4].title = "Zażółć gęślą jaźń"
+    store = TrackStore(tracks)
+    store.move(9, 0)
+
+    assert decode_tracks(encode_tracks(store)) == store
+
+
+def test_no_tracks_round_trip():
+    assert len(decode_tracks(encode_tracks(TrackStore()))) == 0
+
+
+def test_read_file(tmp_path):
+    store = TrackStore([Track("Title", "Artist", timedelta(seconds=3), "/music/t.mp3")])
+    path = tmp_path / "tracks.bin"
+    path.write_bytes(encode_tracks(store))
+
+    assert read_file(path, decode_tracks) == store
+
+
+def test_empty_file_is_refused(tmp_path):
+    path = tmp_path / "tracks.bin"
+    path.write_bytes(b"")
+
+    with pytest.raises(ValueError):
+        read_file(path, decode_tracks)
+
+
+def test_other_kind_of_file_is_refused():
+    data = encode_user({"username": "someone", "playlists": []})
+
+    with pytest.raises(ValueError):
+        decode_tracks(data)
+
+
+def test_truncated_file_is_refused():
+    data = encode_tracks(TrackStore([Track("Title", "Artist", timedelta(seconds=3), "/music/t.mp3")]))
+
+    with pytest.raises(ValueError):
+        decode_tracks(data[:-4])
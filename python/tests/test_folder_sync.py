@@ -0,0 +1,57 @@
+import os
+from datetime import timedelta
+from models.playlist import Playlist
+from folder_sync import apply_changes, known_files, scan_folder, sync_folder
+
+
+def make_folder(tmp_path, *names):
+    for name in names:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+    return tmp_path
+
+
+def test_unchanged_folder_has_no_changes(tmp_path):
+    folder = make_folder(tmp_path, "a.mp3", "sub/b.mp3")
+    _, manifest = scan_folder(folder)
+
+    changes = sync_folder(str(folder), dict(manifest))
+
+    assert not changes
+    assert changes.manifest == manifest
+
+
+def test_added_modified_and_removed_files(tmp_path):
+    folder = make_folder(tmp_path, "a.mp3", "b.mp3", "c.mp3")
+    _, manifest = scan_folder(folder)
+
+    (folder / "c.mp3").unlink()
+    (folder / "b.mp3").write_bytes(b"retagged")
+    make_folder(folder, "sub/d.mp3")
+
+    changes = sync_folder(str(folder), dict(manifest))
+
+    assert [track.title for track in changes.added_tracks] == ["d"]
+    assert [track.title for track in changes.modified_tracks] == ["b"]
+    assert changes.removed == [str(folder / "c.mp3")]
+    assert sorted(changes.manifest) == [str(folder / name) for name in ("a.mp3", "b.mp3", "sub/d.mp3")]
+
+
+def test_changes_apply_to_the_playlist(tmp_path):
+    folder = make_folder(tmp_path, "a.mp3", "b.mp3")
+    playlist = Playlist("P", timedelta(), str(folder), [])
+    apply_changes(playlist, sync_folder(str(folder), {}))
+
+    b_id = next(track.id for track in playlist.tracks if track.title == "b")
+    _, manifest = scan_folder(folder)
+    os.remove(folder / "a.mp3")
+    (folder / "b.mp3").write_bytes(b"retagged")
+    make_folder(folder, "c.mp3")
+
+    apply_changes(playlist, sync_folder(str(folder), known_files(playlist, manifest)))
+
+    assert sorted(track.title for track in playlist.tracks) == ["b", "c"]
+    # Retagged files keep their identity
+    assert next(track.id for track in playlist.tracks if track.title == "b") == b_id
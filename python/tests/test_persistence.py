@@ -0,0 +1,105 @@
+import gevent
+import pytest
+import persistence
+from persistence import WriteBehindSaver
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """
+    Records the data written by atomic_write instead of writing it.
+    """
+
+    written = []
+
+    def atomic_write(path, data):
+        written.append((path, data))
+
+    monkeypatch.setattr(persistence, "atomic_write", atomic_write)
+
+    return written
+
+
+def test_burst_of_saves_is_written_once(tmp_path, writes):
+    saver = WriteBehindSaver(0.05)
+    path = tmp_path / "user.json"
+
+    saves = [gevent.spawn(saver.save, path, lambda i=i: f"{i}".encode()) for i in range(10)]
+    gevent.joinall(saves)
+
+    assert [save.value for save in saves] == [True] * 10
+    # Only the most recent data of the burst is written
+    assert writes == [(path, b"9")]
+
+
+def test_saves_during_window_are_merged_into_next_write(tmp_path, writes):
+    saver = WriteBehindSaver(0.05)
+    path = tmp_path / "user.json"
+
+    first = gevent.spawn(saver.save, path, lambda: b"first")
+    gevent.sleep(0.01)
+    later = [gevent.spawn(saver.save, path, lambda i=i: f"later {i}".encode()) for i in range(5)]
+    gevent.joinall([first, *later])
+
+    assert writes == [(path, b"first"), (path, b"later 4")]
+
+
+def test_files_are_written_independently(tmp_path, writes):
+    saver = WriteBehindSaver(0.05)
+
+    saves = [
+        gevent.spawn(saver.save, tmp_path / name, lambda name=name: name.encode())
+        for name in ("a.json", "b.json")
+    ]
+    gevent.joinall(saves)
+
+    assert sorted(writes) == [(tmp_path / "a.json", b"a.json"), (tmp_path / "b.json", b"b.json")]
+
+
+def test_failed_write_fails_every_merged_save(tmp_path, monkeypatch):
+    def atomic_write(path, data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(persistence, "atomic_write", atomic_write)
+    saver = WriteBehindSaver(0.05)
+
+    saves = [gevent.spawn(saver.save, tmp_path / "user.json", lambda: b"data") for _ in range(3)]
+    gevent.joinall(saves)
+
+    assert [save.value for save in saves] == [False] * 3
+
+
+def test_failed_serialization_fails_the_save(tmp_path, writes):
+    saver = WriteBehindSaver(0.05)
+
+    def serialize():
+        raise ValueError("not serializable")
+
+    assert saver.save(tmp_path / "user.json", serialize) is False
+    assert writes == []
+
+
+def test_flush_does_not_wait_out_the_window(tmp_path, writes):
+    saver = WriteBehindSaver(60)
+    path = tmp_path / "user.json"
+
+    first = gevent.spawn(saver.save, path, lambda: b"first")
+    gevent.sleep(0.01)
+    second = gevent.spawn(saver.save, path, lambda: b"second")
+
+    with gevent.Timeout(5):
+        gevent.sleep(0)
+        saver.flush()
+
+    assert first.value is True and second.value is True
+    assert writes == [(path, b"first"), (path, b"second")]
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / "user.json"
+    path.write_bytes(b"old")
+
+    persistence.atomic_write(path, b"new")
+
+    assert path.read_bytes() == b"new"
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,141 @@
+import pytest
+from play_queue import REPEAT_ALL, REPEAT_ONE, PlayQueue
+
+
+def play_all(queue: PlayQueue) -> list:
+    played = [queue.current]
+
+    while (index := queue.next()) is not None:
+        played.append(index)
+
+    return played
+
+
+def test_plays_in_playlist_order():
+    assert play_all(PlayQueue(4)) == [0, 1, 2, 3]
+
+
+def test_starts_at_given_track():
+    queue = PlayQueue(4, start=2)
+
+    assert queue.current == 2
+    assert queue.next() == 3
+    assert queue.next() is None
+
+
+def test_out_of_range_start_has_no_current_track():
+    queue = PlayQueue(3, start=-1)
+
+    assert queue.current is None
+    assert queue.previous() is None
+    assert queue.next() == 0
+
+
+def test_empty_playlist():
+    queue = PlayQueue(0)
+
+    assert queue.current is None
+    assert queue.next() is None
+    assert queue.peek_next() is None
+
+
+def test_previous_moves_back_in_order():
+    queue = PlayQueue(3, start=2)
+
+    assert queue.previous() == 1
+    assert queue.previous() == 0
+    assert queue.previous() is None
+
+
+def test_repeat_all_wraps_around():
+    queue = PlayQueue(3)
+    queue.set_repeat_mode(REPEAT_ALL)
+
+    assert [queue.next() for _ in range(4)] == [1, 2, 0, 1]
+    assert PlayQueue(3, start=0).previous() is None
+
+    queue.reset(3)
+    assert queue.previous() == 2
+
+
+def test_repeat_one_repeats_only_when_track_ends():
+    queue = PlayQueue(3)
+    queue.set_repeat_mode(REPEAT_ONE)
+
+    assert queue.peek_next(auto=True) == 0
+    assert queue.next(auto=True) == 0
+    assert queue.next() == 1
+
+
+def test_unknown_repeat_mode_is_refused():
+    with pytest.raises(ValueError):
+        PlayQueue(3).set_repeat_mode("sometimes")
+
+
+def test_shuffle_plays_every_track_once_starting_with_current():
+    queue = PlayQueue(20, start=5)
+    queue.set_shuffle(True)
+
+    played = play_all(queue)
+
+    assert played[0] == 5
+    assert sorted(played) == list(range(20))
+
+
+def test_shuffle_off_continues_in_order_from_current():
+    queue = PlayQueue(10, start=0)
+    queue.set_shuffle(True)
+    current = queue.next()
+    queue.set_shuffle(False)
+
+    assert queue.current == current
+    assert queue.next() == (current + 1 if current < 9 else None)
+
+
+def test_queued_tracks_play_first_without_moving_position():
+    queue = PlayQueue(5)
+    queue.enqueue(3)
+    queue.play_next(4)
+
+    assert queue.queued == [4, 3]
+    assert queue.peek_next() == 4
+    assert [queue.next() for _ in range(3)] == [4, 3, 1]
+    assert queue.queued == []
+
+
+def test_enqueue_checks_index():
+    with pytest.raises(IndexError):
+        PlayQueue(2).enqueue(2)
+
+
+def test_move_follows_current_and_queued_tracks():
+    queue = PlayQueue(5, start=1)
+    queue.enqueue(4)
+
+    # [0, 1, 2, 3, 4] -> [1, 2, 3, 0, 4]
+    queue.move(0, 3)
+
+    assert queue.current == 0
+    assert queue.queued == [4]
+
+    # [1, 2, 3, 0, 4] -> [4, 1, 2, 3, 0]
+    queue.move(4, 0)
+
+    assert queue.current == 1
+    assert queue.queued == [0]
+    assert queue.dequeue() == 0
+    assert queue.next() == 2
+
+
+def test_reset_keeps_settings_and_drops_queue():
+    queue = PlayQueue(5)
+    queue.set_repeat_mode(REPEAT_ALL)
+    queue.set_shuffle(True)
+    queue.enqueue(2)
+
+    queue.reset(3, start=1)
+
+    assert queue.repeat_mode == REPEAT_ALL
+    assert queue.shuffle
+    assert queue.queued == []
+    assert queue.current == 1
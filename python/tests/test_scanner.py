@@ -0,0 +1,118 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+import pytest
+from models.track import Track
+from scanner import iter_tracks, walk_audio_files, walk_folders
+from tag_cache import TagCache
+
+
+def touch(folder: Path, *names: str) -> None:
+    for name in names:
+        path = folder / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def names(entries) -> list:
+    return [entry.name for entry in entries]
+
+
+@pytest.fixture
+def library(tmp_path) -> Path:
+    touch(
+        tmp_path,
+        "a.mp3",
+        "cover.jpg",
+        "artist/b.flac",
+        "artist/album/c.wav",
+        "artist/album/disc/d.ogg",
+    )
+
+    return tmp_path
+
+
+def test_walks_folders_before_their_subfolders(library):
+    folders = [(Path(path).relative_to(library).as_posix(), depth) for path, depth, _ in walk_folders(library)]
+
+    assert folders == [(".", 0), ("artist", 1), ("artist/album", 2), ("artist/album/disc", 3)]
+
+
+def test_yields_only_audio_files(library):
+    assert sorted(names(walk_audio_files(library))) == ["a.mp3", "b.flac", "c.wav", "d.ogg"]
+
+
+def test_audio_extensions_are_case_insensitive(tmp_path):
+    touch(tmp_path, "LOUD.MP3")
+
+    assert names(walk_audio_files(tmp_path)) == ["LOUD.MP3"]
+
+
+@pytest.mark.parametrize(
+    "max_depth, expected",
+    [(0, ["a.mp3"]), (1, ["a.mp3", "b.flac"]), (2, ["a.mp3", "b.flac", "c.wav"])],
+)
+def test_max_depth_limits_subfolders(library, max_depth, expected):
+    assert sorted(names(walk_audio_files(library, max_depth=max_depth))) == expected
+
+
+def test_excluded_files_and_folders_are_skipped(library):
+    touch(library, ".hidden.mp3", ".trash/e.mp3", "@eaDir/f.mp3")
+
+    found = names(walk_audio_files(library, exclude=(".*", "@eaDir", "album")))
+
+    assert sorted(found) == ["a.mp3", "b.flac"]
+
+
+def test_no_exclude_patterns_walk_everything(library):
+    touch(library, ".hidden/e.mp3")
+
+    assert "e.mp3" in names(walk_audio_files(library, exclude=()))
+
+
+def test_symlink_loops_end_the_walk(library):
+    try:
+        os.symlink(library, library / "artist" / "loop", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("Symlinks are not supported here")
+
+    found = names(walk_audio_files(library))
+
+    assert sorted(found) == ["a.mp3", "b.flac", "c.wav", "d.ogg"]
+
+
+def test_symlinked_folder_is_walked_once(library, tmp_path_factory):
+    other = tmp_path_factory.mktemp("other")
+    touch(other, "e.mp3")
+
+    try:
+        os.symlink(other, library / "link1", target_is_directory=True)
+        os.symlink(other, library / "link2", target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pytest.skip("Symlinks are not supported here")
+
+    assert names(walk_audio_files(library)).count("e.mp3") == 1
+
+
+def test_missing_folder_raises(tmp_path):
+    with pytest.raises(OSError):
+        list(walk_audio_files(tmp_path / "missing"))
+
+
+def test_tracks_keep_the_order_of_files_and_skip_unreadable_ones(tmp_path):
+    cache = TagCache(tmp_path / "tag_cache.json")
+    files = []
+
+    for i in range(20):
+        path = tmp_path / f"{i:02d}.mp3"
+        files.append(path)
+
+        # Every fifth file is missing, so it cannot be read
+        if i % 5:
+            path.write_bytes(b"")
+            stat = path.stat()
+            cache.put(Track(f"Track {i}", "Artist", timedelta(seconds=i), str(path)), stat.st_size, stat.st_mtime_ns)
+
+    tracks = list(iter_tracks(iter(files), cache, workers=3))
+
+    assert [track.title for track in tracks] == [f"Track {i}" for i in range(20) if i % 5]
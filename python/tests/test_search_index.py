@@ -0,0 +1,138 @@
+from datetime import timedelta
+import pytest
+from models.playlist import Playlist
+from models.track import Track
+from models.user import User
+from search_index import PLAYLIST, TRACK, SearchIndex, tokenize
+
+
+def make_playlist(title: str, tracks) -> Playlist:
+    return Playlist(
+        title,
+        timedelta(),
+        f"/music/{title}",
+        [Track(name, artist, timedelta(seconds=1), f"/music/{title}/{name}.mp3") for name, artist in tracks],
+    )
+
+
+def titles(results: dict) -> list:
+    return [result["title"] for result in results["results"]]
+
+
+@pytest.fixture
+def rock() -> Playlist:
+    return make_playlist(
+        "Rock",
+        [
+            ("Stairway", "Led Zeppelin"),
+            ("Rockstar", "Nickelback"),
+            ("Paranoid", "Black Sabbath"),
+        ],
+    )
+
+
+@pytest.fixture
+def index(rock) -> SearchIndex:
+    index = SearchIndex()
+    index.build(User("someone", [rock]))
+
+    return index
+
+
+def test_tokenize_removes_case_and_accents():
+    assert tokenize("Café Del-Mar, 2") == ["cafe", "del", "mar", "2"]
+
+
+def test_finds_words_by_prefix(index):
+    assert titles(index.search("zep")) == ["Stairway"]
+    assert titles(index.search("PARAN")) == ["Paranoid"]
+    assert index.search("jazz")["total"] == 0
+
+
+def test_every_query_word_must_match(index):
+    assert titles(index.search("black sab")) == ["Paranoid"]
+    assert index.search("black zeppelin")["total"] == 0
+
+
+def test_whole_words_rank_above_prefixes_and_titles_above_artists():
+    index = SearchIndex()
+    tracks = make_playlist(
+        "Mixed",
+        [("Stones", "Nobody"), ("Other", "Stones"), ("Stone", "Nobody"), ("Stone", "Stone")],
+    )
+    index.build(User("someone", [tracks]))
+
+    results = index.search("stone")["results"]
+
+    assert [(result["title"], result["artist"]) for result in results] == [
+        ("Stone", "Stone"),
+        ("Stone", "Nobody"),
+        ("Stones", "Nobody"),
+        ("Other", "Stones"),
+    ]
+    assert [result["score"] for result in results] == sorted(
+        (result["score"] for result in results), reverse=True
+    )
+
+
+def test_playlists_are_boosted(index):
+    results = index.search("rock")["results"]
+
+    assert [(result["type"], result["title"]) for result in results] == [
+        (PLAYLIST, "Rock"),
+        (TRACK, "Rockstar"),
+    ]
+
+
+def test_paging(index):
+    first = index.search("a", offset=0, limit=2)
+    rest = index.search("a", offset=2, limit=10)
+
+    assert first["total"] == rest["total"] == len(first["results"]) + len(rest["results"])
+    assert not set(titles(first)) & set(titles(rest))
+
+
+def test_nothing_is_indexed_before_build(rock):
+    index = SearchIndex()
+    index.index_playlist(rock)
+
+    assert index.search("rock")["total"] == 0
+
+
+def test_added_playlist_is_indexed(index):
+    index.index_playlist(make_playlist("Jazz", [("So What", "Miles Davis")]))
+
+    assert titles(index.search("miles")) == ["So What"]
+
+
+def test_reindexed_playlist_replaces_its_tracks(index, rock):
+    rock.tracks.retain(lambda track: track.title != "Paranoid")
+    rock.tracks.append(Track("Thunderstruck", "AC/DC", timedelta(seconds=1), "/music/Rock/t.mp3"))
+
+    index.index_playlist(rock)
+
+    assert index.search("paranoid")["total"] == 0
+    assert titles(index.search("thunder")) == ["Thunderstruck"]
+
+
+def test_renamed_playlist_is_found_by_its_new_title(index, rock):
+    rock.title = "Classics"
+    index.rename_playlist(rock)
+
+    assert index.search("classics")["results"][0]["type"] == PLAYLIST
+    assert titles(index.search("rock")) == ["Rockstar"]
+
+
+def test_removed_playlist_is_not_found(index, rock):
+    index.remove_playlist(rock.id)
+
+    assert index.search("stairway")["total"] == 0
+    assert index.search("rock")["total"] == 0
+
+
+def test_results_point_at_their_tracks(index, rock):
+    result = index.search("stairway")["results"][0]
+
+    assert result["playlist_id"] == rock.id
+    assert result["track_id"] == rock.tracks[0].id
+    assert result["artist"] == "Led Zeppelin"
@@ -0,0 +1,148 @@
+from datetime import timedelta
+import pytest
+from models.track import Track
+from models.track_store import LazyTrackStore, TrackRow, TrackStore
+
+
+def make_tracks(count: int) -> list:
+    return [
+        Track(f"Title {i}", f"Artist {i % 2}", timedelta(seconds=60 + i), f"/music/album {i % 3}/{i}.mp3")
+        for i in range(count)
+    ]
+
+
+def titles(store) -> list:
+    return [track.title for track in store]
+
+
+def test_rows_read_back_the_tracks():
+    tracks = make_tracks(5)
+    store = TrackStore(tracks)
+
+    assert len(store) == 5
+    assert store == tracks
+    assert [row.to_track() for row in store] == tracks
+    assert store[2].duration_seconds == 62.0
+    assert store[-1].file_path == "/music/album 1/4.mp3"
+
+
+def test_from_dicts_matches_to_dicts():
+    tracks = make_tracks(4)
+    data = [track.to_dict() for track in tracks]
+
+    store = TrackStore.from_dicts(data)
+
+    assert store.to_dicts() == data
+    assert store.to_dicts(1, 3) == data[1:3]
+
+
+def test_ids_that_are_not_hex_are_kept():
+    tracks = make_tracks(2)
+    tracks[0].id = "Not-A-UUID"
+    tracks[1].id = tracks[1].id.upper()
+
+    store = TrackStore(tracks)
+
+    assert [row.id for row in store] == [tracks[0].id, tracks[1].id]
+
+
+def test_move_keeps_rows_valid():
+    store = TrackStore(make_tracks(4))
+    row = store[0]
+
+    store.move(0, 3)
+
+    assert titles(store) == ["Title 1", "Title 2", "Title 3", "Title 0"]
+    assert row.title == "Title 0"
+
+
+def test_removed_slots_are_reused():
+    store = TrackStore(make_tracks(4))
+
+    del store[1]
+    store.retain(lambda track: track.title != "Title 3")
+    store.append(Track("New", "Artist", timedelta(seconds=1), "/music/new.mp3"))
+
+    assert titles(store) == ["Title 0", "Title 2", "New"]
+    assert len(store._titles) == 4
+
+
+def test_setitem_replaces_track_in_place():
+    store = TrackStore(make_tracks(3))
+    replacement = Track("Replaced", "Someone", timedelta(seconds=5), "/elsewhere/r.mp3")
+
+    store[1] = replacement
+
+    assert store[1] == replacement
+    assert titles(store) == ["Title 0", "Replaced", "Title 2"]
+
+
+def test_pop_returns_a_standalone_track():
+    tracks = make_tracks(3)
+    store = TrackStore(tracks)
+
+    popped = store.pop(0)
+
+    assert isinstance(popped, Track)
+    assert popped == tracks[0]
+    assert len(store) == 2
+
+
+def test_columns_round_trip_in_playlist_order():
+    store = TrackStore(make_tracks(6))
+    store.move(5, 0)
+    del store[3]
+
+    copy = TrackStore.from_columns(store.to_columns())
+
+    assert copy == store
+
+
+def test_lazy_store_loads_on_first_access():
+    tracks = make_tracks(3)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return TrackStore(tracks)
+
+    store = LazyTrackStore(3, loader)
+
+    assert len(store) == 3
+    assert not store.loaded
+    assert loads == []
+
+    assert isinstance(store[0], TrackRow)
+    assert store.loaded
+    assert store == tracks
+
+    store.to_dicts()
+    assert loads == [1]
+
+
+@pytest.mark.parametrize(
+    "access",
+    [
+        lambda store: store.to_columns(),
+        lambda store: store.to_dicts(),
+        lambda store: list(store),
+        lambda store: store.move(0, 1),
+        lambda store: store.retain(lambda track: True),
+        lambda store: store.insert(0, Track("T", "A", timedelta(), "/t.mp3")),
+    ],
+)
+def test_lazy_store_loads_before_reading_or_changing(access):
+    store = LazyTrackStore(3, lambda: TrackStore(make_tracks(3)))
+
+    access(store)
+
+    assert store.loaded
+
+
+def test_lazy_store_columns_round_trip():
+    tracks = make_tracks(4)
+    source = TrackStore(tracks)
+
+    store = LazyTrackStore(4, lambda: TrackStore.from_columns(source.to_columns()))
+
+    assert TrackStore.from_columns(store.to_columns()) == tracks
@@ -0,0 +1,150 @@
+from datetime import timedelta
+import gevent
+from gevent.event import AsyncResult
+from models.playlist import Playlist
+from models.track import Track
+from models.user import User
+from unit_of_work import UnitOfWork
+
+
+def make_playlist(title: str, track_titles=()) -> Playlist:
+    tracks = [Track(name, "Artist", timedelta(seconds=1), f"/music/{name}.mp3") for name in track_titles]
+
+    return Playlist(title, timedelta(), f"/music/{title}", tracks)
+
+
+def titles(playlist: Playlist) -> list:
+    return [track.title for track in playlist.tracks]
+
+
+def test_saved_changes_are_kept():
+    user = User("someone")
+    playlist = make_playlist("New")
+    unsaved = []
+
+    changes = UnitOfWork(user, unsaved)
+    changes.add_playlist(playlist)
+
+    assert changes.save(lambda: True)
+    assert user.playlists == [playlist]
+    assert unsaved == []
+
+
+def test_failed_save_reverts_changes_newest_first():
+    rock = make_playlist("Rock", ["a", "b", "c"])
+    jazz = make_playlist("Jazz")
+    user = User("someone", [rock, jazz], ["Jazz"])
+
+    changes = UnitOfWork(user)
+    changes.rename_playlist(rock, "Metal")
+    changes.move_track(rock, 0, 2)
+    changes.remove_playlist(jazz)
+    changes.add_to_recently_played(rock)
+
+    assert not changes.save(lambda: False)
+    assert changes.rolled_back
+    assert user.playlists == [rock, jazz]
+    assert user.get_playlist(jazz.id) is jazz
+    assert rock.title == "Rock"
+    assert titles(rock) == ["a", "b", "c"]
+    assert user.recently_played_playlists == ["Jazz"]
+
+
+def test_save_that_raises_reverts_changes():
+    user = User("someone")
+
+    def save():
+        raise OSError("disk full")
+
+    changes = UnitOfWork(user)
+    changes.add_playlist(make_playlist("New"))
+
+    assert not changes.save(save)
+    assert user.playlists == []
+
+
+def test_removed_playlist_returns_to_its_position():
+    playlists = [make_playlist(title) for title in ("A", "B", "C")]
+    user = User("someone", list(playlists))
+
+    changes = UnitOfWork(user)
+    assert changes.remove_playlist(playlists[1])
+    changes.rollback()
+
+    assert user.playlists == playlists
+
+
+def test_removing_unknown_playlist_records_nothing():
+    user = User("someone")
+
+    changes = UnitOfWork(user)
+
+    assert not changes.remove_playlist(make_playlist("Missing"))
+    assert changes.rollback()
+
+
+def test_move_is_undone_by_track_id_after_other_changes():
+    playlist = make_playlist("P", ["4", "2", "5", "1", "3", "0"])
+    user = User("someone", [playlist])
+
+    changes = UnitOfWork(user)
+    changes.move_track(playlist, 0, 3)
+    # e.g. a folder refresh while the move is being saved
+    playlist.tracks.retain(lambda track: track.title != "1")
+    changes.rollback()
+
+    assert titles(playlist) == ["4", "2", "5", "3", "0"]
+
+
+def test_failed_shared_write_undoes_later_units_first():
+    playlist = make_playlist("P", ["a", "b", "c", "d"])
+    user = User("someone", [playlist])
+    unsaved = []
+    write = AsyncResult()
+
+    first = UnitOfWork(user, unsaved)
+    first.move_track(playlist, 0, 3)
+    second = UnitOfWork(user, unsaved)
+    second.move_track(playlist, 0, 1)
+
+    # Both units wait for the same write, which fails
+    saves = [gevent.spawn(unit.save, write.get) for unit in (first, second)]
+    gevent.sleep(0)
+    write.set(False)
+    gevent.joinall(saves)
+
+    assert [save.value for save in saves] == [False, False]
+    assert titles(playlist) == ["a", "b", "c", "d"]
+    assert unsaved == []
+
+
+def test_unit_undone_by_earlier_failure_saves_again():
+    playlist = make_playlist("P", ["a", "b", "c"])
+    user = User("someone", [playlist])
+    unsaved = []
+    saved = []
+
+    first = UnitOfWork(user, unsaved)
+    first.move_track(playlist, 0, 2)
+    second = UnitOfWork(user, unsaved)
+    second.rename_playlist(playlist, "Renamed")
+
+    assert not first.save(lambda: False)
+
+    def save():
+        saved.append(playlist.title)
+        return True
+
+    # Its own write succeeded, but the change was reverted meanwhile
+    assert not second.save(save)
+    assert saved == ["P", "P"]
+    assert playlist.title == "P"
+
+
+def test_discard_forgets_the_unit():
+    unsaved = []
+
+    changes = UnitOfWork(User("someone"), unsaved)
+    changes.discard()
+
+    assert unsaved == []